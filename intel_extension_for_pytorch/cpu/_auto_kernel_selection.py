@@ -1,3 +1,13 @@
+import functools
+import json
+import os
+import platform
+import time
+
+import torch
+
+from ..utils._logger import logger, WarningType
+
 _use_dnnl = False
 
 
@@ -32,3 +42,136 @@ def _disable_tpp():
 def _using_tpp():
     global _use_tpp
     return _use_tpp
+
+
+# Kernel decisions measured by auto_kernel_selection for given shapes. They are
+# persisted in the file given by this environment variable (a file under
+# ~/.cache by default, an empty value disables the persistence) so that later
+# runs can skip the measurement.
+KERNEL_SELECTION_CACHE_ENV = "IPEX_KERNEL_SELECTION_CACHE"
+_kernel_decisions = None
+
+
+def _get_kernel_selection_cache_file():
+    return os.environ.get(
+        KERNEL_SELECTION_CACHE_ENV,
+        os.path.join(
+            os.path.expanduser("~"),
+            ".cache",
+            "intel_extension_for_pytorch",
+            "kernel_selection.json",
+        ),
+    )
+
+
+def _load_kernel_decisions():
+    global _kernel_decisions
+    if _kernel_decisions is None:
+        _kernel_decisions = {}
+        path = _get_kernel_selection_cache_file()
+        if path != "" and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    _kernel_decisions = json.load(f)
+            except (OSError, ValueError):
+                logger.warning(
+                    f"Failed to load the kernel selection cache {path}, ignore it.",
+                    _type=WarningType.WrongArgument,
+                )
+    return _kernel_decisions
+
+
+def _save_kernel_decisions():
+    path = _get_kernel_selection_cache_file()
+    if path == "":
+        return
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Write a temporary file first so that concurrent runs never read a
+        # partially written cache
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_kernel_decisions, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.warning(
+            f"Failed to save the kernel selection cache {path}.",
+            _type=WarningType.WrongArgument,
+        )
+
+
+def _clear_kernel_decisions():
+    global _kernel_decisions
+    _kernel_decisions = None
+
+
+@functools.lru_cache(None)
+def _get_isa_level():
+    try:
+        import intel_extension_for_pytorch._C as core
+
+        return core._get_current_isa_level().lower()
+    except (ImportError, AttributeError):
+        return platform.machine()
+
+
+def _kernel_selection_key(op, weight, input_shape):
+    # The fastest kernel depends on the shapes and dtype, the ISA and the
+    # number of threads running it
+    return "{}|{}|{}|{}|{}|{}".format(
+        op,
+        _get_isa_level(),
+        torch.get_num_threads(),
+        str(weight.dtype).replace("torch.", ""),
+        "x".join(str(s) for s in weight.shape),
+        "x".join(str(s) for s in input_shape),
+    )
+
+
+def _measure(fn, warmup=2, iters=10):
+    with torch.no_grad():
+        for _ in range(warmup):
+            fn()
+        times = []
+        for _ in range(iters):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def _get_kernel_decision(key, candidates):
+    r"""
+    The kernel persisted for ``key`` if it is one of ``candidates``, else None.
+    """
+
+    decision = _load_kernel_decisions().get(key)
+    return decision if decision in candidates else None
+
+
+def _select_kernel(key, candidates):
+    r"""
+    Pick the fastest kernel in ``candidates``, a dict from the kernel names to
+    functions running them on the shapes described by ``key``. The decision
+    persisted for ``key`` is used if any, otherwise every candidate is
+    measured and the decision is persisted.
+    """
+
+    decision = _get_kernel_decision(key, candidates)
+    if decision is not None:
+        return decision
+    decisions = _load_kernel_decisions()
+    times = {}
+    for name, fn in candidates.items():
+        try:
+            times[name] = _measure(fn)
+        except RuntimeError as e:
+            logger.warning(
+                f"Failed to run the {name} kernel for {key}: {e}",
+                _type=WarningType.NotSupported,
+            )
+    if len(times) == 0:
+        return None
+    decisions[key] = min(times, key=times.get)
+    _save_kernel_decisions()
+    return decisions[key]
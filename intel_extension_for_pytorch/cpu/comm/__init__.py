@@ -1,4 +1,8 @@
+import concurrent.futures
+import os
+
 import torch
+import torch.distributed as dist
 import intel_extension_for_pytorch._C as torch_ipex_cpp
 
 
@@ -6,9 +10,118 @@ def has_ccl():
     return hasattr(torch.ops.torch_ipex, "all_reduce_add")
 
 
+def _is_dist_initialized():
+    return dist.is_available() and dist.is_initialized()
+
+
 if has_ccl():
     get_world_size = torch_ipex_cpp.get_world_size
     get_rank = torch_ipex_cpp.get_rank
     barrier = torch_ipex_cpp.barrier
     allreduce_add = torch.ops.torch_ipex.all_reduce_add
     allgather = torch.ops.torch_ipex.allgather
+else:
+    # Without oneCCL, the collectives run on the default process group of
+    # torch.distributed (e.g. gloo), initialized by the user. They use the
+    # functional collective ops so that they are kept by torch.jit.trace.
+
+    def get_world_size():
+        return dist.get_world_size() if _is_dist_initialized() else 1
+
+    def get_rank():
+        return dist.get_rank() if _is_dist_initialized() else 0
+
+    def barrier():
+        if _is_dist_initialized():
+            dist.barrier()
+
+    def allreduce_add(t_in):
+        if get_world_size() > 1:
+            group_name = dist.group.WORLD.group_name
+            torch.ops._c10d_functional.all_reduce_(t_in, "sum", group_name)
+            torch.ops._c10d_functional.wait_tensor(t_in)
+        return t_in
+
+    def allgather(t_in, cols_per_rank, world_size):
+        # Concatenate the last dimension of the tensors of the ranks, with
+        # cols_per_rank[i + 1] - cols_per_rank[i] columns on rank i.
+        cols = [cols_per_rank[i + 1] - cols_per_rank[i] for i in range(world_size)]
+        max_cols = max(cols)
+        t = torch.nn.functional.pad(t_in, (0, max_cols - t_in.shape[-1]))
+        t = t.movedim(-1, 0).contiguous()
+        out = torch.ops._c10d_functional.all_gather_into_tensor(
+            t, world_size, dist.group.WORLD.group_name
+        )
+        out = torch.ops._c10d_functional.wait_tensor(out)
+        out = out.view(world_size, max_cols, *t.shape[1:])
+        out = torch.cat([out[i, : cols[i]] for i in range(world_size)])
+        return out.movedim(0, -1).contiguous()
+
+
+# Number of chunks of the tokens of a row-parallel linear, see
+# chunked_allreduce_add
+ALLREDUCE_CHUNKS_ENV = "TP_ALLREDUCE_CHUNKS"
+
+_comm_executor = None
+
+
+def get_allreduce_chunks(input):
+    r"""
+    Number of chunks for :func:`chunked_allreduce_add` of ``input``, read from
+    the ``TP_ALLREDUCE_CHUNKS`` environment variable (``1`` by default, meaning
+    no chunking) and bounded by the number of tokens.
+    """
+
+    chunks = int(os.environ.get(ALLREDUCE_CHUNKS_ENV, "1"))
+    return max(1, min(chunks, input.numel() // max(input.shape[-1], 1)))
+
+
+def _start_allreduce(allreduce, t):
+    if torch.jit.is_tracing():
+        # Recorded as a task of the graph, run on the inter-op thread pool
+        return torch.jit.fork(allreduce, t)
+    global _comm_executor
+    if _comm_executor is None:
+        # A single thread keeps the collectives in the same order on all ranks
+        _comm_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="ipex_comm"
+        )
+    return _comm_executor.submit(allreduce, t)
+
+
+def _wait_allreduce(future):
+    if isinstance(future, concurrent.futures.Future):
+        return future.result()
+    return torch.jit.wait(future)
+
+
+def chunked_allreduce_add(gemm, input, num_chunks, allreduce=None):
+    r"""
+    Compute ``allreduce(gemm(input))`` by chunks of the tokens of ``input``:
+    the all-reduce of a chunk runs while the GEMM of the next chunk is
+    computed. The all-reduces are issued one at a time and in order, in a
+    background thread, or as forked tasks of the graph under
+    ``torch.jit.trace``.
+
+    Args:
+        gemm (Callable): Computes the partial output of the rank for a 2D
+            input of tokens.
+        input (torch.Tensor): The input, whose last dimension is the features.
+        num_chunks (int): Number of chunks, e.g. from
+            :func:`get_allreduce_chunks`.
+        allreduce (Callable): Reduces a chunk of output in place and returns
+            it. The default is :func:`allreduce_add`.
+    """
+
+    allreduce = allreduce_add if allreduce is None else allreduce
+    rows = input.reshape(-1, input.shape[-1])
+    outputs = []
+    future = None
+    for chunk in torch.tensor_split(rows, num_chunks):
+        out = gemm(chunk)
+        if future is not None:
+            outputs.append(_wait_allreduce(future))
+        future = _start_allreduce(allreduce, out)
+    outputs.append(_wait_allreduce(future))
+    output = torch.cat(outputs)
+    return output.view(*input.shape[:-1], output.shape[-1])
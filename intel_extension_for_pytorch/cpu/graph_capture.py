@@ -2,11 +2,13 @@ import copy
 import torch
 from torch._dynamo.backends.common import fake_tensor_unsupported
 from torch.jit._trace import TracerWarning
+from torch.utils._pytree import tree_flatten, tree_map
 
 from enum import IntEnum
 from typing import List
 
 import functools
+from collections import OrderedDict
 import threading
 import warnings
 from ..utils._logger import logger, WarningType
@@ -19,101 +21,302 @@ class RunMethods(IntEnum):
     EagerTrain = 4
 
 
+def _input_signature(input, kwargs):
+    # The traced graph is specialized to the shapes and dtypes of the example
+    # inputs, and to the values of non-tensor inputs baked in as constants.
+    def sig(x):
+        if isinstance(x, torch.Tensor):
+            return (tuple(x.shape), x.dtype, x.device, x.requires_grad)
+        if isinstance(x, (list, tuple)):
+            return (type(x),) + tuple(sig(i) for i in x)
+        if isinstance(x, dict):
+            return (dict,) + tuple((k, sig(v)) for k, v in x.items())
+        return (type(x), repr(x))
+
+    return (sig(input), sig(kwargs))
+
+
+def _outputs_match(output, expected):
+    output, output_spec = tree_flatten(output)
+    expected, expected_spec = tree_flatten(expected)
+    if output_spec != expected_spec:
+        return False
+    for o, e in zip(output, expected):
+        if not isinstance(e, torch.Tensor):
+            if o != e:
+                return False
+            continue
+        if not isinstance(o, torch.Tensor) or o.shape != e.shape or o.dtype != e.dtype:
+            return False
+        tol = 1e-3 if e.dtype in [torch.float, torch.double] else 5e-2
+        if e.is_floating_point() and not torch.allclose(
+            o.float(), e.float(), rtol=tol, atol=tol, equal_nan=True
+        ):
+            return False
+        if not e.is_floating_point() and not torch.equal(o, e):
+            return False
+    return True
+
+
+@fake_tensor_unsupported
+def _compiler(gm: torch.fx.GraphModule, example_inputs: List[torch.Tensor]):
+    try:
+        with torch.no_grad():
+            traced_model = torch.jit.trace(gm.eval(), example_inputs)
+            traced_model = torch.jit.freeze(traced_model)
+        return traced_model
+    except Exception:
+        logger.warning(
+            "JIT trace failed during the 'compiler' process.",
+            _type=WarningType.NotSupported,
+        )
+        return gm
+
+
 class GraphCapture(object):
-    def __init__(self, model, train, dtype, weights_prepack):
-        self.model = copy.deepcopy(model)
+    def __init__(
+        self, model, train, dtype, weights_prepack, max_graphs=8, async_capture=False
+    ):
+        # A shallow copy sharing the submodules and weights with the model, whose
+        # forward is the one wrapped by the graph capture.
+        self.model = copy.copy(model)
         self.train = train
         self.dtype = dtype
         self.weights_prepack = weights_prepack
         self.method = None
         self.lock = threading.Lock()
+        # One JIT graph per input signature, the least recently used one is
+        # evicted when there are more than max_graphs of them.
+        self.max_graphs = max_graphs
+        self.graphs = OrderedDict()
+        # Guards the graphs and the counters. The lookups of the fast path
+        # only take this lock, not the one held while generating a graph.
+        self.cache_lock = threading.Lock()
+        self.traced_signatures = set()
+        self.dynamo_model = None
+        self.hits = 0
+        self.misses = 0
+        self.retraces = 0
+        self.evictions = 0
+        # With async_capture, the graphs are generated by background threads
+        # while the eager model serves the calls, and only used once their
+        # outputs match the eager ones.
+        self.async_capture = async_capture
+        self.pending = {}
+        self.eager_signatures = set()
+        self.capture_lock = threading.Lock()
 
-    def __call__(self, func):
-        @fake_tensor_unsupported
-        def compiler(gm: torch.fx.GraphModule, example_inputs: List[torch.Tensor]):
-            try:
-                with torch.no_grad():
-                    traced_model = torch.jit.trace(gm.eval(), example_inputs)
-                    traced_model = torch.jit.freeze(traced_model)
-                return traced_model
-            except Exception:
+    @property
+    def stats(self):
+        r"""
+        Counters of the graph cache: ``hits`` and ``misses`` of the lookups
+        by input signature, ``retraces`` of the signatures traced again after
+        being evicted, ``evictions`` and the number of cached ``graphs``.
+        """
+
+        with self.cache_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "retraces": self.retraces,
+                "evictions": self.evictions,
+                "graphs": len(self.graphs),
+            }
+
+    def _trace(self, input, kwargs):
+        # Tracing only records operations done when the given function is run on the given
+        # tensors. Therefore, the returned ScriptModule will always run the same traced graph
+        # on any input. This has some important implications when your module is expected
+        # to run different sets of operations, depending on the input and/or the module state.
+        # In cases like these, tracing would not be appropriate, and the tracer will try to
+        # emit warnings when doing something that may cause an incorrect trace to be produced.
+        # Therefore, we catch these warnings and treat them as errors, and let TorchDynamo
+        # handle such models appropriately.
+        with warnings.catch_warnings():
+            warnings.filterwarnings("error", category=TracerWarning)
+            traced_model = torch.jit.trace(self.model.eval(), input).eval()
+            traced_model = torch.jit.freeze(traced_model)
+            output = traced_model(*input, **kwargs)
+        return traced_model, output
+
+    def _add_graph(self, signature, graph):
+        with self.cache_lock:
+            self.misses += 1
+            if signature in self.traced_signatures:
+                self.retraces += 1
+            self.traced_signatures.add(signature)
+            self.graphs[signature] = graph
+            while len(self.graphs) > max(self.max_graphs, 1):
+                self.graphs.popitem(last=False)
+                self.evictions += 1
+
+    def _lookup(self, signature):
+        with self.cache_lock:
+            graph = self.graphs.get(signature)
+            if graph is not None:
+                self.hits += 1
+                self.graphs.move_to_end(signature)
+        return graph
+
+    def _clear_graphs(self):
+        with self.cache_lock:
+            self.graphs.clear()
+
+    def _autocast(self):
+        return torch.cpu.amp.autocast(
+            enabled=(self.dtype == torch.bfloat16 or self.dtype == torch.half),
+            dtype=self.dtype,
+        )
+
+    def _capture(self, signature, input, kwargs, grad_enabled):
+        # Runs in a background thread, one capture at a time.
+        method, graph = None, None
+        try:
+            with self.capture_lock, torch.set_grad_enabled(
+                grad_enabled
+            ), self._autocast():
+                expected = self.model(*input, **kwargs)
+                try:
+                    graph, output = self._trace(input, kwargs)
+                    method = RunMethods.JIT
+                except BaseException:
+                    torch._dynamo.reset()
+                    graph = torch._dynamo.optimize(_compiler, dynamic=True)(self.model)
+                    output = graph(*input, **kwargs)
+                    method = RunMethods.TorchDynamo
+            if not _outputs_match(output, expected):
                 logger.warning(
-                    "JIT trace failed during the 'compiler' process.",
+                    "The outputs of the captured graph don't match the ones of the eager model, "
+                    + "keep running the inputs of this shape in eager mode.",
                     _type=WarningType.NotSupported,
                 )
-                return gm
+                method = None
+        except BaseException:
+            logger.warning(
+                "Both JIT and TorchDynamo failed, fallback to original model.",
+                _type=WarningType.NotSupported,
+            )
+            method = RunMethods.EagerInfer
+        with self.lock:
+            del self.pending[signature]
+            if method == RunMethods.JIT and self.method in [None, RunMethods.JIT]:
+                self._add_graph(signature, graph)
+                self.method = RunMethods.JIT
+                logger.debug("generate graph by JIT trace in background.")
+            elif method == RunMethods.TorchDynamo:
+                self._clear_graphs()
+                self.dynamo_model = graph
+                self.method = RunMethods.TorchDynamo
+                logger.debug("generate graph by TorchDynamo in background.")
+            elif method == RunMethods.EagerInfer:
+                self.method = RunMethods.EagerInfer
+            else:
+                self.eager_signatures.add(signature)
+
+    def synchronize(self, timeout=None):
+        r"""
+        Wait for the graphs being captured in background with ``async_capture``.
+        """
+
+        for thread in list(self.pending.values()):
+            thread.join(timeout)
+
+    def __call__(self, func):
+        def run(*input, **kwargs):
+            if self.train:
+                return func(*input, **kwargs)
+            if self.method == RunMethods.TorchDynamo:
+                return self.dynamo_model(*input, **kwargs)
+            return self.model(*input, **kwargs)
 
         @functools.wraps(func)
         def forward(*input, **kwargs):
             if torch.jit.is_tracing():
                 return func(*input, **kwargs)
-            with torch.cpu.amp.autocast(
-                enabled=(self.dtype == torch.bfloat16 or self.dtype == torch.half),
-                dtype=self.dtype,
-            ):
-                if self.method:
+            with self._autocast():
+                if self.method == RunMethods.JIT:
+                    # Fast path: dispatch to the graph specialized for the inputs.
+                    signature = _input_signature(input, kwargs)
+                    graph = self._lookup(signature)
+                    if graph is not None:
+                        return graph(*input, **kwargs)
+                elif self.method:
+                    return run(*input, **kwargs)
+                # Lock the graph generation process to avoid multiple threads generating graph simultaneously.
+                with self.lock:
+                    if self.method and self.method != RunMethods.JIT:
+                        return run(*input, **kwargs)
+                    signature = _input_signature(input, kwargs)
+                    graph = self._lookup(signature)
+                    if graph is not None:
+                        return graph(*input, **kwargs)
                     if self.train:
+                        logger.warning(
+                            "graph capture does not support training yet.",
+                            _type=WarningType.NotSupported,
+                        )
+                        self.method = RunMethods.EagerTrain
                         return func(*input, **kwargs)
-                    else:
-                        return self.model(*input, **kwargs)
-                else:
-                    # Lock the graph generation process to avoid multiple threads generating graph simultaneously.
-                    with self.lock:
-                        if self.method:
-                            if self.train:
-                                return func(*input, **kwargs)
-                            else:
-                                return self.model(*input, **kwargs)
-                        if self.train:
-                            logger.warning(
-                                "graph capture does not support training yet.",
-                                _type=WarningType.NotSupported,
+                    elif self.async_capture:
+                        if (
+                            signature not in self.pending
+                            and signature not in self.eager_signatures
+                        ):
+                            # Capture with a copy of the inputs, which the
+                            # caller may modify after this call.
+                            example_input, example_kwargs = tree_map(
+                                lambda x: (
+                                    x.detach().clone()
+                                    if isinstance(x, torch.Tensor)
+                                    else x
+                                ),
+                                (input, kwargs),
                             )
-                            self.method = RunMethods.EagerTrain
-                            return func(*input, **kwargs)
-                        else:
+                            thread = threading.Thread(
+                                target=self._capture,
+                                args=(
+                                    signature,
+                                    example_input,
+                                    example_kwargs,
+                                    torch.is_grad_enabled(),
+                                ),
+                                daemon=True,
+                            )
+                            self.pending[signature] = thread
+                            thread.start()
+                    else:
+                        try:
+                            # Try JIT trace for the signature of the inputs.
+                            traced_model, output = self._trace(input, kwargs)
+                            self._add_graph(signature, traced_model)
+                            self.method = RunMethods.JIT
+                            logger.debug("generate graph by JIT trace.")
+                            return output
+                        except BaseException:
+                            # Graphs of other signatures may be traced with
+                            # a control flow specialized to their inputs.
+                            self._clear_graphs()
                             try:
-                                # Try JIT trace.
-                                # Tracing only records operations done when the given function is run on the given
-                                # tensors. Therefore, the returned ScriptModule will always run the same traced graph
-                                # on any input. This has some important implications when your module is expected
-                                # to run different sets of operations, depending on the input and/or the module state.
-                                # In cases like these, tracing would not be appropriate, and the tracer will try to
-                                # emit warnings when doing something that may cause an incorrect trace to be produced.
-                                # Therefore, we catch these warnings and treat them as errors, and let TorchDynamo
-                                # handle such models appropriately.
-                                with warnings.catch_warnings():
-                                    warnings.filterwarnings(
-                                        "error", category=TracerWarning
-                                    )
-                                    traced_model = torch.jit.trace(
-                                        self.model.eval(), input
-                                    ).eval()
-                                    traced_model = torch.jit.freeze(traced_model)
-                                    output = traced_model(*input, **kwargs)
-                                    self.model = traced_model
-                                    self.method = RunMethods.JIT
-                                    logger.debug("generate graph by JIT trace.")
-                                    return output
+                                # JIT trace failed, try torchdynamo with JIT trace backend.
+                                torch._dynamo.reset()
+                                dynamo_model = torch._dynamo.optimize(
+                                    _compiler, dynamic=True
+                                )(self.model)
+                                output = dynamo_model(*input, **kwargs)
+                                self.dynamo_model = dynamo_model
+                                self.method = RunMethods.TorchDynamo
+                                logger.debug("generate graph by TorchDynamo.")
+                                return output
                             except BaseException:
-                                try:
-                                    # JIT trace failed, try torchdynamo with JIT trace backend.
-                                    torch._dynamo.reset()
-                                    dynamo_model = torch._dynamo.optimize(
-                                        compiler, dynamic=True
-                                    )(self.model)
-                                    output = dynamo_model(*input, **kwargs)
-                                    self.model = dynamo_model
-                                    self.method = RunMethods.TorchDynamo
-                                    logger.debug("generate graph by TorchDynamo.")
-                                    return output
-                                except BaseException:
-                                    logger.warning(
-                                        "Both JIT and TorchDynamo failed, fallback to original model.",
-                                        _type=WarningType.NotSupported,
-                                    )
-                                    self.method = RunMethods.EagerInfer
-                                    torch._dynamo.reset()
-                                    return self.model(*input, **kwargs)
+                                logger.warning(
+                                    "Both JIT and TorchDynamo failed, fallback to original model.",
+                                    _type=WarningType.NotSupported,
+                                )
+                                self.method = RunMethods.EagerInfer
+                                torch._dynamo.reset()
+                                return self.model(*input, **kwargs)
+                # Serve the call in eager mode while the graph is being captured.
+                return self.model(*input, **kwargs)
 
+        forward.graph_capture = self
         return forward
@@ -10,7 +10,16 @@ from ..strategy import STRATEGIES
 from intel_extension_for_pytorch.cpu.launch import CPUPoolList
 
 # ### tuning ####
-tuning_default = {"strategy": "grid", "max_trials": 100}
+tuning_default = {
+    "strategy": "grid",
+    "max_trials": 100,
+    "resume": False,
+    "n_initial_trials": 10,
+    "min_budget": 1,
+    "max_budget": 27,
+    "reduction_factor": 3,
+    "budget_arg": "",
+}
 
 
 def _valid_strategy(data):
@@ -23,6 +32,12 @@ tuning_schema = Schema(
     {
         Optional("strategy", default="grid"): And(str, Use(_valid_strategy)),
         Optional("max_trials", default=100): int,
+        Optional("resume", default=False): bool,
+        Optional("n_initial_trials", default=10): And(int, lambda s: s > 0),
+        Optional("min_budget", default=1): And(int, lambda s: s > 0),
+        Optional("max_budget", default=27): And(int, lambda s: s > 0),
+        Optional("reduction_factor", default=3): And(int, lambda s: s > 1),
+        Optional("budget_arg", default=""): str,
     }
 )
 
@@ -1,16 +1,22 @@
 # reference: https://github.com/intel/neural-compressor/blob/\
 #            15477100cef756e430c8ef8ef79729f0c80c8ce6/neural_compressor/objective.py
+import os
 import subprocess
 from ...utils._logger import logger, WarningType
 
+# Environment variable passing the budget of a trial, e.g. the number of
+# benchmark iterations, to the program
+HYPERTUNE_BUDGET_ENV = "IPEX_HYPERTUNE_BUDGET"
+
 
 class MultiObjective(object):
-    def __init__(self, program, program_args, tune_launcher):
+    def __init__(self, program, program_args, tune_launcher, budget_arg=""):
         self.program = program
         self.program_args = program_args
         self.tune_launcher = tune_launcher
+        self.budget_arg = budget_arg
 
-    def evaluate(self, cfg):
+    def evaluate(self, cfg, budget=None):
         cmd = ["ipexrun"]
 
         if self.tune_launcher:
@@ -20,7 +26,16 @@ class MultiObjective(object):
         cmd += [self.program]
         cmd += self.program_args
 
-        r = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        env = None
+        if budget is not None:
+            if self.budget_arg != "":
+                cmd += [self.budget_arg, str(budget)]
+            env = dict(os.environ)
+            env[HYPERTUNE_BUDGET_ENV] = str(budget)
+
+        r = subprocess.run(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env
+        )
 
         # todo: r.returncode != 0
 
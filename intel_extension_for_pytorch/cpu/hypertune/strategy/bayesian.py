@@ -0,0 +1,107 @@
+import math
+import numpy as np
+from .strategy import strategy_registry, TuneStrategy
+
+
+@strategy_registry
+class BayesianTuneStrategy(TuneStrategy):
+    """
+    Model-based search with a Tree-structured Parzen Estimator. After
+    n_initial_trials random configurations, the evaluated configurations are
+    split into the best quarter and the others, the distribution of the
+    values of every hyperparameter is estimated in both groups, and the
+    untried configuration maximizing the ratio of the likelihoods of the good
+    and bad groups is evaluated next.
+    """
+
+    # quantile of the evaluated configurations considered good
+    gamma = 0.25
+    # candidates sampled from the good distribution when the search space is
+    # too large to score all the untried configurations
+    n_ei_candidates = 256
+
+    def __init__(self, conf):
+        super().__init__(conf)
+        self.n_initial_trials = conf.execution_conf.tuning.n_initial_trials
+        self.space_sizes = [
+            len(self.hyperparam2searchspace[hp]) for hp in self.hyperparams
+        ]
+        # strides of the hyperparameters in the index of a combination,
+        # the last one changes fastest as in itertools.product
+        self.strides = [1] * len(self.space_sizes)
+        for d in reversed(range(len(self.space_sizes) - 1)):
+            self.strides[d] = self.strides[d + 1] * self.space_sizes[d + 1]
+        self.num_combinations = math.prod(self.space_sizes)
+
+    def _value_ids(self, idx):
+        return [
+            (idx // stride) % size
+            for stride, size in zip(self.strides, self.space_sizes)
+        ]
+
+    def _cfg(self, idx):
+        return {
+            hp: self.hyperparam2searchspace[hp][v]
+            for hp, v in zip(self.hyperparams, self._value_ids(idx))
+        }
+
+    def _log_likelihood_ratios(self, observed):
+        scores = self._scores([result for _, result in observed])
+        order = np.argsort(scores, kind="stable")
+        n_good = max(1, int(math.ceil(self.gamma * len(observed))))
+        good = np.array(
+            [self._value_ids(observed[k][0]) for k in order[:n_good]], dtype=np.int64
+        )
+        bad = np.array(
+            [self._value_ids(observed[k][0]) for k in order[n_good:]], dtype=np.int64
+        ).reshape(-1, len(self.space_sizes))
+        ratios, p_goods = [], []
+        for d, size in enumerate(self.space_sizes):
+            # add-one smoothing, so that untried values keep a chance
+            p_good = (np.bincount(good[:, d], minlength=size) + 1) / (len(good) + size)
+            p_bad = (np.bincount(bad[:, d], minlength=size) + 1) / (len(bad) + size)
+            ratios.append(np.log(p_good) - np.log(p_bad))
+            p_goods.append(p_good)
+        return ratios, p_goods
+
+    def _suggest(self, untried, tried, observed):
+        ratios, p_goods = self._log_likelihood_ratios(observed)
+        if len(untried) <= self.n_ei_candidates * 16:
+            candidates = np.array(untried)
+        else:
+            # sample from the good distribution
+            candidates = sum(
+                np.random.choice(size, self.n_ei_candidates, p=p_good) * stride
+                for size, p_good, stride in zip(self.space_sizes, p_goods, self.strides)
+            )
+            candidates = np.array([c for c in candidates.tolist() if c not in tried])
+            if len(candidates) == 0:
+                return untried[0]
+        value_ids = [
+            (candidates // stride) % size
+            for stride, size in zip(self.strides, self.space_sizes)
+        ]
+        scores = sum(ratio[v] for ratio, v in zip(ratios, value_ids))
+        return int(candidates[np.argmax(scores)])
+
+    def next_tune_cfg(self):
+        untried = np.random.permutation(self.num_combinations).tolist()
+        if len(self.history) > 0:
+            # replay the configurations evaluated before resuming first
+            untried.sort(key=lambda i: not self._is_evaluated(self._cfg(i)))
+        tried = set()
+        observed = []
+        while len(untried) > 0:
+            if (
+                self._is_evaluated(self._cfg(untried[0]))
+                or len(observed) < self.n_initial_trials
+            ):
+                idx = untried[0]
+            else:
+                idx = self._suggest(untried, tried, observed)
+            untried.remove(idx)
+            tried.add(idx)
+            tune_cfg = self._cfg(idx)
+            yield tune_cfg
+            observed.append((idx, self._get_result(tune_cfg)))
+        return
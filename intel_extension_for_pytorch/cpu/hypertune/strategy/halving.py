@@ -0,0 +1,81 @@
+import itertools
+import numpy as np
+from .strategy import strategy_registry, TuneStrategy
+
+
+@strategy_registry
+class HalvingTuneStrategy(TuneStrategy):
+    """
+    Successive halving: run many configurations with min_budget, e.g. a few
+    benchmark iterations, and promote the best 1/reduction_factor of them to
+    a budget reduction_factor times larger, until the survivors run with
+    max_budget. The budget is passed to the program with budget_arg and the
+    IPEX_HYPERTUNE_BUDGET environment variable.
+    """
+
+    budgeted = True
+
+    def __init__(self, conf):
+        super().__init__(conf)
+        tuning = conf.execution_conf.tuning
+        assert (
+            tuning.min_budget <= tuning.max_budget
+        ), "min_budget should not be larger than max_budget."
+        self.reduction_factor = tuning.reduction_factor
+        self.combinations = list(
+            itertools.product(
+                *(self.hyperparam2searchspace[hp] for hp in self.hyperparams)
+            )
+        )
+
+        self.budgets = []
+        budget = tuning.min_budget
+        while budget < self.max_budget:
+            self.budgets.append(budget)
+            budget *= self.reduction_factor
+        self.budgets.append(self.max_budget)
+
+        # the largest number of initial configurations fitting in max_trials
+        lo, hi = 1, len(self.combinations)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._num_trials(mid) <= self.max_trials:
+                lo = mid
+            else:
+                hi = mid - 1
+        self.num_configs = lo
+
+    def _num_survivors(self, n):
+        return max(1, n // self.reduction_factor)
+
+    def _num_trials(self, n):
+        trials = 0
+        for _ in self.budgets:
+            trials += n
+            n = self._num_survivors(n)
+        return trials
+
+    def _cfg(self, idx):
+        return dict(zip(self.hyperparams, self.combinations[idx]))
+
+    def next_tune_cfg(self):
+        survivors = np.random.permutation(len(self.combinations)).tolist()
+        # replay the configurations evaluated before resuming first
+        survivors.sort(
+            key=lambda i: not self._is_evaluated(self._cfg(i), self.budgets[0])
+        )
+        survivors = survivors[: self.num_configs]
+        for i, budget in enumerate(self.budgets):
+            self.budget = budget
+            for idx in survivors:
+                yield self._cfg(idx)
+            if i == len(self.budgets) - 1:
+                break
+            scores = self._scores(
+                [self._get_result(self._cfg(idx), budget) for idx in survivors]
+            )
+            order = np.argsort(scores, kind="stable")
+            survivors = [
+                survivors[k] for k in order[: self._num_survivors(len(survivors))]
+            ]
+        return
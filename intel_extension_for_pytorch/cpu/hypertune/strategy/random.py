@@ -16,8 +16,19 @@ class RandomTuneStrategy(TuneStrategy):
         self.record_idx = set()
 
     def next_tune_cfg(self):
+        # replay the configurations evaluated before resuming first
+        resumed = []
+        if len(self.history) > 0:
+            resumed = [
+                i
+                for i in self.total_idx
+                if self._is_evaluated(dict(zip(self.hyperparams, self.combinations[i])))
+            ]
         while len(self.total_idx) > 0:
-            idx = np.random.choice(list(self.total_idx))
+            if len(resumed) > 0:
+                idx = resumed.pop(0)
+            else:
+                idx = np.random.choice(list(self.total_idx))
             self.record_idx.add(idx)
             self.total_idx = self.total_idx - self.record_idx
 
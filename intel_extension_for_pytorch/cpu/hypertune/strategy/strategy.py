@@ -3,12 +3,19 @@
 import os
 from abc import abstractmethod
 import csv
+import json
+import math
 from collections import OrderedDict
 import click
 from ..objective import MultiObjective
 
 STRATEGIES = {}
 
+# Every evaluation is appended to this file in output_dir, so that an
+# interrupted tuning can be resumed without running the evaluated
+# configurations again
+HISTORY_FILE = "history.jsonl"
+
 
 def strategy_registry(cls):
     assert cls.__name__.endswith(
@@ -21,6 +28,10 @@ def strategy_registry(cls):
 
 
 class TuneStrategy(object):
+    # Whether the strategy runs the program with budgets smaller than
+    # max_budget, set in self.budget before yielding a configuration
+    budgeted = False
+
     def __init__(self, conf):
         self.conf = conf.execution_conf
         self.program = conf.program
@@ -28,6 +39,10 @@ class TuneStrategy(object):
         self.usr_objectives = conf.usr_objectives
 
         self.max_trials = conf.execution_conf.tuning.max_trials
+        self.resume = conf.execution_conf.tuning.resume
+        self.max_budget = conf.execution_conf.tuning.max_budget
+        # budget of the current trial, None to run the program as it is
+        self.budget = None
 
         # hyperparams #
         self.hyperparam2searchspace = OrderedDict()
@@ -39,18 +54,31 @@ class TuneStrategy(object):
 
         # objective #
         self.multiobjective = MultiObjective(
-            self.program, self.program_args, tune_launcher
+            self.program,
+            self.program_args,
+            tune_launcher,
+            conf.execution_conf.tuning.budget_arg,
         )
 
+        # history #
+        self.history = OrderedDict()
+        history_name = os.path.join(self.conf.output_dir, HISTORY_FILE)
+        if self.resume:
+            self._load_history(history_name)
+        self.history_file = open(history_name, "a" if self.resume else "w")
+
         # output #
         output_name = "record.csv"
         log_name = os.path.join(self.conf.output_dir, output_name)
-        csvfile = open(log_name, "w", newline="")
-        self.tune_result_record = csv.writer(csvfile, delimiter=",")
-        self.tune_result_record.writerow(
-            list(self.hyperparam2searchspace.keys())
-            + [objective["name"] for objective in self.usr_objectives]
-        )
+        append = self.resume and os.path.exists(log_name)
+        self.csvfile = open(log_name, "a" if append else "w", newline="")
+        self.tune_result_record = csv.writer(self.csvfile, delimiter=",")
+        if not append:
+            self.tune_result_record.writerow(
+                list(self.hyperparam2searchspace.keys())
+                + [objective["name"] for objective in self.usr_objectives]
+                + (["budget"] if self.budgeted else [])
+            )
 
         self.best_tune_result = None
         self.best_tune_cfg = None
@@ -72,9 +100,11 @@ class TuneStrategy(object):
             click.secho("\nCurrent configuration is: ", fg="green", nl=False)
             click.secho("{tune_cfg}", fg="blue")
 
-            curr_tune_result = self.multiobjective.evaluate(tune_cfg)
+            curr_tune_result = self._evaluate(tune_cfg)
 
-            self._update_best_tune_result(curr_tune_result, tune_cfg)
+            if self.budget is None or self.budget >= self.max_budget:
+                # results of short runs are only used to select configurations
+                self._update_best_tune_result(curr_tune_result, tune_cfg)
             self._record_tune_result(curr_tune_result, tune_cfg)
 
             need_stop = self._stop(trials_count)
@@ -94,6 +124,82 @@ class TuneStrategy(object):
         self._print_best_result()
         return
 
+    def _history_key(self, tune_cfg, budget):
+        return json.dumps([tune_cfg, budget], sort_keys=True)
+
+    def _load_history(self, history_name):
+        if not os.path.exists(history_name):
+            return
+        with open(history_name, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last line may be partially written by an interrupted tuning
+                    continue
+                if (
+                    record["program"] != self.program
+                    or record["program_args"] != self.program_args
+                ):
+                    continue
+                key = self._history_key(record["cfg"], record["budget"])
+                self.history[key] = record["result"]
+        click.secho(
+            f"Resuming from {len(self.history)} evaluated configurations in {history_name}",
+            fg="green",
+        )
+
+    def _is_evaluated(self, tune_cfg, budget=None):
+        return self._history_key(tune_cfg, budget) in self.history
+
+    def _get_result(self, tune_cfg, budget=None):
+        return self.history[self._history_key(tune_cfg, budget)]
+
+    def _evaluate(self, tune_cfg):
+        key = self._history_key(tune_cfg, self.budget)
+        if key in self.history:
+            click.secho("Reusing the result of the previous tuning", fg="green")
+            return self.history[key]
+        curr_tune_result = self.multiobjective.evaluate(tune_cfg, self.budget)
+        self.history[key] = curr_tune_result
+        self.history_file.write(
+            json.dumps(
+                {
+                    "program": self.program,
+                    "program_args": self.program_args,
+                    "cfg": tune_cfg,
+                    "budget": self.budget,
+                    "result": curr_tune_result,
+                }
+            )
+            + "\n"
+        )
+        self.history_file.flush()
+        return curr_tune_result
+
+    def _scores(self, tune_results):
+        """
+        Scalarize the results of several configurations for ranking, lower
+        is better: the sum of the ranks over the objectives. Runs failing to
+        report all the objectives rank last.
+        """
+
+        valid = [
+            i for i, r in enumerate(tune_results) if len(r) == len(self.usr_objectives)
+        ]
+        scores = [math.inf] * len(tune_results)
+        for i in valid:
+            scores[i] = 0
+        for j, objective in enumerate(self.usr_objectives):
+            order = sorted(
+                valid,
+                key=lambda i: tune_results[i][j],
+                reverse=objective["higher_is_better"],
+            )
+            for rank, i in enumerate(order):
+                scores[i] += rank
+        return scores
+
     def _compare(self, higher_is_better, src, dst):
         if higher_is_better:
             return src > dst
@@ -101,6 +207,9 @@ class TuneStrategy(object):
             return src < dst
 
     def _update_best_tune_result(self, curr_tune_result, curr_tune_cfg):
+        if len(curr_tune_result) != len(self.usr_objectives):
+            # the program failed
+            return
         if self.best_tune_result is None and self.best_tune_cfg is None:
             # initial baseline
             self.best_tune_result = curr_tune_result
@@ -129,14 +238,19 @@ class TuneStrategy(object):
 
         click.secho("Best configuration is: ", fg="green", nl=False)
         click.secho("{self.best_tune_cfg}", fg="blue")
-        for objective, val in zip(self.usr_objectives, self.best_tune_result):
+        for objective, val in zip(self.usr_objectives, self.best_tune_result or []):
             click.secho("{objective['name']}: {val}", fg="blue")
 
         curr_tune_cfg_val = list(_ for _ in curr_tune_cfg.values())
-        self.tune_result_record.writerow(curr_tune_cfg_val + curr_tune_result)
+        self.tune_result_record.writerow(
+            curr_tune_cfg_val
+            + curr_tune_result
+            + ([self.budget] if self.budgeted else [])
+        )
+        self.csvfile.flush()
 
     def _stop(self, trials_count):
-        if all(
+        if self.best_tune_result is not None and all(
             [
                 self._compare(higher_is_better, best_val, target_val)
                 for higher_is_better, best_val, target_val in zip(
@@ -162,5 +276,5 @@ class TuneStrategy(object):
     def _print_best_result(self):
         click.secho("Best configuration found is: ", fg="green", nl=False)
         click.secho("{self.best_tune_cfg}", fg="blue")
-        for objective, val in zip(self.usr_objectives, self.best_tune_result):
+        for objective, val in zip(self.usr_objectives, self.best_tune_result or []):
             click.secho("{objective['name']}: {val}", fg="blue")
@@ -3,3 +3,4 @@ from .launcher_base import Launcher
 from .launcher_distributed import DistributedTrainingLauncher
 from .launcher_multi_instances import MultiInstancesLauncher
 from .launch import init_parser, run_main_with_args, ArgumentTypesDefaultsHelpFormatter
+from .supervisor import report_metrics
@@ -63,6 +63,7 @@ class CoreInfo:
     - [bool] is a physical core or not
     - [float] maxmhz
     - [bool] is a performance core
+    - [int] L3 cache index, -1 if unknown
     """
 
     def __init__(self, lscpu_txt="", headers=None):
@@ -75,6 +76,7 @@ class CoreInfo:
         self.is_physical_core = True
         self.maxmhz = 0
         self.is_p_core = True
+        self.l3 = -1
         if lscpu_txt != "" and len(headers) > 0:
             self.parse_raw(lscpu_txt, headers)
 
@@ -89,6 +91,10 @@ class CoreInfo:
             self.socket = int(cols[headers["socket"]])
         if "maxmhz" in headers:
             self.maxmhz = float(cols[headers["maxmhz"]])
+        if "l1d:l1i:l2:l3" in headers:
+            l3 = cols[headers["l1d:l1i:l2:l3"]].split(":")[-1]
+            if l3.isdigit():
+                self.l3 = int(l3)
 
     def __str__(self):
         return f"{self.cpu}\t{self.core}\t{self.socket}\t{self.node}\t{self.is_physical_core}\t{self.maxmhz}\t{self.is_p_core}"
@@ -166,7 +172,14 @@ class CPUPoolList:
                     t = line.split(" ")
                     num_cols = len(t)
                     for i in range(num_cols):
-                        if t[i] in ["cpu", "core", "socket", "node", "maxmhz"]:
+                        if t[i] in [
+                            "cpu",
+                            "core",
+                            "socket",
+                            "node",
+                            "maxmhz",
+                            "l1d:l1i:l2:l3",
+                        ]:
                             headers[t[i]] = i
                 else:
                     t = line.split(" ")
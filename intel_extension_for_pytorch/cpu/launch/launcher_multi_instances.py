@@ -1,8 +1,16 @@
 import sys
 import subprocess
 import os
+import tempfile
 import intel_extension_for_pytorch.cpu.auto_ipex as auto_ipex
 from .launcher_base import Launcher
+from .supervisor import (
+    METRICS_FILE_ENV,
+    Autoscaler,
+    InstanceSupervisor,
+    aggregate_metrics,
+    read_metrics,
+)
 from ...utils._logger import WarningType
 
 
@@ -85,6 +93,55 @@ class MultiInstancesLauncher(Launcher):
             + "Recommend to use this for benchmarking purpose; for other use cases, "
             + "this MALLOC_CONF may cause Out-of-Memory crash.",
         )
+        group = parser.add_argument_group("Supervisor Arguments")
+        group.add_argument(
+            "--supervise",
+            action="store_true",
+            default=False,
+            help="Watch the instances and restart the crashed ones on the same cores.",
+        )
+        group.add_argument(
+            "--max-restarts",
+            "--max_restarts",
+            default=3,
+            type=int,
+            help="Maximum number of restarts of a single instance in supervisor mode.",
+        )
+        group.add_argument(
+            "--metrics-dir",
+            "--metrics_dir",
+            default="",
+            type=str,
+            help="Directory of the metrics files of the instances. The path of the file of each instance is "
+            + f"passed to it with environment variable {METRICS_FILE_ENV}, the program reports its "
+            + "throughput and latency with intel_extension_for_pytorch.cpu.launch.report_metrics. "
+            + "A temporary directory is used by default when --autoscale-runs is set.",
+        )
+        group.add_argument(
+            "--autoscale-runs",
+            "--autoscale_runs",
+            default=0,
+            type=int,
+            help="Run the program this number of times, rebalancing --ncores-per-instance and --ninstances "
+            + "between runs from the metrics reported by the instances. Implies --supervise.",
+        )
+        group.add_argument(
+            "--autoscale-objective",
+            "--autoscale_objective",
+            default="throughput",
+            type=str,
+            choices=["throughput", "latency"],
+            help="Metric to optimize with --autoscale-runs: the sum of the instances' throughputs or "
+            + "the average of their latencies.",
+        )
+        group.add_argument(
+            "--latency-constraint",
+            "--latency_constraint",
+            default=0.0,
+            type=float,
+            help="With --autoscale-objective throughput, only configurations whose average latency "
+            + "is within this value are preferred. 0 means no constraint.",
+        )
 
     def is_command_available(self, cmd):
         is_available = False
@@ -123,7 +180,7 @@ class MultiInstancesLauncher(Launcher):
         return tm_local
 
     def execution_command_builder(
-        self, args, omp_runtime, task_mgr, environ, cpu_pools, index
+        self, args, omp_runtime, task_mgr, environ, cpu_pools, index, metrics_file=""
     ):
         assert index > -1 and index <= len(
             cpu_pools
@@ -159,6 +216,9 @@ class MultiInstancesLauncher(Launcher):
         omp_num_threads = self.check_env("OMP_NUM_THREADS", len(pool))
         environ_local["OMP_NUM_THREADS"] = str(omp_num_threads)
         self.verbose("info", f"env: OMP_NUM_THREADS={omp_num_threads}")
+        if metrics_file != "":
+            environ_local[METRICS_FILE_ENV] = metrics_file
+            self.verbose("info", f"env: {METRICS_FILE_ENV}={metrics_file}")
 
         if not args.no_python:
             cmd.append(sys.executable)
@@ -291,29 +351,65 @@ class MultiInstancesLauncher(Launcher):
                 args.disable_ipex_graph_mode,
             )
 
-        instances_available = list(range(args.ninstances))
-        instance_idx = self.parse_list_argument(args.instance_idx)
-        if -1 in instance_idx:
-            instance_idx.clear()
-        if len(instance_idx) == 0:
-            instance_idx.extend(instances_available)
-        instance_idx.sort()
-        instance_idx = list(set(instance_idx))
-        assert set(instance_idx).issubset(
-            set(instances_available)
-        ), "Designated nodes list contains invalid nodes."
-        processes = []
-        for i in instance_idx:
-            process = self.execution_command_builder(
+        try:
+            if args.autoscale_runs > 0:
+                self.autoscale(args, omp_runtime, task_mgr, environ_local)
+            else:
+                instances_available = list(range(args.ninstances))
+                instance_idx = self.parse_list_argument(args.instance_idx)
+                if -1 in instance_idx:
+                    instance_idx.clear()
+                if len(instance_idx) == 0:
+                    instance_idx.extend(instances_available)
+                instance_idx.sort()
+                instance_idx = list(set(instance_idx))
+                assert set(instance_idx).issubset(
+                    set(instances_available)
+                ), "Designated nodes list contains invalid nodes."
+                self.run_instances(
+                    args, omp_runtime, task_mgr, environ_local, instance_idx
+                )
+        finally:
+            if args.auto_ipex:
+                # Clean the temp file
+                if os.path.exists(args.program) and args.program.endswith("_auto_ipex"):
+                    os.remove(args.program)
+
+    def get_metrics_file(self, args, index, run=0):
+        if args.metrics_dir == "":
+            return ""
+        return os.path.join(
+            args.metrics_dir,
+            f"{args.log_file_prefix}_run_{run}_instance_{index}_metrics.jsonl",
+        )
+
+    def run_instances(self, args, omp_runtime, task_mgr, environ, instance_idx, run=0):
+        """
+        Launch the instances and wait for them to finish, restarting the
+        crashed ones in supervisor mode. Returns the metrics reported by
+        each instance.
+        """
+
+        def start_instance(i):
+            # Metrics of a previous launch or of a crashed attempt are stale
+            metrics_file = self.get_metrics_file(args, i, run)
+            if metrics_file != "" and os.path.exists(metrics_file):
+                os.remove(metrics_file)
+            return self.execution_command_builder(
                 args=args,
                 omp_runtime=omp_runtime,
                 task_mgr=task_mgr,
-                environ=environ_local,
+                environ=environ,
                 cpu_pools=self.cpuinfo.pools_ondemand,
                 index=i,
+                metrics_file=metrics_file,
             )
-            processes.append(process)
-        try:
+
+        if args.supervise or args.autoscale_runs > 0:
+            supervisor = InstanceSupervisor(self, max_restarts=args.max_restarts)
+            supervisor.run(start_instance, instance_idx)
+        else:
+            processes = [start_instance(i) for i in instance_idx]
             for process in processes:
                 p = process["process"]
                 p.wait()
@@ -321,11 +417,76 @@ class MultiInstancesLauncher(Launcher):
                     raise subprocess.CalledProcessError(
                         returncode=p.returncode, cmd=process["cmd"]
                     )
-        finally:
-            if args.auto_ipex:
-                # Clean the temp file
-                if os.path.exists(args.program) and args.program.endswith("_auto_ipex"):
-                    os.remove(args.program)
+        return [
+            (
+                read_metrics(self.get_metrics_file(args, i, run))
+                if args.metrics_dir != ""
+                else None
+            )
+            for i in instance_idx
+        ]
+
+    def autoscale(self, args, omp_runtime, task_mgr, environ):
+        """
+        Run the program args.autoscale_runs times, choosing ncores_per_instance
+        and ninstances of every run from the metrics of the previous runs.
+        """
+
+        if args.instance_idx not in ["", "-1"]:
+            self.verbose(
+                "warning",
+                "--instance-idx doesn't take effect with --autoscale-runs, all instances are launched.",
+                warning_type=WarningType.AmbiguousArgument,
+            )
+        if args.metrics_dir == "":
+            args.metrics_dir = tempfile.mkdtemp(prefix="ipexrun_metrics_")
+        pools = self.cpuinfo.pools_ondemand
+        if args.bind_numa_node:
+            # Instances don't cross numa nodes, so the candidates have to
+            # divide the cores of a single node
+            nodes = set([c.node for p in pools for c in p])
+            ncores = min(
+                len([c for p in pools for c in p if c.node == n]) for n in nodes
+            )
+        else:
+            ncores = len(set([c.cpu for p in pools for c in p]))
+        autoscaler = Autoscaler(
+            ncores, args.autoscale_objective, args.latency_constraint
+        )
+        cores_list = self.parse_list_argument(args.cores_list)
+        nodes_list = self.parse_list_argument(args.nodes_list)
+        ncores_per_instance = autoscaler.propose(initial=len(pools[0]))
+        for run in range(args.autoscale_runs):
+            self.cpuinfo.gen_pools_ondemand(
+                ninstances=0,
+                ncores_per_instance=ncores_per_instance,
+                use_logical_cores=args.use_logical_cores,
+                use_e_cores=args.use_e_cores,
+                bind_numa_node=args.bind_numa_node,
+                nodes_list=nodes_list,
+                cores_list=cores_list,
+                strategy=args.strategy,
+            )
+            ninstances = len(self.cpuinfo.pools_ondemand)
+            self.verbose(
+                "info",
+                f"========== autoscale run {run}: ninstances={ninstances}, "
+                + f"ncores_per_instance={ncores_per_instance} ==========",
+            )
+            instance_metrics = self.run_instances(
+                args, omp_runtime, task_mgr, environ, list(range(ninstances)), run
+            )
+            metrics = aggregate_metrics(instance_metrics)
+            self.verbose("info", f"autoscale run {run} metrics: {metrics}")
+            autoscaler.record(ncores_per_instance, metrics)
+            ncores_per_instance = autoscaler.propose()
+        best = autoscaler.best()
+        self.verbose(
+            "info",
+            f"Best configuration: --ncores-per-instance {best} --ninstances "
+            + f"{ncores // best if args.bind_numa_node is False else 'auto'} "
+            + f"(metrics files are in {args.metrics_dir})",
+        )
 
 
 if __name__ == "__main__":
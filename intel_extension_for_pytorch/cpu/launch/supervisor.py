@@ -0,0 +1,189 @@
+import json
+import math
+import os
+import subprocess
+import time
+
+# Environment variable telling a launched instance where to report its metrics
+METRICS_FILE_ENV = "IPEX_INSTANCE_METRICS_FILE"
+
+
+def report_metrics(throughput=None, latency=None):
+    r"""
+    Report the performance metrics of the current instance to the launcher
+    running in supervisor mode. It appends a JSON line to the metrics file
+    given by the launcher and does nothing when the program is not launched
+    by a supervising launcher, so benchmark scripts can call it
+    unconditionally.
+
+    Args:
+        throughput (float): Throughput of the instance, e.g. samples/s.
+        latency (float): Latency of the instance, e.g. ms/iteration.
+    """
+
+    path = os.environ.get(METRICS_FILE_ENV, "")
+    if path == "":
+        return
+    record = {"time": time.time()}
+    if throughput is not None:
+        record["throughput"] = float(throughput)
+    if latency is not None:
+        record["latency"] = float(latency)
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def read_metrics(path):
+    r"""
+    Read the metrics reported by an instance with :func:`report_metrics`.
+
+    Returns:
+        dict: Average ``throughput`` and ``latency`` over the reports, the keys
+        are missing if the instance didn't report them. None if the instance
+        reported nothing.
+    """
+
+    if not os.path.exists(path):
+        return None
+    values = {"throughput": [], "latency": []}
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line == "":
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The line may be partially written by a crashed instance
+                continue
+            for k in values:
+                if k in record:
+                    values[k].append(record[k])
+    ret = {k: sum(v) / len(v) for k, v in values.items() if len(v) > 0}
+    return ret if len(ret) > 0 else None
+
+
+def aggregate_metrics(instance_metrics):
+    r"""
+    Aggregate the metrics of the instances of one run: throughputs are summed
+    up and latencies are averaged.
+    """
+
+    instance_metrics = [m for m in instance_metrics if m is not None]
+    ret = {}
+    throughputs = [m["throughput"] for m in instance_metrics if "throughput" in m]
+    if len(throughputs) > 0:
+        ret["throughput"] = sum(throughputs)
+    latencies = [m["latency"] for m in instance_metrics if "latency" in m]
+    if len(latencies) > 0:
+        ret["latency"] = sum(latencies) / len(latencies)
+    return ret
+
+
+class InstanceSupervisor:
+    """
+    Watch launched instances, and restart the crashed ones on the same cores
+    """
+
+    def __init__(self, launcher, max_restarts=3, poll_interval=1.0):
+        self.launcher = launcher
+        self.max_restarts = max_restarts
+        self.poll_interval = poll_interval
+
+    def run(self, start_instance, instance_idx):
+        """
+        Start the instances with ``start_instance(index)``, which returns a
+        dict with the ``process`` and its ``cmd``, and wait for all of them to
+        finish. An instance exiting with a non-zero code is started again
+        with the same index, which maps to the same cores, up to
+        ``max_restarts`` times.
+        """
+
+        running = {i: start_instance(i) for i in instance_idx}
+        restarts = {i: 0 for i in instance_idx}
+        try:
+            while len(running) > 0:
+                for i in list(running.keys()):
+                    p = running[i]["process"]
+                    if p.poll() is None:
+                        continue
+                    if p.returncode == 0:
+                        del running[i]
+                        continue
+                    if restarts[i] >= self.max_restarts:
+                        process = running.pop(i)
+                        raise subprocess.CalledProcessError(
+                            returncode=p.returncode, cmd=process["cmd"]
+                        )
+                    restarts[i] += 1
+                    self.launcher.verbose(
+                        "warning",
+                        f"Instance {i} exited with code {p.returncode}. "
+                        + f"Restarting it on the same cores ({restarts[i]}/{self.max_restarts}).",
+                    )
+                    running[i] = start_instance(i)
+                if len(running) > 0:
+                    time.sleep(self.poll_interval)
+        finally:
+            for process in running.values():
+                if process["process"].poll() is None:
+                    process["process"].terminate()
+        return restarts
+
+
+class Autoscaler:
+    """
+    Choose ncores_per_instance (and thus ninstances) between runs of a
+    benchmark from the metrics measured in the previous runs. The candidates
+    are the divisors of the number of cores, and the search climbs from the
+    best measured candidate to its untried neighbours until none of them is
+    better.
+    """
+
+    def __init__(self, ncores, objective="throughput", latency_constraint=0.0):
+        assert objective in [
+            "throughput",
+            "latency",
+        ], f"Autoscaling objective {objective} is not available."
+        self.candidates = [c for c in range(1, ncores + 1) if ncores % c == 0]
+        self.objective = objective
+        self.latency_constraint = latency_constraint
+        self.history = {}
+
+    def score(self, metrics):
+        if metrics is None or self.objective not in metrics:
+            return -math.inf
+        if self.objective == "latency":
+            return -metrics["latency"]
+        if (
+            self.latency_constraint > 0
+            and "latency" in metrics
+            and metrics["latency"] > self.latency_constraint
+        ):
+            # Violating configurations rank below all satisfying ones, by latency
+            return -metrics["latency"] - 1e12
+        return metrics["throughput"]
+
+    def record(self, ncores_per_instance, metrics):
+        self.history[ncores_per_instance] = self.score(metrics)
+
+    def best(self):
+        if len(self.history) == 0:
+            return None
+        return max(self.history.keys(), key=lambda c: self.history[c])
+
+    def propose(self, initial=None):
+        """
+        Return the ncores_per_instance of the next run.
+        """
+
+        if len(self.history) == 0:
+            if initial in self.candidates:
+                return initial
+            # Start from one instance per core group of a median size
+            return self.candidates[len(self.candidates) // 2]
+        idx = self.candidates.index(self.best())
+        for n in [idx - 1, idx + 1]:
+            if 0 <= n < len(self.candidates) and self.candidates[n] not in self.history:
+                return self.candidates[n]
+        return self.best()
@@ -7,3 +7,4 @@ from .multi_stream import (
     _MultiStreamBenchmarkModule,
 )
 from .runtime_utils import get_core_list_of_node_id
+from .topology import get_cpu_pools, get_core_lists, get_node_ids_of_cores
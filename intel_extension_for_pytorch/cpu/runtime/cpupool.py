@@ -1,6 +1,7 @@
 import functools
 import intel_extension_for_pytorch as ipex
 from .runtime_utils import get_core_list_of_node_id
+from .topology import set_mempolicy, restore_mempolicy
 from ...utils._logger import logger, WarningType
 
 
@@ -12,13 +13,19 @@ class CPUPool(object):
         core_ids (list): A list of CPU cores' ids used for intra-op parallelism.
         node_id (int): A numa node id with all CPU cores on the numa node.
             ``node_id`` doesn't work if ``core_ids`` is set.
+        mem_node_ids (list): A list of numa node ids the memory allocated by
+            the thread pinned to this pool with ``pin`` is bound to. The memory
+            policy is left unchanged if it is None.
 
     Returns:
         intel_extension_for_pytorch.cpu.runtime.CPUPool: Generated
         intel_extension_for_pytorch.cpu.runtime.CPUPool object.
     """
 
-    def __init__(self, core_ids: list = None, node_id: int = None):
+    def __init__(
+        self, core_ids: list = None, node_id: int = None, mem_node_ids: list = None
+    ):
+        self.mem_node_ids = mem_node_ids
         if not ipex._C._has_cpu():
             return
         if core_ids is not None:
@@ -74,9 +81,13 @@ class pin(object):
         assert type(self.cpu_pool) is CPUPool
         self.previous_cpu_pool = ipex._C.get_current_cpu_pool()
         ipex._C.pin_cpu_cores(self.cpu_pool.cpu_pool)
+        self.previous_mempolicy = None
+        if self.cpu_pool.mem_node_ids:
+            self.previous_mempolicy = set_mempolicy(self.cpu_pool.mem_node_ids)
 
     def __exit__(self, *args):
         ipex._C.set_cpu_pool(self.previous_cpu_pool)
+        restore_mempolicy(self.previous_mempolicy)
 
     # Support decorator
     def __call__(self, func):
@@ -4,6 +4,7 @@ from typing import Union
 import intel_extension_for_pytorch._C as core
 from .cpupool import CPUPool
 from .task import Task
+from .topology import get_node_ids_of_cores
 import copy
 from ...utils._logger import logger, WarningType
 
@@ -144,6 +145,7 @@ class MultiStreamModule(nn.Module):
             self.tasks = []
             start_core_list_idx = 0
             end_core_list_idx = 0
+            numa_crossing_streams = []
             for j in range(self.num_streams):
                 if j < num_stream_allocated_extra_core:
                     # If the core number is not divisible by stream number,
@@ -151,13 +153,19 @@ class MultiStreamModule(nn.Module):
                     end_core_list_idx += self.cores_per_instance + 1
                 else:
                     end_core_list_idx += self.cores_per_instance
-                self.tasks.append(
-                    Task(
-                        model,
-                        CPUPool(self.core_list[start_core_list_idx:end_core_list_idx]),
-                    )
-                )
+                stream_core_list = self.core_list[start_core_list_idx:end_core_list_idx]
+                if len(get_node_ids_of_cores(stream_core_list)) > 1:
+                    numa_crossing_streams.append(j)
+                self.tasks.append(Task(model, CPUPool(stream_core_list)))
                 start_core_list_idx = end_core_list_idx
+            if len(numa_crossing_streams) > 0:
+                logger.warning(
+                    f"The cores of streams {numa_crossing_streams} cross numa nodes, which leads to remote "
+                    + "memory access. Suggest to set num_streams as a multiple of the number of numa nodes "
+                    + "inside cpu_pool, or to create one MultiStreamModule per CPUPool from "
+                    + "ipex.cpu.runtime.get_cpu_pools().",
+                    _type=WarningType.WrongArgument,
+                )
         self.concat_output = concat_output
         self.input_split_hint = input_split_hint
         self.output_concat_hint = output_concat_hint
@@ -579,6 +587,7 @@ class _MultiStreamBenchmarkModule(nn.Module):
             self.tasks = []
             start_core_list_idx = 0
             end_core_list_idx = 0
+            numa_crossing_streams = []
             for j in range(self.num_streams):
                 if j < num_stream_allocated_extra_core:
                     # If the core number is not divisible by stream number,
@@ -586,13 +595,19 @@ class _MultiStreamBenchmarkModule(nn.Module):
                     end_core_list_idx += self.cores_per_instance + 1
                 else:
                     end_core_list_idx += self.cores_per_instance
-                self.tasks.append(
-                    Task(
-                        model,
-                        CPUPool(self.core_list[start_core_list_idx:end_core_list_idx]),
-                    )
-                )
+                stream_core_list = self.core_list[start_core_list_idx:end_core_list_idx]
+                if len(get_node_ids_of_cores(stream_core_list)) > 1:
+                    numa_crossing_streams.append(j)
+                self.tasks.append(Task(model, CPUPool(stream_core_list)))
                 start_core_list_idx = end_core_list_idx
+            if len(numa_crossing_streams) > 0:
+                logger.warning(
+                    f"The cores of streams {numa_crossing_streams} cross numa nodes, which leads to remote "
+                    + "memory access. Suggest to set num_streams as a multiple of the number of numa nodes "
+                    + "inside cpu_pool, or to create one MultiStreamModule per CPUPool from "
+                    + "ipex.cpu.runtime.get_cpu_pools().",
+                    _type=WarningType.WrongArgument,
+                )
 
     def forward(self, *args, **kwargs):
         if self.num_streams == 1:
@@ -0,0 +1,281 @@
+import ctypes
+import functools
+import os
+import platform
+from typing import List
+
+from ..launch.cpu_info import CPUPoolList
+from ...utils._logger import logger, WarningType
+
+# set_mempolicy(2) modes
+MPOL_DEFAULT = 0
+MPOL_PREFERRED = 1
+MPOL_BIND = 2
+MPOL_INTERLEAVE = 3
+
+_SYSCALL_NUMBERS = {
+    # (get_mempolicy, set_mempolicy)
+    "x86_64": (239, 238),
+    "aarch64": (236, 237),
+}
+# mbind(2) syscall numbers and flag moving the pages already allocated
+_MBIND_SYSCALL_NUMBERS = {
+    "x86_64": 237,
+    "aarch64": 235,
+}
+MPOL_MF_MOVE = 1 << 1
+# Size of the node masks passed to the kernel, enough for 1024 NUMA nodes
+_MAX_NODES = 1024
+_ULONG_BITS = ctypes.sizeof(ctypes.c_ulong) * 8
+_NodeMask = ctypes.c_ulong * (_MAX_NODES // _ULONG_BITS)
+
+
+@functools.lru_cache(None)
+def _get_cpu_pool_list(lscpu_txt=""):
+    return CPUPoolList(lscpu_txt=lscpu_txt)
+
+
+def _get_cores(use_logical_cores, use_e_cores, nodes_list, lscpu_txt):
+    cores = list(_get_cpu_pool_list(lscpu_txt).pool_all)
+    if lscpu_txt == "" and hasattr(os, "sched_getaffinity"):
+        # Only the cores available to the current process, which may be
+        # restricted by numactl or taskset
+        available = os.sched_getaffinity(0)
+        cores = [c for c in cores if c.cpu in available]
+    if not use_logical_cores:
+        cores = [c for c in cores if c.is_physical_core]
+    if not use_e_cores:
+        cores = [c for c in cores if c.is_p_core]
+    if nodes_list is not None:
+        cores = [c for c in cores if c.node in nodes_list]
+    return cores
+
+
+def get_core_lists(
+    policy: str = "numa",
+    use_logical_cores: bool = False,
+    use_e_cores: bool = False,
+    nodes_list: list = None,
+    lscpu_txt: str = "",
+):
+    r"""
+    Group the CPU cores available to the current process by the machine
+    topology parsed from ``lscpu``.
+
+    Args:
+        policy (str): How the cores are grouped. ``"all"`` for a single group,
+            ``"socket"`` for one group per socket, ``"numa"`` for one group per
+            NUMA node and ``"l3"`` for one group per L3 cache domain. ``"l3"``
+            falls back to ``"numa"`` when lscpu doesn't report L3 cache ids.
+        use_logical_cores (bool): Whether to include the logical cores
+            (hyper-threads). Only physical cores are used by default.
+        use_e_cores (bool): Whether to include the Efficient-Cores. Only
+            Performance-Cores are used by default.
+        nodes_list (list): The NUMA node ids to take cores from. All nodes are
+            used by default.
+        lscpu_txt (str): Output of ``lscpu --all --extended`` to parse instead
+            of the one of the current machine.
+
+    Returns:
+        list: List of CPU cores' ids lists, one list per group.
+    """
+
+    keys = {
+        "all": lambda c: 0,
+        "socket": lambda c: c.socket,
+        "numa": lambda c: c.node,
+        "l3": lambda c: (c.node, c.l3),
+    }
+    assert policy in keys, "policy must be one of {}, got {}".format(
+        list(keys.keys()), policy
+    )
+    groups = {}
+    for c in _get_cores(use_logical_cores, use_e_cores, nodes_list, lscpu_txt):
+        groups.setdefault(keys[policy](c), []).append(c.cpu)
+    return [sorted(groups[k]) for k in sorted(groups.keys())]
+
+
+def get_node_ids_of_cores(core_ids: list, lscpu_txt: str = ""):
+    r"""
+    Helper function to get the NUMA node ids the input CPU cores are on.
+
+    Args:
+        core_ids (list): Input CPU cores' ids.
+        lscpu_txt (str): Output of ``lscpu --all --extended`` to parse instead
+            of the one of the current machine.
+
+    Returns:
+        list: Sorted list of NUMA node ids, empty if the topology is unknown.
+    """
+
+    try:
+        pool_all = _get_cpu_pool_list(lscpu_txt).pool_all
+    except Exception:
+        return []
+    core_ids = set(core_ids)
+    return sorted(set(c.node for c in pool_all if c.cpu in core_ids))
+
+
+def get_cpu_pools(
+    policy: str = "numa",
+    use_logical_cores: bool = False,
+    use_e_cores: bool = False,
+    nodes_list: list = None,
+    bind_memory: bool = True,
+):
+    r"""
+    Build one :class:`CPUPool` per topology domain of the current machine,
+    see :func:`get_core_lists` for the grouping policies.
+
+    Args:
+        policy (str): ``"all"``, ``"socket"``, ``"numa"`` or ``"l3"``.
+        use_logical_cores (bool): Whether to include the logical cores.
+        use_e_cores (bool): Whether to include the Efficient-Cores.
+        nodes_list (list): The NUMA node ids to take cores from.
+        bind_memory (bool): Whether the memory allocated by the thread pinned
+            to a pool with :class:`pin` is bound to the NUMA nodes of the pool.
+
+    Returns:
+        list: List of intel_extension_for_pytorch.cpu.runtime.CPUPool objects.
+    """
+
+    from .cpupool import CPUPool
+
+    pools = []
+    for core_ids in get_core_lists(policy, use_logical_cores, use_e_cores, nodes_list):
+        mem_node_ids = get_node_ids_of_cores(core_ids) if bind_memory else None
+        pools.append(CPUPool(core_ids=core_ids, mem_node_ids=mem_node_ids))
+    return pools
+
+
+@functools.lru_cache(None)
+def _get_libc():
+    if platform.system() != "Linux" or platform.machine() not in _SYSCALL_NUMBERS:
+        return None
+    return ctypes.CDLL(None, use_errno=True)
+
+
+def set_mempolicy(node_ids: List[int]):
+    r"""
+    Bind the memory allocated by the calling thread to the input NUMA nodes:
+    the node is preferred for a single node and pages are interleaved over
+    several nodes, so that allocations don't fail when the nodes are full.
+
+    Returns:
+        The previous memory policy of the calling thread to be restored with
+        :func:`restore_mempolicy`, None if the policy can't be changed.
+    """
+
+    libc = _get_libc()
+    if libc is None:
+        logger.warning(
+            "Memory node binding is only supported on Linux x86_64 and aarch64.",
+            _type=WarningType.NotSupported,
+        )
+        return None
+    get_nr, set_nr = _SYSCALL_NUMBERS[platform.machine()]
+    prev_mode = ctypes.c_int(0)
+    prev_mask = _NodeMask()
+    if libc.syscall(
+        ctypes.c_long(get_nr),
+        ctypes.byref(prev_mode),
+        prev_mask,
+        ctypes.c_ulong(_MAX_NODES),
+        None,
+        ctypes.c_ulong(0),
+    ):
+        logger.warning(
+            "Failed to get the memory policy: {}".format(
+                os.strerror(ctypes.get_errno())
+            ),
+            _type=WarningType.NotSupported,
+        )
+        return None
+    mask = _NodeMask()
+    for node in node_ids:
+        mask[node // _ULONG_BITS] |= 1 << (node % _ULONG_BITS)
+    mode = MPOL_PREFERRED if len(node_ids) == 1 else MPOL_INTERLEAVE
+    if libc.syscall(
+        ctypes.c_long(set_nr), ctypes.c_int(mode), mask, ctypes.c_ulong(_MAX_NODES + 1)
+    ):
+        logger.warning(
+            "Failed to bind memory to NUMA nodes {}: {}".format(
+                node_ids, os.strerror(ctypes.get_errno())
+            ),
+            _type=WarningType.NotSupported,
+        )
+        return None
+    return prev_mode.value, prev_mask
+
+
+def restore_mempolicy(state):
+    r"""
+    Restore the memory policy returned by :func:`set_mempolicy`.
+    """
+
+    if state is None:
+        return
+    mode, mask = state
+    _, set_nr = _SYSCALL_NUMBERS[platform.machine()]
+    _get_libc().syscall(
+        ctypes.c_long(set_nr),
+        ctypes.c_int(mode),
+        mask if mode != MPOL_DEFAULT else None,
+        ctypes.c_ulong(_MAX_NODES + 1),
+    )
+
+
+def move_tensors_to_nodes(tensors, node_ids: List[int]):
+    r"""
+    Move the pages of the storages of the tensors to the input NUMA nodes with
+    ``mbind(2)``, e.g. the weights of the modules run by the threads of a
+    :class:`CPUPool`. The pages shared with the neighboring allocations are
+    moved as well. Tensors without storage, like the MKLDNN tensors, are
+    skipped.
+
+    Returns:
+        bool: Whether the pages of all the tensors with storage were moved.
+    """
+
+    libc = _get_libc()
+    if libc is None:
+        logger.warning(
+            "Memory node binding is only supported on Linux x86_64 and aarch64.",
+            _type=WarningType.NotSupported,
+        )
+        return False
+    mbind_nr = _MBIND_SYSCALL_NUMBERS[platform.machine()]
+    mode = MPOL_PREFERRED if len(node_ids) == 1 else MPOL_INTERLEAVE
+    mask = _NodeMask()
+    for node in node_ids:
+        mask[node // _ULONG_BITS] |= 1 << (node % _ULONG_BITS)
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    moved = set()
+    for t in tensors:
+        try:
+            storage = t.untyped_storage()
+            start, nbytes = storage.data_ptr(), storage.nbytes()
+        except (RuntimeError, NotImplementedError):
+            continue
+        if nbytes == 0 or start in moved:
+            continue
+        moved.add(start)
+        begin = start // page_size * page_size
+        end = (start + nbytes + page_size - 1) // page_size * page_size
+        if libc.syscall(
+            ctypes.c_long(mbind_nr),
+            ctypes.c_void_p(begin),
+            ctypes.c_ulong(end - begin),
+            ctypes.c_int(mode),
+            mask,
+            ctypes.c_ulong(_MAX_NODES + 1),
+            ctypes.c_uint(MPOL_MF_MOVE),
+        ):
+            logger.warning(
+                "Failed to move memory to NUMA nodes {}: {}".format(
+                    node_ids, os.strerror(ctypes.get_errno())
+                ),
+                _type=WarningType.NotSupported,
+            )
+            return False
+    return True
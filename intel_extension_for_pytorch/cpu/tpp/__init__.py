@@ -1,4 +1,6 @@
 from . import fused_bert
+from .fused_bert import build_tpp_encoder_layer
 from . import utils
 from . import optim
+from .packing import pack_sequences, PackedSequenceDataset
 from .utils.blocked_layout import block_model_params as block
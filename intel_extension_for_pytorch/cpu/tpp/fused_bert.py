@@ -47,12 +47,45 @@ def print_grad_hook(var, name):
     var.grad_fn.register_hook(register_grad)
 
 
-def generate_mask(attention_mask):
+def generate_packed_mask(attention_mask, position_ids, S2):
+    # The sequences packed in the rows start at the first token of a row, where
+    # the positions restart from 0 or after padding. Every sequence is placed
+    # at the start of a block of S2 tokens of the unpadded input, so that the
+    # attention is computed per sequence. msk is the index of the token of the
+    # padded input in every slot of the unpadded one, -1 for the padding.
+    B, S = attention_mask.shape
+    attention_mask = attention_mask.reshape(-1)
+    position_ids = position_ids.reshape(-1)
+    valid = attention_mask == 0
+    prev_valid = torch.cat([valid.new_zeros([1]), valid[:-1]])
+    col = torch.arange(S).repeat(B)
+    starts = valid & ((col == 0) | (position_ids == 0) | ~prev_valid)
+    src = valid.nonzero().squeeze(1)
+    seq_ids = (starts.cumsum(dim=0) - 1)[src]
+    seq_lens = torch.bincount(seq_ids, minlength=int(starts.sum()))
+    seq_blocks = (seq_lens + (S2 - 1)) // S2
+    slot_starts = (seq_blocks.cumsum(dim=0) - seq_blocks) * S2
+    tok_starts = seq_lens.cumsum(dim=0) - seq_lens
+    dst = slot_starts[seq_ids] + torch.arange(src.numel()) - tok_starts[seq_ids]
+    T = int(seq_blocks.sum()) * S2
+    msk = torch.full([T], -1, dtype=torch.long)
+    msk[dst] = src
+    unpadded_mask = attention_mask.new_full([T], -10000.0)
+    unpadded_mask[dst] = attention_mask[src]
+    seq_offsets = torch.cat([torch.zeros([1], dtype=torch.long), seq_blocks])
+    return msk, unpadded_mask, seq_offsets
+
+
+def generate_mask(attention_mask, position_ids=None):
     assert attention_mask is not None, "attention_mask is None"
     B, _, _, S = attention_mask.shape
     S1, S2 = BlockedModule.default_blocking_factors(S)
     attention_mask = attention_mask.view([B, S]).clone()
-    if unpad:
+    if position_ids is not None and position_ids.size(0) == B:
+        msk, attention_mask, seq_offsets = generate_packed_mask(
+            attention_mask, position_ids, S2
+        )
+    elif unpad:
         nnz = (((attention_mask + 10000).count_nonzero(dim=-1) + (S2 - 1)) // S2) * S2
         # nnz = (((attention_mask+10000).count_nonzero(dim=-1) + (S - 1))//S)*S
         nnz1 = nnz.unsqueeze(dim=1).expand([-1, S])
@@ -77,14 +110,24 @@ class PadInput(torch.autograd.Function):
         ctx.save_for_backward(msk)
         output = input.new_zeros(padded_shape)
 
-        output[msk, :] = input
+        if msk.dtype == torch.bool:
+            output[msk, :] = input
+        else:
+            valid = msk >= 0
+            output.view(-1, input.size(-1))[msk[valid]] = input[valid]
         return output
 
     @staticmethod
     def backward(ctx, grad_output):
         (msk,) = ctx.saved_tensors
 
-        grad_input = grad_output[msk, :]
+        if msk.dtype == torch.bool:
+            grad_input = grad_output[msk, :]
+        else:
+            valid = msk >= 0
+            grad_output = grad_output.reshape(-1, grad_output.size(-1))
+            grad_input = grad_output.new_zeros([msk.size(0), grad_output.size(-1)])
+            grad_input[valid] = grad_output[msk[valid]]
         return grad_input, None, None
 
 
@@ -94,7 +137,14 @@ class UnpadInput(torch.autograd.Function):
         ctx.save_for_backward(msk)
         ctx.shape = input.shape
 
-        output = input[msk, :]
+        if msk.dtype == torch.bool:
+            output = input[msk, :]
+        else:
+            # msk is the index of the token of every slot, -1 for the padding
+            valid = msk >= 0
+            input = input.reshape(-1, input.size(-1))
+            output = input.new_zeros([msk.size(0), input.size(-1)])
+            output[valid] = input[msk[valid]]
         return output
 
     @staticmethod
@@ -102,7 +152,11 @@ class UnpadInput(torch.autograd.Function):
         (msk,) = ctx.saved_tensors
 
         grad_input = grad_output.new_zeros(ctx.shape)
-        grad_input[msk, :] = grad_output
+        if msk.dtype == torch.bool:
+            grad_input[msk, :] = grad_output
+        else:
+            valid = msk >= 0
+            grad_input.view(-1, grad_output.size(-1))[msk[valid]] = grad_output[valid]
 
         return grad_input, None
 
@@ -771,6 +825,7 @@ class BertEmbeddings(BlockedModule):
         past_key_values_length=0,
     ):
         assert past_key_values_length == 0, "past_key_values_length != 0 Not supported"
+        packed_position_ids = position_ids
         if input_ids is not None:
             input_shape = input_ids.size()
             input_ids = self.get_blocked_tensor(
@@ -841,6 +896,54 @@ class BertEmbeddings(BlockedModule):
         # embeddings = inputs_embeds + position_embeddings + token_type_embeddings
         # embeddings = self.LayerNorm(embeddings)
         # embeddings = self.dropout(embeddings)
+        # the encoder finds the sequences packed in the rows from the positions
+        embeddings.packed_position_ids = packed_position_ids
+        return embeddings
+
+
+class RobertaEmbeddings(BertEmbeddings):
+    """The embeddings of RoBERTa and XLM-R, whose positions start after the padding index."""
+
+    def __init__(self, config, position_ids_persistent=False):
+        super().__init__(config, position_ids_persistent=position_ids_persistent)
+        self.padding_idx = config.pad_token_id
+
+    def forward(
+        self,
+        input_ids=None,
+        token_type_ids=None,
+        position_ids=None,
+        inputs_embeds=None,
+        past_key_values_length=0,
+    ):
+        if position_ids is not None and position_ids.min() < self.padding_idx:
+            raise ValueError(
+                "The positions of RoBERTa start from pad_token_id + 1, please pack the sequences with "
+                + "PackedSequenceDataset(..., position_offset=config.pad_token_id + 1)."
+            )
+        # the packed sequences are found from the positions starting from 0
+        positions = (
+            None if position_ids is None else position_ids - (self.padding_idx + 1)
+        )
+        if position_ids is None:
+            if input_ids is not None:
+                mask = input_ids.ne(self.padding_idx).int()
+                position_ids = (
+                    torch.cumsum(mask, dim=1).type_as(mask) * mask
+                ).long() + self.padding_idx
+            else:
+                S = inputs_embeds.size(1)
+                position_ids = torch.arange(
+                    self.padding_idx + 1, S + self.padding_idx + 1
+                ).expand(inputs_embeds.size()[:-1])
+        embeddings = super().forward(
+            input_ids,
+            token_type_ids,
+            position_ids,
+            inputs_embeds,
+            past_key_values_length,
+        )
+        embeddings.packed_position_ids = positions
         return embeddings
 
 
@@ -1030,7 +1133,11 @@ class BertEncoder(nn.Module):
         output_attentions=False,
         output_hidden_states=False,
         return_dict=True,
+        position_ids=None,
     ):
+        # The positions of the packed sequences, from the embeddings by default
+        if position_ids is None:
+            position_ids = getattr(hidden_states, "packed_position_ids", None)
         all_hidden_states = () if output_hidden_states else None
         all_self_attentions = () if output_attentions else None
         all_cross_attentions = (
@@ -1043,7 +1150,7 @@ class BertEncoder(nn.Module):
         padded_shape = hidden_states.shape
         # print_grad_hook(hidden_states, 'BertEncoder:hidden_states')
         msk, attention_mask, seq_offsets, seq_sqr_offsets = generate_mask(
-            attention_mask
+            attention_mask, position_ids
         )
         hidden_states = UnpadInput.apply(hidden_states, msk)
 
@@ -1181,6 +1288,194 @@ class BertLMPredictionHead(nn.Module):
         return hidden_states
 
 
+# The rows of the hidden states of the transformers encoder layers are padded
+# to blocks of ENCODER_SEQ_BLOCK rows for the TPP modules
+ENCODER_SEQ_BLOCK = 32
+
+
+def _block_rows(hidden_states, signature, head_size):
+    dtype = hidden_states.dtype
+    hidden_states = hidden_states.reshape(-1, hidden_states.size(-1))
+    pad = -hidden_states.size(0) % ENCODER_SEQ_BLOCK
+    if pad > 0:
+        hidden_states = torch.nn.functional.pad(hidden_states, (0, 0, 0, pad))
+    return BlockedTensor(
+        BlockedModule.get_blocked_tensor(
+            hidden_states, signature, [ENCODER_SEQ_BLOCK, head_size]
+        ),
+        signature,
+        dtype,
+    )
+
+
+def _unblock_rows(hidden_states, shape):
+    hidden_states = hidden_states.unblocked_tensor()
+    return hidden_states[: shape[:-1].numel()].view(
+        list(shape[:-1]) + [hidden_states.size(-1)]
+    )
+
+
+class EncoderSelfAttention(BertSelfAttention):
+    """The TPP self-attention of an encoder layer on [B, S, F] hidden states with an additive mask of the keys."""
+
+    def forward(
+        self,
+        hidden_states,
+        attention_mask=None,
+        head_mask=None,
+        encoder_hidden_states=None,
+        encoder_attention_mask=None,
+        past_key_value=None,
+        output_attentions=False,
+        **kwargs,
+    ):
+        assert encoder_hidden_states is None, "cross attention not supported"
+        assert head_mask is None, "head_mask not supported"
+        assert not output_attentions, "output_attentions not supported"
+        B, S, _ = hidden_states.shape
+        if attention_mask is None:
+            attention_mask = hidden_states.new_zeros([B, S], dtype=torch.float)
+        else:
+            # the mask of the keys is the same for all the queries of an encoder
+            if attention_mask.dim() == 4:
+                attention_mask = attention_mask[:, 0, 0, :]
+            attention_mask = attention_mask.expand([B, S]).float()
+        # every sample is a sequence at the start of a block of the unpadded input
+        msk, attention_mask, seq_offsets = generate_packed_mask(
+            attention_mask, torch.arange(S).expand([B, S]), ENCODER_SEQ_BLOCK
+        )
+        seq_sqr_offsets = (seq_offsets * seq_offsets).cumsum(dim=0)
+        seq_offsets = seq_offsets.cumsum(dim=0)
+        context_layer = super().forward(
+            _block_rows(
+                UnpadInput.apply(hidden_states, msk),
+                self.blocked_input_signature,
+                self.attention_head_size,
+            ),
+            attention_mask,
+            seq_offsets=seq_offsets,
+            seq_sqr_offsets=seq_sqr_offsets,
+        )[0]
+        context_layer = PadInput.apply(
+            context_layer.unblocked_tensor(), msk, hidden_states.shape
+        )
+        return (context_layer,)
+
+
+class ViTSelfAttention(EncoderSelfAttention):
+    def forward(self, hidden_states, head_mask=None, output_attentions=False, **kwargs):
+        return super().forward(
+            hidden_states, head_mask=head_mask, output_attentions=output_attentions
+        )
+
+
+class EncoderIntermediate(BertIntermediate):
+    """The TPP dense and GELU of an encoder layer on [B, S, F] hidden states."""
+
+    def forward(self, hidden_states):
+        shape = hidden_states.shape
+        hidden_states = super().forward(
+            _block_rows(
+                hidden_states, self.blocked_input_signature, self.attention_head_size
+            )
+        )
+        return _unblock_rows(hidden_states, shape)
+
+
+class EncoderOutput(BertOutputBase):
+    """The TPP dense, dropout, residual and LayerNorm of an encoder layer on [B, S, F] hidden states."""
+
+    def __init__(self, config, selfOutput=False):
+        super().__init__(config, selfOutput)
+
+    def forward(self, hidden_states, input_tensor):
+        shape = input_tensor.shape
+        hidden_states = super().forward(
+            _block_rows(
+                hidden_states, self.blocked_input_signature, self.attention_head_size
+            ),
+            _block_rows(
+                input_tensor, self.blocked_input_signature, self.attention_head_size
+            ),
+        )
+        return _unblock_rows(hidden_states, shape)
+
+
+class EncoderSelfOutput(EncoderOutput):
+    def __init__(self, config):
+        super().__init__(config, True)
+
+
+# The TPP modules of the modules of the transformers encoder layers, by class
+# name. The disentangled attention of DeBERTa and the outputs of the
+# pre-LayerNorm layers of ViT without LayerNorm have no fused kernel.
+_TPP_ENCODER_MODULES = {}
+for prefix in ["Bert", "Roberta", "XLMRoberta", "Camembert"]:
+    _TPP_ENCODER_MODULES[prefix + "SelfAttention"] = EncoderSelfAttention
+    _TPP_ENCODER_MODULES[prefix + "SdpaSelfAttention"] = EncoderSelfAttention
+    _TPP_ENCODER_MODULES[prefix + "SelfOutput"] = EncoderSelfOutput
+    _TPP_ENCODER_MODULES[prefix + "Intermediate"] = EncoderIntermediate
+    _TPP_ENCODER_MODULES[prefix + "Output"] = EncoderOutput
+for prefix in ["Deberta", "DebertaV2"]:
+    _TPP_ENCODER_MODULES[prefix + "SelfOutput"] = EncoderSelfOutput
+    _TPP_ENCODER_MODULES[prefix + "Intermediate"] = EncoderIntermediate
+    _TPP_ENCODER_MODULES[prefix + "Output"] = EncoderOutput
+_TPP_ENCODER_MODULES["ViTSelfAttention"] = ViTSelfAttention
+_TPP_ENCODER_MODULES["ViTSdpaSelfAttention"] = ViTSelfAttention
+_TPP_ENCODER_MODULES["ViTIntermediate"] = EncoderIntermediate
+
+
+def _tpp_module_supported(module, tpp_cls, config):
+    if issubclass(tpp_cls, EncoderSelfAttention):
+        return (
+            getattr(module, "position_embedding_type", "absolute") == "absolute"
+            and not getattr(config, "is_decoder", False)
+            and all(
+                getattr(module, name).bias is not None
+                for name in ["query", "key", "value"]
+            )
+        )
+    if issubclass(tpp_cls, EncoderIntermediate):
+        return getattr(config, "hidden_act", None) in ["gelu", "gelu_new"]
+    return True
+
+
+def build_tpp_encoder_layer(layer, config):
+    r"""
+    Replace the modules of a transformers encoder layer by the TPP modules
+    with the same computation: the self-attention, the intermediate dense and
+    GELU, and the dense, dropout, residual and LayerNorm of the outputs run
+    the fused kernels of ``fast_bert`` on blocked weights. The modules without
+    a fused kernel, like the disentangled attention of DeBERTa or the outputs
+    of the pre-LayerNorm layers of ViT, are kept.
+
+    Args:
+        layer (torch.nn.Module): An encoder layer of BERT, RoBERTa, XLM-R,
+            DeBERTa, DeBERTa-v2 or ViT.
+        config (transformers.PretrainedConfig): The config of the model.
+
+    Returns:
+        int: The number of the replaced modules.
+    """
+
+    num_replaced = 0
+    for name, module in list(layer.named_modules()):
+        tpp_cls = _TPP_ENCODER_MODULES.get(type(module).__name__)
+        if (
+            tpp_cls is None
+            or isinstance(module, BlockedModule)
+            or not _tpp_module_supported(module, tpp_cls, config)
+        ):
+            continue
+        tpp_module = tpp_cls(config)
+        tpp_module.load_state_dict(module.state_dict())
+        tpp_module.train(module.training)
+        parent_name, _, child_name = name.rpartition(".")
+        setattr(layer.get_submodule(parent_name), child_name, tpp_module)
+        num_replaced += 1
+    return num_replaced
+
+
 # bm_default_blocking_factors = BlockedModule.default_blocking_factors
 # @staticmethod
 # def custom_blocking_factors(S):
@@ -1199,7 +1494,10 @@ def block(model):
 def fast_bert(model, dtype=torch.float, optimizer=None, unpad=False):
     r"""
     Use TPP to speedup training/inference. fast_bert API is still a prototype
-    feature and now only optimized for bert model.
+    feature and now only optimized for bert model. The embeddings and the
+    encoder of RoBERTa and XLM-R models are replaced as for BERT, and the
+    modules of the encoder layers of DeBERTa and ViT models with a fused
+    kernel are replaced by ``build_tpp_encoder_layer``.
 
     Args:
         model (torch.nn.Module): User model to apply optimizations on.
@@ -1211,6 +1509,18 @@ def fast_bert(model, dtype=torch.float, optimizer=None, unpad=False):
         seed(string): The seed used for the libxsmm kernel. In general it should be same
             to the torch.seed
 
+    .. note::
+
+        Several short sequences can be packed in a row to train on fewer
+        padding tokens, e.g. with the rows of
+        ``ipex.cpu.tpp.PackedSequenceDataset``: the ``position_ids`` of a row
+        restart from 0 at every sequence, or from ``config.pad_token_id + 1``
+        for RoBERTa and XLM-R, and the tokens of a sequence only attend to the
+        tokens of the same sequence. Every sequence is padded
+        to the blocks of the attention kernel, of 64 tokens for the usual
+        sequence lengths. Only token-level objectives like masked language
+        modeling are supported with packed rows.
+
     .. note::
 
         Currently ``ipex.fast_bert`` API is well optimized for training tasks.
@@ -1304,6 +1614,10 @@ def fast_bert(model, dtype=torch.float, optimizer=None, unpad=False):
         unpad = True
     else:
         unpad = False
+    # the base model of the task models of transformers, e.g. model.roberta
+    base_model = getattr(new_model, "base_model", new_model)
+    config = getattr(base_model, "config", None)
+    encoder = getattr(base_model, "encoder", None)
     if isinstance(model, transformers.models.bert.modeling_bert.BertModel):
         assert isinstance(
             new_model.embeddings, transformers.models.bert.modeling_bert.BertEmbeddings
@@ -1329,9 +1643,20 @@ def fast_bert(model, dtype=torch.float, optimizer=None, unpad=False):
             new_model.bert.encoder, transformers.models.bert.modeling_bert.BertEncoder
         )
         new_model.bert.encoder = BertEncoder(model.bert.config)
+    elif getattr(config, "model_type", None) in ["roberta", "xlm-roberta", "camembert"]:
+        # the layers of RoBERTa and XLM-R are the same as BERT
+        base_model.embeddings = RobertaEmbeddings(
+            config, position_ids_persistent=position_ids_persistent
+        )
+        base_model.encoder = BertEncoder(config)
+    elif (
+        isinstance(getattr(encoder, "layer", None), nn.ModuleList)
+        and sum(build_tpp_encoder_layer(layer, config) for layer in encoder.layer) > 0
+    ):
+        pass
     else:
         logger.warning(
-            "fast_bert only supports instance of transformers.models.bert.modeling_bert.BertModel",
+            "fast_bert only supports the BERT, RoBERTa, XLM-R, DeBERTa and ViT models of transformers",
             _type=WarningType.NotSupported,
         )
         return model, optimizer
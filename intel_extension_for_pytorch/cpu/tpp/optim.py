@@ -1,4 +1,7 @@
+import contextlib
+import functools
 import math
+from collections import defaultdict
 from typing import Callable, Iterable, Tuple
 import torch
 from torch.optim import Optimizer
@@ -493,6 +496,17 @@ class DistLamb(Optimizer):
         weight_decay (float, optional): weight decay (L2 penalty) (default: 0)
         adam (bool, optional): always use trust ratio = 1, which turns this into
             Adam. Useful for comparison purposes.
+        overlap_allreduce (bool, optional): all-reduce the gradients by buckets
+            from autograd hooks as soon as the gradients of a bucket are ready,
+            overlapped with the rest of the backward. The pending all-reduces
+            are waited for by :meth:`step` and :meth:`acc_and_zero_grad`, and
+            skipped in :meth:`no_sync`. (default: False)
+        bucket_size_mb (float, optional): size of the gradient buckets of
+            ``overlap_allreduce`` in MB (default: 25)
+        shard_states (bool, optional): shard the moments of Lamb across the
+            ranks as ZeRO-1 does: every rank updates its shard of the flat
+            weights with the global norms, then the weights are all-gathered.
+            (default: False)
 
     .. _Large Batch Optimization for Deep Learning: Training BERT in 76 minutes:
         https://arxiv.org/abs/1904.00962
@@ -510,6 +524,9 @@ class DistLamb(Optimizer):
         block_size=1024,
         perform_allreduce=False,
         fused_param_norm=True,
+        overlap_allreduce=False,
+        bucket_size_mb=25,
+        shard_states=False,
     ):
         if not 0.0 <= lr:
             raise ValueError("Invalid learning rate: {}".format(lr))
@@ -529,12 +546,19 @@ class DistLamb(Optimizer):
             and torch.distributed.get_world_size() > 1
         )
         self.fused_param_norm = fused_param_norm
+        self.overlap_allreduce = overlap_allreduce and self.distributed
+        self.bucket_size = int(bucket_size_mb * 1024 * 1024)
+        self.shard_states = shard_states and self.distributed
+        self._sync_enabled = True
+        self._buckets = []
         self._acc_steps = 0
         self._one_time_setup_done = False
         super(DistLamb, self).__init__(params, defaults)
 
     class FlatBuffer:
-        def __init__(self, param_list, group, dtype, block_size):
+        def __init__(
+            self, param_list, group, dtype, block_size, num_shards=1, shard_id=0
+        ):
             self.param_list = param_list
             self.group = group
             self.dtype = dtype
@@ -566,14 +590,29 @@ class DistLamb(Optimizer):
                 total_size += aligned_sz
                 p_i += 1
 
+            # With sharded states, the buffers are padded to the same number of
+            # blocks per rank, the padding blocks being zeros of the last param.
+            total_blocks = total_size // self.block_size
+            padded_blocks = -(-total_blocks // num_shards) * num_shards
+            block2param += [p_i - 1] * (padded_blocks - total_blocks)
+            block_sizes += [self.block_size] * (padded_blocks - total_blocks)
+            total_size = padded_blocks * self.block_size
+            shard_size = total_size // num_shards
+            self.shard = slice(shard_id * shard_size, (shard_id + 1) * shard_size)
+            state_size = total_size if num_shards == 1 else shard_size
+
             self._flat_w = torch.zeros([total_size], dtype=dtype)
             self._flat_g = torch.zeros([total_size], dtype=dtype)
-            self._flat_m = torch.zeros([total_size], dtype=dtype)
-            self._flat_v = torch.zeros([total_size], dtype=dtype)
-            self._flat_u = torch.zeros([total_size], dtype=dtype)
+            self._flat_m = torch.zeros([state_size], dtype=dtype)
+            self._flat_v = torch.zeros([state_size], dtype=dtype)
+            # The sharded step computes the updates of its shard on the fly
+            if num_shards == 1:
+                self._flat_u = torch.zeros([state_size], dtype=dtype)
+            else:
+                self._flat_u = torch.zeros([0], dtype=dtype)
             self._flat_ag = torch.zeros([total_size], dtype=dtype)
             if dtype == torch.bfloat16:
-                self._flat_wl = torch.zeros([total_size], dtype=dtype)
+                self._flat_wl = torch.zeros([state_size], dtype=dtype)
             else:
                 self._flat_wl = torch.zeros([0])
             self._param_sizes = torch.tensor(size_array, dtype=torch.long)
@@ -594,11 +633,23 @@ class DistLamb(Optimizer):
                 else:
                     p.grad = self._flat_g[s:e].view_as(p.data).copy_(p.grad.data)
 
+    class GradBucket:
+        def __init__(self, grad, num_params):
+            # a contiguous range of the flat gradients of the params
+            self.grad = grad
+            self.num_params = num_params
+            self.num_ready = 0
+            self.work = None
+            self.reduced = False
+
     def _one_time_setup(self):
         if self._one_time_setup_done is True:
             return
-        from collections import defaultdict
 
+        num_shards, shard_id = 1, 0
+        if self.shard_states:
+            num_shards = torch.distributed.get_world_size()
+            shard_id = torch.distributed.get_rank()
         self.flat_params = []
         for group in self.param_groups:
             model_params = defaultdict(list)
@@ -609,13 +660,76 @@ class DistLamb(Optimizer):
                 dt = p.dtype
                 model_params[dt].append(p)
             for dt, param_list in model_params.items():
-                flat_buf = self.FlatBuffer(param_list, group, dt, self.block_size)
+                flat_buf = self.FlatBuffer(
+                    param_list, group, dt, self.block_size, num_shards, shard_id
+                )
                 self.flat_params.append(flat_buf)
+        if self.overlap_allreduce:
+            self._setup_buckets()
 
         self._step = 0
         self._acc_steps = 0
         self._one_time_setup_done = True
 
+    def _setup_buckets(self):
+        # The params are bucketed in the reverse order, the order in which
+        # their gradients are usually ready in the backward.
+        self._buckets = []
+        for fp in self.flat_params:
+            offsets = fp._offsets.tolist()
+            end = len(fp.param_list)
+            for i in reversed(range(len(fp.param_list))):
+                size = (offsets[end] - offsets[i]) * fp._flat_g.element_size()
+                if i > 0 and size < self.bucket_size:
+                    continue
+                bucket = self.GradBucket(fp._flat_g[offsets[i] : offsets[end]], end - i)
+                for p in fp.param_list[i:end]:
+                    p.register_post_accumulate_grad_hook(
+                        functools.partial(self._grad_ready, bucket)
+                    )
+                self._buckets.append(bucket)
+                end = i
+
+    def _grad_ready(self, bucket, param):
+        if not self._sync_enabled or bucket.reduced:
+            return
+        bucket.num_ready += 1
+        if bucket.num_ready == bucket.num_params:
+            self._reduce_bucket(bucket)
+
+    def _reduce_bucket(self, bucket):
+        bucket.grad.div_(torch.distributed.get_world_size())
+        bucket.work = torch.distributed.all_reduce(bucket.grad, async_op=True)
+        bucket.reduced = True
+
+    def _finish_grad_sync(self):
+        # Reduce the buckets whose gradients were not all ready, e.g. unused
+        # params or backward in no_sync, then wait for all of them.
+        for bucket in self._buckets:
+            if not bucket.reduced:
+                self._reduce_bucket(bucket)
+        for bucket in self._buckets:
+            bucket.work.wait()
+            bucket.work = None
+            bucket.reduced = False
+            bucket.num_ready = 0
+
+    @contextlib.contextmanager
+    def no_sync(self):
+        r"""
+        Skip the all-reduces of ``overlap_allreduce`` in the backward passes
+        run in this context, e.g. to accumulate the gradients of several
+        micro-batches without :meth:`zero_grad`. The accumulated gradients are
+        all-reduced by the first backward out of it or by :meth:`step`.
+        """
+
+        sync_enabled = self._sync_enabled
+        self._sync_enabled = False
+        try:
+            yield
+        finally:
+            self._sync_enabled = sync_enabled
+
     def clip_grad_norm_(self, max_norm, norm_type=2):
         if hasattr(self, "flat_params"):
             grads = [fp._flat_g for fp in self.flat_params]
@@ -628,11 +742,11 @@ class DistLamb(Optimizer):
             return
         if hasattr(self, "flat_params"):
             for fp in self.flat_params:
-                torch.distributed.broadcase(fp._flat_w.data, 0)
+                torch.distributed.broadcast(fp._flat_w.data, 0)
         else:
             for group in self.param_groups:
                 for p in group["params"]:
-                    torch.distributed.broadcase(p.data, 0)
+                    torch.distributed.broadcast(p.data, 0)
 
     def sync_grads(self):
         if not self.distributed:
@@ -655,6 +769,9 @@ class DistLamb(Optimizer):
 
     def acc_and_zero_grad(self):
         self._one_time_setup()
+        if self.overlap_allreduce:
+            # the accumulated gradients are already all-reduced
+            self._finish_grad_sync()
         if hasattr(self, "flat_params"):
             for fp in self.flat_params:
                 fp._flat_ag.add_(fp._flat_g)
@@ -699,10 +816,18 @@ class DistLamb(Optimizer):
         self._one_time_setup()
         self._step += 1
         self.state[self.param_groups[0]["params"][0]]["step"] = self._step
+        if self.overlap_allreduce:
+            self._finish_grad_sync()
         self.merge_acc_grad()
-        if self.perform_allreduce:
+        if self.perform_allreduce and not self.overlap_allreduce:
             self.sync_grads()
 
+        if self.shard_states:
+            works = [self._sharded_step(fp) for fp in self.flat_params]
+            for work in works:
+                work.wait()
+            return loss
+
         for ii, fp in enumerate(self.flat_params):
             group = fp.group
             beta1, beta2 = group["betas"]
@@ -737,3 +862,61 @@ class DistLamb(Optimizer):
             #   {fp._weight_norms[0].sqrt().item():.10f}  un: {fp._update_norms[0].sqrt().item():.10f}")
 
         return loss
+
+    def _sharded_step(self, fp):
+        r"""
+        The update of ``tpp_fused_lamb_v2`` on the shard of the flat buffer of
+        this rank, with the norms of the weights and of the updates reduced
+        across the ranks before applying the trust ratios. Returns the work of
+        the all-gather of the updated weights.
+        """
+
+        group = fp.group
+        beta1, beta2 = group["betas"]
+        lr = group["lr"]
+        eps = group["eps"]
+        weight_decay = group["weight_decay"]
+        w = fp._flat_w[fp.shard]
+        g = fp._flat_g[fp.shard].float()
+        m = fp._flat_m.float().mul_(beta1).add_(g, alpha=1.0 - beta1)
+        v = fp._flat_v.float().mul_(beta2).addcmul_(g, g, value=1.0 - beta2)
+        fp._flat_m.copy_(m)
+        fp._flat_v.copy_(v)
+        b1_scale = 1.0 / (1.0 - beta1**self._step)
+        b2_scale = 1.0 / (1.0 - beta2**self._step)
+        u = (m * b1_scale) / ((v * b2_scale).sqrt() + eps)
+        num_blocks = w.numel() // fp.block_size
+        trust_ratio = torch.ones(num_blocks, 1)
+        if weight_decay > 0.0:
+            u.add_(w.float(), alpha=weight_decay)
+            start = fp.shard.start // fp.block_size
+            b2p = fp._block2param[start : start + num_blocks].long() + 1
+            norms = torch.zeros(2, fp._weight_norms.numel(), dtype=torch.double)
+            for i, t in enumerate([w.float(), u]):
+                block_norms = t.view(num_blocks, -1).double().pow(2).sum(1)
+                norms[i].index_add_(0, b2p, block_norms)
+                norms[i, 0] = block_norms.sum()
+            torch.distributed.all_reduce(norms)
+            fp._weight_norms.copy_(norms[0])
+            fp._update_norms.copy_(norms[1])
+            if self.fused_param_norm:
+                weight_norm, adam_norm = norms[:, :1].expand(2, num_blocks).sqrt()
+            else:
+                weight_norm, adam_norm = norms[:, b2p].sqrt()
+            trust_ratio = torch.where(
+                (weight_norm != 0) & (adam_norm != 0), weight_norm / adam_norm, 1.0
+            ).view(num_blocks, 1)
+        update = u.view(num_blocks, -1).mul_(trust_ratio.float() * -lr).view(-1)
+        if w.dtype == torch.bfloat16:
+            # the weights are split into their bf16 top half in w and the
+            # trailing bits of their fp32 values in _flat_wl
+            w_fp32 = torch.ops.torch_ipex.cat_bfloat16_float(w, fp._flat_wl)
+            w_fp32.add_(update)
+            top, trail = torch.ops.torch_ipex.split_float_bfloat16(w_fp32)
+            w.copy_(top)
+            fp._flat_wl.copy_(trail)
+        else:
+            w.add_(update.to(w.dtype))
+        return torch.distributed.all_gather_into_tensor(
+            fp._flat_w, w.clone(), async_op=True
+        )
@@ -0,0 +1,127 @@
+import torch
+from ...utils._logger import logger, WarningType
+
+
+def pack_sequences(lengths, max_seq_len):
+    r"""
+    Pack sequences into rows of at most ``max_seq_len`` tokens with the
+    best-fit decreasing heuristic: the sequences are placed from the longest
+    to the shortest, each one into the row with the least room left that it
+    fits in.
+
+    Args:
+        lengths (list): The number of tokens of every sequence.
+        max_seq_len (int): The number of tokens of a row.
+
+    Returns:
+        list: The indices of the sequences of every row.
+    """
+
+    rows = []
+    # the indices of the rows by the number of tokens left
+    rows_by_room = [[] for _ in range(max_seq_len + 1)]
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        length = lengths[i]
+        assert (
+            0 < length <= max_seq_len
+        ), f"Sequence {i} of {length} tokens can't be packed into rows of {max_seq_len} tokens."
+        for room in range(length, max_seq_len + 1):
+            if rows_by_room[room]:
+                r = rows_by_room[room].pop()
+                break
+        else:
+            room = max_seq_len
+            r = len(rows)
+            rows.append([])
+        rows[r].append(i)
+        rows_by_room[room - length].append(r)
+    return rows
+
+
+class PackedSequenceDataset(torch.utils.data.Dataset):
+    r"""
+    A dataset of the rows of ``max_seq_len`` tokens into which the samples of
+    ``dataset`` are packed by :func:`pack_sequences`, to train ``fast_bert``
+    on several short sequences per row instead of one padded sequence.
+
+    Every row is a dict with the token-level fields of its samples
+    concatenated and padded at the end: ``labels`` is padded with -100 and
+    the other fields with ``pad_token_id``. The ``position_ids`` restart from
+    ``position_offset`` at every sequence of the row, and the
+    ``attention_mask`` is 0 for the padding only. The encoder of ``fast_bert`` finds the sequences of the rows
+    from the ``position_ids`` and the tokens of a sequence only attend to the
+    tokens of the same sequence.
+
+    .. note::
+
+        Only the fields with one value per token are packed, so the rows work
+        for token-level objectives like masked language modeling. Per-sample
+        fields like ``next_sentence_label`` are dropped.
+
+    Args:
+        dataset (torch.utils.data.Dataset): A dataset of dicts with unpadded
+            ``input_ids``, and optionally other token-level fields like
+            ``token_type_ids`` and ``labels``.
+        max_seq_len (int): The number of tokens of a row.
+        lengths (list): The number of tokens of every sample. The default is
+            to read the lengths of the ``input_ids`` of the samples.
+        pad_token_id (int): The value to pad the fields other than ``labels``.
+        position_offset (int): The position of the first token of a sequence.
+            The positions of RoBERTa and XLM-R start after the padding index,
+            i.e. from ``config.pad_token_id + 1``. The default is 0, as for
+            BERT.
+    """
+
+    def __init__(
+        self, dataset, max_seq_len, lengths=None, pad_token_id=0, position_offset=0
+    ):
+        self.dataset = dataset
+        self.max_seq_len = max_seq_len
+        self.pad_token_id = pad_token_id
+        self.position_offset = position_offset
+        if lengths is None:
+            lengths = [len(dataset[i]["input_ids"]) for i in range(len(dataset))]
+        self.rows = pack_sequences(lengths, max_seq_len)
+        self.dropped_keys = set()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        samples = [self.dataset[i] for i in self.rows[index]]
+        fields = {}
+        for sample in samples:
+            length = len(sample["input_ids"])
+            for key, value in sample.items():
+                if key in ("position_ids", "attention_mask"):
+                    continue
+                value = torch.as_tensor(value)
+                if value.dim() == 0 or value.size(0) != length:
+                    if key not in self.dropped_keys:
+                        self.dropped_keys.add(key)
+                        logger.warning(
+                            f"The field {key} doesn't have one value per token, it's dropped from the packed rows.",
+                            _type=WarningType.NotSupported,
+                        )
+                    continue
+                fields.setdefault(key, []).append(value)
+            fields.setdefault("position_ids", []).append(
+                torch.arange(length) + self.position_offset
+            )
+        num_tokens = sum(len(sample["input_ids"]) for sample in samples)
+        row = {}
+        for key, values in fields.items():
+            pad_value = -100 if key == "labels" else self.pad_token_id
+            if key == "position_ids":
+                pad_value = self.position_offset
+            value = torch.cat(values)
+            # pad the first dim
+            row[key] = torch.nn.functional.pad(
+                value,
+                (0, 0) * (value.dim() - 1) + (0, self.max_seq_len - num_tokens),
+                value=pad_value,
+            )
+        row["attention_mask"] = (torch.arange(self.max_seq_len) < num_tokens).to(
+            torch.long
+        )
+        return row
@@ -0,0 +1,70 @@
+import threading
+import weakref
+
+import psutil
+
+
+def _sample_loop(tracker_ref, interval):
+    while True:
+        tracker = tracker_ref()
+        # Stop when the tracker is stopped or dropped, e.g. by an exception
+        # raised by the tracked code
+        if tracker is None or tracker._stopped.is_set():
+            return
+        tracker.sample()
+        stopped = tracker._stopped
+        del tracker
+        stopped.wait(interval)
+
+
+class PeakMemoryTracker(object):
+    r"""
+    Track the peak resident memory (RSS) of the current process between
+    :meth:`start` and :meth:`stop`, sampling it in a background thread every
+    ``interval`` seconds and on every :meth:`sample` call.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.start_rss = 0
+        self.peak_rss = 0
+        self.end_rss = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss = self.process.memory_info().rss
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def start(self):
+        self.start_rss = self.sample()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=_sample_loop, args=(weakref.ref(self), self.interval), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.end_rss = self.sample()
+        return self.stats
+
+    @property
+    def stats(self):
+        r"""
+        ``start_rss``, ``peak_rss`` and ``end_rss`` in bytes, and the
+        ``peak_overhead`` of the peak over the memory at the start.
+        """
+
+        return {
+            "start_rss": self.start_rss,
+            "peak_rss": self.peak_rss,
+            "end_rss": self.end_rss,
+            "peak_overhead": self.peak_rss - self.start_rss,
+        }
@@ -1 +1,10 @@
-from .dist import all_gather, all_reduce, all_gather_into_tensor, init_process_group
+from .dist import (
+    all_gather,
+    all_reduce,
+    all_gather_into_tensor,
+    all_to_all_single,
+    broadcast,
+    reduce_scatter_tensor,
+    init_process_group,
+)
+from .shm import ProcessGroupSHM, SHM_BACKEND
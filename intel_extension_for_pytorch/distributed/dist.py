@@ -3,6 +3,9 @@ from intel_extension_for_pytorch.transformers.models.cpu.distributed.dist import
     all_reduce_cpu,
     all_gather_cpu,
     all_gather_into_tensor_cpu,
+    all_to_all_single_cpu,
+    broadcast_cpu,
+    reduce_scatter_tensor_cpu,
 )
 import torch
 from torch.distributed import Backend, default_pg_timeout, Store, ReduceOp
@@ -101,6 +104,8 @@ def init_process_group(
         "cpu:gloo,cuda:custom_backend".
     .. note:: To enable backend ``ccl``, oneccl_bindings_for_pytorch needs to be installed
         and it will be imported automatically.
+    .. note:: Backend ``ipex_shm`` runs the collectives of the ranks of a single node
+        through shared memory, see :class:`ProcessGroupSHM`.
     """
     if backend == "ccl":
         try:
@@ -261,3 +266,117 @@ def all_gather_into_tensor(output_tensor, input_tensor, group=None, async_op=Fal
     """
     f = _get_function_from_device(output_tensor.device.type, all_gather_into_tensor)
     return f(output_tensor, input_tensor, group, async_op)
+
+
+def reduce_scatter_tensor(output, input, op=ReduceOp.SUM, group=None, async_op=False):
+    """
+    Reduces, then scatters a tensor to all ranks in a group.
+    Args:
+        output (Tensor): Output tensor. It should have the same size across all
+            ranks.
+        input (Tensor): Input tensor to be reduced and scattered. Its size
+            should be output tensor size times the world size. The input tensor
+            can have one of the following shapes:
+            (i) a concatenation of the output tensors along the primary
+            dimension, or
+            (ii) a stack of the output tensors along the primary dimension.
+        op (optional): One of the values from
+            ``torch.distributed.ReduceOp``
+            enum.  Specifies an operation used for element-wise reductions.
+        group (ProcessGroup, optional): The process group to work on. If None,
+            the default process group will be used.
+        async_op (bool, optional): Whether this op should be an async op.
+    Returns:
+        Async work handle, if async_op is set to True.
+        None, if not async_op or if not part of the group.
+    Examples:
+        >>> # xdoctest: +SKIP("need process group init")
+        >>> # We have two ranks.
+        >>> tensor_in = torch.arange(4, dtype=torch.int64) + 4 * rank
+        >>> tensor_in
+        tensor([0, 1, 2, 3]) # Rank 0
+        tensor([4, 5, 6, 7]) # Rank 1
+        >>> tensor_out = torch.zeros(2, dtype=torch.int64)
+        >>> dist.reduce_scatter_tensor(tensor_out, tensor_in)
+        >>> tensor_out
+        tensor([4, 6]) # Rank 0
+        tensor([8, 10]) # Rank 1
+    """
+    f = _get_function_from_device(input.device.type, reduce_scatter_tensor)
+    return f(output, input, op, group, async_op)
+
+
+def all_to_all_single(
+    output,
+    input,
+    output_split_sizes=None,
+    input_split_sizes=None,
+    group=None,
+    async_op=False,
+):
+    """
+    Split the input tensor, scatter the splits to all ranks in the group and
+    concatenate the splits received from all ranks into a single output tensor.
+    Args:
+        output (Tensor): Gathered concatenated output tensor.
+        input (Tensor): Input tensor to scatter.
+        output_split_sizes (list[Int], optional): Output split sizes for dim 0.
+            If None or empty, dim 0 of ``output`` tensor must divide
+            equally by ``world_size``.
+        input_split_sizes (list[Int], optional): Input split sizes for dim 0.
+            If None or empty, dim 0 of ``input`` tensor must divide
+            equally by ``world_size``.
+        group (ProcessGroup, optional): The process group to work on. If None,
+            the default process group will be used.
+        async_op (bool, optional): Whether this op should be an async op
+    Returns:
+        Async work handle, if async_op is set to True.
+        None, if not async_op or if not part of the group
+    Examples:
+        >>> # xdoctest: +SKIP("need process group init")
+        >>> # We have 2 ranks, rank 0 sends 1 element to rank 0 and 2 to rank 1.
+        >>> input = torch.arange(3) + 3 * rank
+        >>> input
+        tensor([0, 1, 2]) # Rank 0
+        tensor([3, 4, 5]) # Rank 1
+        >>> in_splits = [1, 2] if rank == 0 else [2, 1]
+        >>> out_splits = [1, 2] if rank == 0 else [2, 1]
+        >>> output = torch.empty(3, dtype=torch.int64)
+        >>> dist.all_to_all_single(output, input, out_splits, in_splits)
+        >>> output
+        tensor([0, 3, 4]) # Rank 0
+        tensor([1, 2, 5]) # Rank 1
+    """
+    f = _get_function_from_device(input.device.type, all_to_all_single)
+    return f(output, input, output_split_sizes, input_split_sizes, group, async_op)
+
+
+def broadcast(tensor, src, group=None, async_op=False):
+    """
+    Broadcasts the tensor to the whole group.
+    ``tensor`` must have the same number of elements in all processes
+    participating in the collective.
+    Args:
+        tensor (Tensor): Data to be sent if ``src`` is the rank of current
+            process, and tensor to be used to save received data otherwise.
+        src (int): Source rank on global process group (regardless of ``group`` argument).
+        group (ProcessGroup, optional): The process group to work on. If None,
+            the default process group will be used.
+        async_op (bool, optional): Whether this op should be an async op
+    Returns:
+        Async work handle, if async_op is set to True.
+        None, if not async_op or if not part of the group
+    Examples:
+        >>> # xdoctest: +SKIP("need process group init")
+        >>> # We have 2 ranks.
+        >>> tensor = torch.arange(2, dtype=torch.int64) + 1 + 2 * rank
+        >>> tensor
+        tensor([1, 2]) # Rank 0
+        tensor([3, 4]) # Rank 1
+        >>> dist.broadcast(tensor, src=1)
+        >>> tensor
+        tensor([3, 4]) # Rank 0
+        tensor([3, 4]) # Rank 1
+    """
+    f = _get_function_from_device(tensor.device.type, broadcast)
+    return f(tensor, src, group, async_op)
@@ -0,0 +1,527 @@
+import concurrent.futures
+import ctypes
+import errno
+import functools
+import os
+import time
+import uuid
+from datetime import timedelta
+
+import torch
+import torch.distributed as dist
+from torch._utils import _flatten_dense_tensors, _unflatten_dense_tensors
+from torch.distributed import ReduceOp
+
+# Name of the backend for torch.distributed.init_process_group
+SHM_BACKEND = "ipex_shm"
+
+# Bytes of the data and scratch buffers of every rank, the collectives of
+# larger tensors run by chunks of this size
+SHM_BUF_SIZE_ENV = "IPEX_SHM_BUF_SIZE"
+_DEFAULT_SHM_BUF_SIZE = 16 * 1024 * 1024
+
+# All-reduces up to this size are reduced by every rank, without the
+# reduce-scatter + all-gather of the larger ones
+_DIRECT_THRESHOLD = 32 * 1024
+
+_SHM_DIR = "/dev/shm"
+
+_REDUCE_FNS = {
+    ReduceOp.SUM: torch.add,
+    ReduceOp.AVG: torch.add,
+    ReduceOp.PRODUCT: torch.mul,
+    ReduceOp.MIN: torch.minimum,
+    ReduceOp.MAX: torch.maximum,
+}
+
+
+def _check_reduce_op(op, dtype):
+    op = getattr(op, "op", op)
+    if op not in _REDUCE_FNS:
+        raise RuntimeError(f"{SHM_BACKEND} doesn't support the reduce op {op}")
+    if op == ReduceOp.AVG and not (dtype.is_floating_point or dtype.is_complex):
+        raise RuntimeError(f"{SHM_BACKEND} doesn't support ReduceOp.AVG on {dtype}")
+
+
+def _reduce(inputs, output, op):
+    # Reduce the tensors of the ranks into output, in float for the reduced
+    # precision types, in the same order on all ranks.
+    _check_reduce_op(op, output.dtype)
+    op = getattr(op, "op", op)
+    fn = _REDUCE_FNS[op]
+    acc = inputs[0].to(
+        torch.float if output.dtype in [torch.bfloat16, torch.half] else output.dtype,
+        copy=True,
+    )
+    for x in inputs[1:]:
+        fn(acc, x, out=acc)
+    if op == ReduceOp.AVG:
+        acc.div_(len(inputs))
+    output.copy_(acc)
+
+
+def _flat_views(tensor):
+    # A 1D view of tensor, and the tensor to copy it back to if it's a copy
+    if tensor.is_contiguous():
+        return tensor.view(-1), None
+    return tensor.contiguous().view(-1), tensor
+
+
+_PTHREAD_PROCESS_SHARED = 1
+# Bytes reserved for a pthread_mutex_t, a pthread_cond_t and their attributes,
+# larger than their sizes on x86_64 and aarch64
+_PTHREAD_OBJ_SIZE = 64
+
+
+@functools.lru_cache(None)
+def _get_libc():
+    return ctypes.CDLL(None, use_errno=True)
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+class _SharedBarrier(object):
+    r"""
+    A barrier of the processes mapping ``buf``, on a process-shared pthread
+    mutex and condition variable: the waiting processes sleep instead of
+    spinning, and the writes of a process before the barrier are visible to
+    the others after it, the mutex ordering the memory accesses on all the
+    architectures.
+    """
+
+    nbytes = 2 * _PTHREAD_OBJ_SIZE + 16
+
+    def __init__(self, buf, size, timeout):
+        self.libc = _get_libc()
+        self.size = size
+        self.timeout = timeout
+        ptr = buf.data_ptr()
+        self.mutex = ctypes.c_void_p(ptr)
+        self.cond = ctypes.c_void_p(ptr + _PTHREAD_OBJ_SIZE)
+        self.count = ctypes.c_int64.from_address(ptr + 2 * _PTHREAD_OBJ_SIZE)
+        self.generation = ctypes.c_int64.from_address(ptr + 2 * _PTHREAD_OBJ_SIZE + 8)
+
+    def _check(self, ret, fn):
+        if ret != 0:
+            raise RuntimeError(
+                f"{fn} failed in the barrier of {SHM_BACKEND}: {os.strerror(ret)}"
+            )
+
+    def init(self):
+        # Called by one process, before the others map the buffer
+        libc = self.libc
+        attr = ctypes.create_string_buffer(_PTHREAD_OBJ_SIZE)
+        self._check(libc.pthread_mutexattr_init(attr), "pthread_mutexattr_init")
+        libc.pthread_mutexattr_setpshared(attr, _PTHREAD_PROCESS_SHARED)
+        self._check(libc.pthread_mutex_init(self.mutex, attr), "pthread_mutex_init")
+        libc.pthread_mutexattr_destroy(attr)
+        attr = ctypes.create_string_buffer(_PTHREAD_OBJ_SIZE)
+        self._check(libc.pthread_condattr_init(attr), "pthread_condattr_init")
+        libc.pthread_condattr_setpshared(attr, _PTHREAD_PROCESS_SHARED)
+        libc.pthread_condattr_setclock(attr, time.CLOCK_MONOTONIC)
+        self._check(libc.pthread_cond_init(self.cond, attr), "pthread_cond_init")
+        libc.pthread_condattr_destroy(attr)
+        self.count.value = 0
+        self.generation.value = 0
+
+    def wait(self, rank):
+        libc = self.libc
+        deadline = time.clock_gettime(time.CLOCK_MONOTONIC) + self.timeout
+        abstime = _Timespec(int(deadline), int(deadline % 1 * 1e9))
+        self._check(libc.pthread_mutex_lock(self.mutex), "pthread_mutex_lock")
+        try:
+            generation = self.generation.value
+            self.count.value += 1
+            if self.count.value == self.size:
+                self.count.value = 0
+                self.generation.value = generation + 1
+                libc.pthread_cond_broadcast(self.cond)
+                return
+            while self.generation.value == generation:
+                ret = libc.pthread_cond_timedwait(
+                    self.cond, self.mutex, ctypes.byref(abstime)
+                )
+                if ret == errno.ETIMEDOUT:
+                    raise RuntimeError(
+                        f"Rank {rank} timed out in the barrier of {SHM_BACKEND}"
+                    )
+                self._check(ret, "pthread_cond_timedwait")
+        finally:
+            libc.pthread_mutex_unlock(self.mutex)
+
+
+class _SHMBuffer(object):
+    r"""
+    The shared memory of the ranks of a process group on a node: every rank
+    maps a file of ``/dev/shm`` with a data and a scratch buffer, and the
+    files of all the other ranks. The ranks synchronize with a
+    :class:`_SharedBarrier` in the file of rank 0.
+    """
+
+    def __init__(self, store, rank, size, buf_size, timeout):
+        self.rank = rank
+        self.size = size
+        self.buf_size = buf_size
+        # The barrier is in the file of rank 0 and the split sizes of
+        # all_to_all in the file of every rank.
+        self.header_size = (_SharedBarrier.nbytes + 8 * size + 4095) // 4096 * 4096
+        if rank == 0:
+            prefix = f"ipex_shm_{uuid.uuid4().hex}"
+            self.files = self._map_files(prefix)
+            self.shared_barrier = _SharedBarrier(
+                self.files[0], size, timeout.total_seconds()
+            )
+            self.shared_barrier.init()
+            # The other ranks map the files once the barrier is initialized
+            store.set("ipex_shm_prefix", prefix)
+        else:
+            prefix = store.get("ipex_shm_prefix").decode()
+            self.files = self._map_files(prefix)
+            self.shared_barrier = _SharedBarrier(
+                self.files[0], size, timeout.total_seconds()
+            )
+        self.barrier()
+        # Mapped by all the ranks, the memory is released when they exit
+        os.unlink(self._path(prefix, rank))
+
+    def _path(self, prefix, rank):
+        return os.path.join(_SHM_DIR, f"{prefix}_{rank}")
+
+    def _map_files(self, prefix):
+        return [
+            torch.from_file(
+                self._path(prefix, r),
+                shared=True,
+                size=self.header_size + 2 * self.buf_size,
+                dtype=torch.uint8,
+            )
+            for r in range(self.size)
+        ]
+
+    def meta(self, rank):
+        start = _SharedBarrier.nbytes
+        return self.files[rank][start : start + 8 * self.size].view(torch.int64)
+
+    def data(self, rank, dtype, numel, scratch=False):
+        start = self.header_size + (self.buf_size if scratch else 0)
+        nbytes = numel * dtype.itemsize
+        return self.files[rank][start : start + nbytes].view(dtype)
+
+    def chunk_numel(self, dtype, parts=1):
+        return max(1, self.buf_size // (dtype.itemsize * parts))
+
+    def barrier(self):
+        self.shared_barrier.wait(self.rank)
+
+    def allreduce(self, tensor, op):
+        _check_reduce_op(op, tensor.dtype)
+        flat, orig = _flat_views(tensor)
+        n = self.chunk_numel(flat.dtype)
+        for start in range(0, flat.numel(), n):
+            x = flat[start : start + n]
+            m = x.numel()
+            self.data(self.rank, x.dtype, m).copy_(x)
+            self.barrier()
+            inputs = [self.data(r, x.dtype, m) for r in range(self.size)]
+            if m * x.element_size() <= _DIRECT_THRESHOLD:
+                _reduce(inputs, x, op)
+            else:
+                # Reduce a slice per rank, then gather the slices
+                lo = m * self.rank // self.size
+                hi = m * (self.rank + 1) // self.size
+                _reduce(
+                    [t[lo:hi] for t in inputs],
+                    self.data(self.rank, x.dtype, m, scratch=True)[lo:hi],
+                    op,
+                )
+                self.barrier()
+                for r in range(self.size):
+                    lo, hi = m * r // self.size, m * (r + 1) // self.size
+                    x[lo:hi].copy_(self.data(r, x.dtype, m, scratch=True)[lo:hi])
+            self.barrier()
+        if orig is not None:
+            orig.copy_(flat.view_as(orig))
+
+    def reduce_scatter(self, output, input, op):
+        _check_reduce_op(op, output.dtype)
+        out, orig = _flat_views(output)
+        numel = out.numel()
+        assert (
+            input.numel() == numel * self.size
+        ), "The input of reduce_scatter must be world size times larger than the output"
+        input = input.contiguous().view(self.size, numel)
+        n = self.chunk_numel(out.dtype, self.size)
+        for start in range(0, numel, n):
+            x = input[:, start : start + n]
+            m = x.size(1)
+            self.data(self.rank, x.dtype, self.size * m).view(self.size, m).copy_(x)
+            self.barrier()
+            _reduce(
+                [
+                    self.data(r, x.dtype, self.size * m).view(self.size, m)[self.rank]
+                    for r in range(self.size)
+                ],
+                out[start : start + m],
+                op,
+            )
+            self.barrier()
+        if orig is not None:
+            orig.copy_(out.view_as(orig))
+
+    def allgather(self, output, input):
+        x_flat = input.contiguous().view(-1)
+        numel = x_flat.numel()
+        assert (
+            output.numel() == numel * self.size
+        ), "The output of allgather must be world size times larger than the input"
+        out, orig = _flat_views(output)
+        out = out.view(self.size, numel)
+        n = self.chunk_numel(x_flat.dtype)
+        for start in range(0, numel, n):
+            x = x_flat[start : start + n]
+            m = x.numel()
+            self.data(self.rank, x.dtype, m).copy_(x)
+            self.barrier()
+            for r in range(self.size):
+                out[r, start : start + m].copy_(self.data(r, x.dtype, m))
+            self.barrier()
+        if orig is not None:
+            orig.copy_(out.view_as(orig))
+
+    def broadcast(self, tensor, src):
+        flat, orig = _flat_views(tensor)
+        n = self.chunk_numel(flat.dtype)
+        for start in range(0, flat.numel(), n):
+            x = flat[start : start + n]
+            if self.rank == src:
+                self.data(src, x.dtype, x.numel()).copy_(x)
+            self.barrier()
+            if self.rank != src:
+                x.copy_(self.data(src, x.dtype, x.numel()))
+            self.barrier()
+        if orig is not None:
+            orig.copy_(flat.view_as(orig))
+
+    def alltoall(self, output, input, output_split_sizes, input_split_sizes):
+        def offsets(t, split_sizes):
+            row = t.numel() // t.size(0) if t.dim() > 0 and t.size(0) > 0 else 1
+            if not split_sizes:
+                split_sizes = [t.size(0) // self.size] * self.size
+            counts = [s * row for s in split_sizes]
+            return [sum(counts[:i]) for i in range(self.size)], counts
+
+        x_flat = input.contiguous().view(-1)
+        out, orig = _flat_views(output)
+        in_offsets, in_counts = offsets(input, input_split_sizes)
+        out_offsets, out_counts = offsets(output, output_split_sizes)
+        # Exchange the sizes of the splits, the number of rounds must be the
+        # same on all the ranks.
+        self.meta(self.rank).copy_(torch.tensor(in_counts))
+        self.barrier()
+        counts = torch.stack([self.meta(r) for r in range(self.size)]).tolist()
+        for r in range(self.size):
+            assert (
+                counts[r][self.rank] == out_counts[r]
+            ), f"Rank {r} sends {counts[r][self.rank]} elements instead of {out_counts[r]}"
+        # Every round sends a part of at most n elements of every split
+        n = self.chunk_numel(x_flat.dtype, self.size)
+        rounds = max(1, (max(max(c) for c in counts) + n - 1) // n)
+        for i in range(rounds):
+            send = self.data(self.rank, x_flat.dtype, self.size * n)
+            for d in range(self.size):
+                m = min(max(in_counts[d] - i * n, 0), n)
+                start = in_offsets[d] + i * n
+                send[d * n : d * n + m].copy_(x_flat[start : start + m])
+            self.barrier()
+            for r in range(self.size):
+                m = min(max(out_counts[r] - i * n, 0), n)
+                start = out_offsets[r] + i * n
+                recv = self.data(r, x_flat.dtype, self.size * n)
+                out[start : start + m].copy_(recv[self.rank * n : self.rank * n + m])
+            self.barrier()
+        if orig is not None:
+            orig.copy_(out.view_as(orig))
+
+
+class _SHMWork(dist.Work):
+    def __init__(self, future, result):
+        super().__init__()
+        self.future = future
+        self.result_ = result
+        self.torch_future = torch.futures.Future()
+
+        def done(f):
+            if f.exception() is not None:
+                self.torch_future.set_exception(f.exception())
+            else:
+                self.torch_future.set_result(self.result_)
+
+        future.add_done_callback(done)
+
+    def is_completed(self):
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        self.future.result()
+        return True
+
+    def get_future(self):
+        return self.torch_future
+
+    def result(self):
+        self.future.result()
+        return self.result_
+
+
+class ProcessGroupSHM(dist.ProcessGroup):
+    r"""
+    A process group of the ranks of a node communicating through shared
+    memory, registered as the ``"ipex_shm"`` backend of ``torch.distributed``
+    for CPU tensors:
+
+    .. code-block:: python
+
+        import intel_extension_for_pytorch as ipex
+
+        ipex.distributed.init_process_group("ipex_shm")
+        # or for the collectives on CPU tensors only
+        torch.distributed.init_process_group("cpu:ipex_shm")
+
+    It supports all-reduce, reduce-scatter, all-gather, broadcast, all-to-all
+    and barrier, but not the point-to-point operations. The collectives run
+    one at a time and in order on a thread of the process, so that the async
+    ones, like the all-reduces of the gradient buckets of
+    ``DistributedDataParallel``, overlap with the computation. The
+    coalesced all-reduce flattens the tensors of each dtype into buckets.
+
+    The size of the shared memory buffers of a rank is set by the
+    ``IPEX_SHM_BUF_SIZE`` environment variable, in bytes (16 MB by default).
+    """
+
+    def __init__(self, store, rank, size, timeout=timedelta(minutes=30)):
+        super().__init__(rank, size)
+        buf_size = int(os.environ.get(SHM_BUF_SIZE_ENV, _DEFAULT_SHM_BUF_SIZE))
+        self.buffer = _SHMBuffer(store, rank, size, buf_size, timeout)
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=SHM_BACKEND
+        )
+
+    def _submit(self, fn, result, *args):
+        return _SHMWork(self.executor.submit(fn, *args), result)
+
+    def getBackendName(self):
+        return SHM_BACKEND
+
+    def allreduce(self, tensors, opts=None):
+        op = ReduceOp.SUM if opts is None else opts.reduceOp
+
+        def run():
+            for t in tensors:
+                self.buffer.allreduce(t, op)
+
+        return self._submit(run, tensors)
+
+    def allreduce_coalesced(self, tensors, opts=None):
+        op = ReduceOp.SUM if opts is None else opts.reduceOp
+
+        def run():
+            # Flatten the tensors of a dtype into buckets of the buffer size
+            buckets = {}
+            for t in tensors:
+                dtype_buckets = buckets.setdefault(t.dtype, [[]])
+                bucket = dtype_buckets[-1]
+                numel = sum(b.numel() for b in bucket)
+                if bucket and numel + t.numel() > self.buffer.chunk_numel(t.dtype):
+                    dtype_buckets.append([])
+                dtype_buckets[-1].append(t)
+            for dtype_buckets in buckets.values():
+                for bucket in dtype_buckets:
+                    flat = _flatten_dense_tensors(bucket)
+                    self.buffer.allreduce(flat, op)
+                    for t, synced in zip(
+                        bucket, _unflatten_dense_tensors(flat, bucket)
+                    ):
+                        t.copy_(synced)
+
+        return self._submit(run, tensors)
+
+    def _reduce_scatter_base(self, output, input, opts=None):
+        op = ReduceOp.SUM if opts is None else opts.reduceOp
+        return self._submit(self.buffer.reduce_scatter, [output], output, input, op)
+
+    def reduce_scatter(self, outputs, inputs, opts=None):
+        op = ReduceOp.SUM if opts is None else opts.reduceOp
+
+        def run():
+            for output, input_list in zip(outputs, inputs):
+                self.buffer.reduce_scatter(output, torch.cat(input_list), op)
+
+        return self._submit(run, outputs)
+
+    def reduce_scatter_tensor_coalesced(self, outputs, inputs, opts=None):
+        op = ReduceOp.SUM if opts is None else opts.reduceOp
+
+        def run():
+            for output, input in zip(outputs, inputs):
+                self.buffer.reduce_scatter(output, input, op)
+
+        return self._submit(run, outputs)
+
+    def _allgather_base(self, output, input, opts=None):
+        return self._submit(self.buffer.allgather, [output], output, input)
+
+    def allgather(self, outputs, inputs, opts=None):
+        def run():
+            for output_list, input in zip(outputs, inputs):
+                gathered = input.new_empty((self.size(),) + input.shape)
+                self.buffer.allgather(gathered, input)
+                for output, t in zip(output_list, gathered):
+                    output.copy_(t)
+
+        return self._submit(run, outputs)
+
+    def allgather_into_tensor_coalesced(self, outputs, inputs, opts=None):
+        def run():
+            for output, input in zip(outputs, inputs):
+                self.buffer.allgather(output, input)
+
+        return self._submit(run, outputs)
+
+    def broadcast(self, tensors, opts=None):
+        src = 0 if opts is None else opts.rootRank
+
+        def run():
+            for t in tensors:
+                self.buffer.broadcast(t, src)
+
+        return self._submit(run, tensors)
+
+    def alltoall_base(
+        self, output, input, output_split_sizes, input_split_sizes, opts=None
+    ):
+        return self._submit(
+            self.buffer.alltoall,
+            [output],
+            output,
+            input,
+            output_split_sizes,
+            input_split_sizes,
+        )
+
+    def barrier(self, opts=None):
+        return self._submit(self.buffer.barrier, [])
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+def _create_process_group_shm(store, rank, size, timeout):
+    return ProcessGroupSHM(store, rank, size, timeout)
+
+
+if not hasattr(dist.Backend, SHM_BACKEND.upper()):
+    dist.Backend.register_backend(
+        SHM_BACKEND, _create_process_group_shm, devices=["cpu"]
+    )
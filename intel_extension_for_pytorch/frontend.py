@@ -15,6 +15,7 @@ from .optim._optimizer_utils import (
 from .utils.channels_last_1d import to_channels_last_1d
 from .cpu.utils.linear_bn_folding import linear_bn_fuse
 from .cpu.graph_capture import GraphCapture
+from .cpu.utils._memory_tracker import PeakMemoryTracker
 from .nn.utils._lstm_convert import _LSTM, replace_lstm_with_ipex_lstm
 from .nn.utils._weight_prepack import (
     _IPEXConv1d,
@@ -38,12 +39,47 @@ import intel_extension_for_pytorch._C as core
 from .utils._logger import logger, WarningType, warn_if_user_explicitly_set
 
 
-def _copy_model_and_optimizer(model, optimizer):
-    new_model = copy.deepcopy(model)
+def _copy_model_sharing_weights(model, memo):
+    # Copy the modules, the copied parameters and buffers being new tensors
+    # sharing the storage with the original ones. Converting a copied weight
+    # (cast or prepack) assigns new data to the copy only, so the model is
+    # converted layer by layer without holding a full copy of the weights.
+    for t in list(model.parameters()) + list(model.buffers()):
+        if id(t) in memo or type(t) not in (torch.nn.Parameter, torch.Tensor):
+            continue
+        if isinstance(t, torch.nn.Parameter):
+            memo[id(t)] = torch.nn.Parameter(t.data, requires_grad=t.requires_grad)
+        else:
+            memo[id(t)] = t.detach()
+    return copy.deepcopy(model, memo)
+
+
+def _unshare_weights(model, optimized_model):
+    # Clone the weights of the copy that are still sharing the storage with
+    # the original model, one at a time
+    shared = {
+        t.data_ptr()
+        for t in list(model.parameters()) + list(model.buffers())
+        if t.numel() > 0
+    }
+    for t in list(optimized_model.parameters()) + list(optimized_model.buffers()):
+        if t.numel() > 0 and t.data_ptr() in shared:
+            t.data = t.data.clone()
+
+
+def _copy_model_and_optimizer(model, optimizer, share_weights=False):
+    memo = None
+    if share_weights:
+        memo = {}
+        new_model = _copy_model_sharing_weights(model, memo)
+    else:
+        new_model = copy.deepcopy(model)
     if optimizer is None:
         return new_model, optimizer
     else:
-        new_optimizer = copy.deepcopy(optimizer)
+        # With share_weights, the parameters referred by the optimizer are
+        # mapped to the copied ones instead of being copied again
+        new_optimizer = copy.deepcopy(optimizer, memo)
         dic_param = {}
         dic_param_for_master_case = {}
         for k, value in zip(model.parameters(), new_model.parameters()):
@@ -52,7 +88,7 @@ def _copy_model_and_optimizer(model, optimizer):
             params_attr = optimizer.params_attr
             param_key_pair = {}
             if len(params_attr) != 0:
-                new_params_attr = copy.deepcopy(params_attr)
+                new_params_attr = copy.deepcopy(params_attr, memo)
                 for (k1, v1), (k2, v2) in zip(
                     params_attr.items(), new_params_attr.items()
                 ):
@@ -183,6 +219,8 @@ def optimize(
     sample_input=None,
     graph_mode=None,
     concat_linear=None,
+    low_memory=None,
+    bf16_stochastic_rounding=None,
 ):
     r"""
     Apply optimizations at Python frontend to the given model (nn.Module), as
@@ -256,24 +294,63 @@ def optimize(
         fuse_update_step (bool): Whether to use fused params update for training
             which have better performance. It doesn't support all optimizers.
             The default value is ``None``. Explicitly setting this knob
-            overwrites the configuration set by ``level`` knob.
+            overwrites the configuration set by ``level`` knob. When it is
+            explicitly set to ``True`` on CPU, the parameters, gradients,
+            master weights and states of SGD, Adam and Adagrad are flattened
+            into contiguous buffers per dtype after the first step, and the
+            fused update kernel runs once per buffer. The weights of the
+            prepacked modules are still updated one by one, and the
+            ``state_dict`` of the optimizer is unchanged.
         sample_input (tuple or torch.Tensor): Whether to feed sample input data to ipex.optimize. The shape of
             input data will impact the block format of packed weight. If not feed a sample
             input, Intel® Extension for PyTorch* will pack the weight per some predefined heuristics.
             If feed a sample input with real input shape, Intel® Extension for PyTorch* can get
-            best block format.
+            best block format. To serve several batch sizes with their best block formats, use
+            ``ipex.nn.utils.prepack_for_batch_sizes`` on the optimized model.
         auto_kernel_selection (bool) [prototype]: Different backends may have
             different performances with different dtypes/shapes. Default value
             is False. Intel® Extension for PyTorch* will try to optimize the
             kernel selection for better performance if this knob is set to
             ``True``. You might get better performance at the cost of extra memory usage.
+            With a ``sample_input``, the oneDNN, MKL and TPP (when enabled) kernels of
+            every linear are measured on its input shape and the fastest one is used.
+            The decisions are persisted per shape and ISA in the file given by the
+            ``IPEX_KERNEL_SELECTION_CACHE`` environment variable
+            (``~/.cache/intel_extension_for_pytorch/kernel_selection.json`` by default,
+            empty to disable it), so that later runs skip the measurement.
             The default value is ``None``. Explicitly setting this knob overwrites the
             configuration set by ``level`` knob.
-        graph_mode: (bool) [prototype]: It will automatically apply a combination of methods
+        graph_mode: (bool or str) [prototype]: It will automatically apply a combination of methods
             to generate graph or multiple subgraphs if True. The default value is ``False``.
+            A JIT graph is traced for every input shape and dtype, up to
+            ``model.forward.graph_capture.max_graphs`` (8 by default) graphs are cached,
+            the least recently used one being evicted. The counters of the cache are in
+            ``model.forward.graph_capture.stats``. With ``"async"``, the graphs are
+            generated in background threads while the model runs in eager mode, and
+            are only used once their outputs match the eager ones.
         concat_linear (bool): Whether to perform ``concat_linear``. It only
             works for inference model. The default value is ``None``. Explicitly
             setting this knob overwrites the configuration set by ``level`` knob.
+        low_memory (bool): Whether to bound the memory used by the optimization
+            of large models. With ``inplace=False``, the model is not deep copied:
+            the copied parameters share the storage with the original ones until
+            they are cast or prepacked, layer by layer, so that the plain weights
+            are never held twice. The parameters not converted by the optimization
+            keep sharing the storage with the original model for inference, and
+            are cloned at the end for training. The peak resident memory of the
+            optimization is logged and kept in ``optimized_model.optimize_memory_stats``.
+            The default value is ``None``, which is ``False``.
+        bf16_stochastic_rounding (bool): Whether to keep only the bfloat16
+            parameters for bfloat16 training, without fp32 master weights or
+            the trails of ``split_master_weight_for_bf16``. The fused update
+            step computes the updated weights in fp32 and rounds them to
+            bfloat16 stochastically, so that the updates smaller than the
+            bfloat16 precision are kept in expectation. This saves 2 bytes per
+            parameter comparing to the split master weights. It only works
+            for the fused update step of the optimizers supported by
+            ``fuse_update_step`` on CPU. To compensate the rounding errors
+            with 16 more bits per parameter, use ``split_master_weight_for_bf16``
+            instead. The default value is ``None``, which is ``False``.
 
     Returns:
         Model and optimizer (if given) modified according to the ``level`` knob
@@ -443,12 +520,15 @@ def optimize(
             opt_properties.optimize_lstm = False
             warn_if_user_explicitly_set(optimize_lstm, msg)
 
+    if low_memory:
+        memory_tracker = PeakMemoryTracker().start()
+
     if inplace:
         optimized_model = model
         optimized_optimizer = optimizer
     else:
         optimized_model, optimized_optimizer = _copy_model_and_optimizer(
-            model, optimizer
+            model, optimizer, share_weights=bool(low_memory)
         )
 
     if sample_input is not None:
@@ -528,6 +608,26 @@ def optimize(
                 fuse_update_step or split_master_weight_for_bf16, msg
             )
 
+    if bf16_stochastic_rounding:
+        if (
+            model.training
+            and dtype is torch.bfloat16
+            and device_type == "cpu"
+            and opt_properties.fuse_update_step
+            and type(optimizer) in IPEX_FUSED_OPTIMIZER_LIST_CPU
+        ):
+            # the bf16 params are updated by the fused split update step
+            opt_properties.split_master_weight_for_bf16 = True
+        else:
+            bf16_stochastic_rounding = False
+            msg = (
+                "IPEX only supports bf16 stochastic rounding for bf16 training on CPU "
+                + "with the fused update step of "
+                + str(IPEX_FUSED_OPTIMIZER_LIST_CPU)
+                + ", will use the bf16 master weight update."
+            )
+            logger.warning(msg, _type=WarningType.NotSupported)
+
     if model.training:
         if hasattr(optimized_optimizer, "params_attr"):
             params_attr = optimized_optimizer.params_attr
@@ -548,6 +648,7 @@ def optimize(
                 params_attr,
                 opt_properties.split_master_weight_for_bf16,
                 dtype,
+                bool(bf16_stochastic_rounding),
             )
 
     # Since TorchDynamo cannot handle custom operations yet, for the case of inference graph mode,
@@ -586,9 +687,22 @@ def optimize(
             optimizer is not None,
             dtype,
             opt_properties.weights_prepack,
+            async_capture=opt_properties.graph_mode == "async",
         )
         optimized_model.forward = wrapper(_old_forward)
 
+    if low_memory:
+        if model.training and not inplace:
+            # The weights are updated in place by training
+            _unshare_weights(model, optimized_model)
+        optimized_model.optimize_memory_stats = memory_tracker.stop()
+        logger.info(
+            "Peak memory of ipex.optimize: {:.1f} MB, {:.1f} MB over the memory before it.".format(
+                memory_tracker.peak_rss / 2**20,
+                memory_tracker.stats["peak_overhead"] / 2**20,
+            )
+        )
+
     if optimizer is None:
         return optimized_model
 
@@ -598,6 +712,7 @@ def optimize(
             optimized_optimizer,
             device_type,
             fuse_update_step,
+            optimized_model,
         )
     return optimized_model, optimized_optimizer
 
@@ -20,6 +20,7 @@ try:
         _pad,
         load_low_precision_checkpoint,
         shard_low_precision_checkpoint,
+        load_checkpoint_mmap,
     )
     import transformers
 
@@ -248,6 +248,43 @@ def varlen_attention(
     )
 
 
+def ring_attention(
+    query: torch.Tensor,
+    key: torch.Tensor,
+    value: torch.Tensor,
+    is_causal: bool = True,
+    scale: float = None,
+    group=None,
+):
+    r"""
+    Applies flash attention on a sequence sharded across the ranks of a process
+    group of ``torch.distributed``, with the query, key and value of the tokens
+    of the shard of the rank as inputs (see https://arxiv.org/abs/2310.01889).
+    The key/value shards are passed around the ring of ranks, each rank
+    attending its queries to one shard while receiving the next one, and the
+    results are merged with the log-sum-exp of their softmax.
+
+    Args:
+        query (torch.Tensor): shape [batch size, num_head, shard length, head_dim].
+            The shards have the same length on all ranks, and rank ``i`` holds
+            the ``i``-th shard of the sequence.
+        key, value (torch.Tensor): shape [batch size, num_kv_head, shard length, head_dim],
+            where num_head is a multiple of num_kv_head.
+        is_causal (bool): whether to apply causal attention masking, default is True.
+            The ranks holding the first shards have fewer blocks to compute.
+        scale (float): scaling factor applied prior to softmax, default is
+            1 / sqrt(head_dim).
+        group (ProcessGroup): the process group of the ranks holding the shards.
+            The default process group is used if it's None.
+
+    Return
+        output (torch.Tensor): [batch size, num_head, shard length, head_dim].
+
+    """
+    f = _get_function_from_device(query.device.type, ring_attention)
+    return f(query, key, value, is_causal, scale, group)
+
+
 def silu_mul(x: torch.Tensor, y: torch.Tensor, out: torch.Tensor = None):
     r"""
     Applies PyTorch silu on input x, and mul input y:
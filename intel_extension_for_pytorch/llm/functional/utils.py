@@ -7,6 +7,7 @@ from intel_extension_for_pytorch.transformers.models.cpu.fusions.mha_fusion impo
     bgmv_shrink_cpu,
     bgmv_expand_cpu,
     bgmv_expand_slice_cpu,
+    ring_attention_cpu,
 )
 
 
@@ -1,3 +1,4 @@
+import itertools
 import re
 import functools
 import inspect
@@ -1442,3 +1443,91 @@ def shard_low_precision_checkpoint(
             ].contiguous()
 
     return low_precision_checkpoint_dict
+
+
+_SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def _mmap_safetensors(filename):
+    # The tensors are views of the file mapped in memory, without reading it:
+    # 8 bytes of header size, the JSON header, then the data.
+    storage = torch.from_file(
+        str(filename),
+        shared=False,
+        size=os.path.getsize(filename),
+        dtype=torch.uint8,
+    )
+    header_size = int.from_bytes(storage[:8].numpy().tobytes(), "little")
+    header = json.loads(storage[8 : 8 + header_size].numpy().tobytes())
+    header.pop("__metadata__", None)
+    state_dict = {}
+    for name, info in header.items():
+        start, end = info["data_offsets"]
+        data = storage[8 + header_size + start : 8 + header_size + end]
+        dtype = _SAFETENSORS_DTYPES[info["dtype"]]
+        if data.storage_offset() % dtype.itemsize != 0:
+            # The data of the files written by safetensors are aligned
+            data = data.clone()
+        state_dict[name] = data.view(dtype).view(info["shape"])
+    return state_dict
+
+
+def load_checkpoint_mmap(
+    model: torch.nn.Module,
+    pathname: Union[str, os.PathLike],
+):
+    r"""
+    Load the weights of a model from a checkpoint file or a directory of checkpoint
+    files mapped in memory. The parameters of the model become views of the files, so
+    only the pages of the weights which are used are read. With
+    ``ipex.llm.optimize(model, tp_size=N, inplace=True)``, each rank only reads its
+    own slices of the sharded weights. The model can be created with its parameters
+    on the meta device to skip their initialization.
+    Supported file format: .pt, .bin, .pth, .safetensors.
+    Args:
+        model (torch.nn.Module): Model to load the weights into.
+        pathname (str or os.PathLike): Path to the checkpoint file or directory containing
+            multiple checkpoint files.
+    Returns:
+        torch.nn.Module: The model with the weights loaded.
+    """
+    assert os.path.exists(pathname), f"Checkpoint path does not exist: {pathname}"
+    file_types = ["*.safetensors", "*.pt", "*.pth", "*.bin"]
+    checkpoint_files = [pathlib.Path(pathname)]
+    if os.path.isdir(pathname):
+        for pattern in file_types:
+            checkpoint_files = sorted(pathlib.Path(pathname).glob(pattern))
+            if checkpoint_files:
+                break
+    assert checkpoint_files, f"Cannot find checkpoint files in path {pathname}."
+
+    state_dict = {}
+    for ckpt in checkpoint_files:
+        if ckpt.suffix == ".safetensors":
+            state_dict.update(_mmap_safetensors(ckpt))
+        else:
+            state_dict.update(torch.load(ckpt, mmap=True, weights_only=True))
+    model.load_state_dict(state_dict, strict=False, assign=True)
+    if hasattr(model, "tie_weights"):
+        model.tie_weights()
+    not_loaded = [
+        name
+        for name, t in itertools.chain(model.named_parameters(), model.named_buffers())
+        if t.is_meta
+    ]
+    if len(not_loaded) > 0:
+        raise RuntimeError(
+            f"Cannot find {not_loaded} in the checkpoint {pathname}, they are still on the meta device."
+        )
+    return model
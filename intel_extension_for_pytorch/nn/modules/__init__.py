@@ -3,8 +3,16 @@ from ...cpu.nn import _roi_align
 from .merged_embeddingbag import MergedEmbeddingBagWithSGD
 from .merged_embeddingbag import MergedEmbeddingBag
 from .merged_embeddingbag import MergedEmbeddingBagWithCat
+from .merged_embeddingbag import MergedEmbeddingBagWithInteraction
 from .merged_embeddingbag import MergedEmbeddingBagWithAdaGrad
 from .merged_embeddingbag import DistMergeEmbeddingBagWithAdaGrad
+from .sharded_embeddingbag import (
+    ShardedEmbeddingBag,
+    ShardingType,
+    TableShardingPlan,
+    plan_embedding_sharding,
+    pooling_factors_from_batch,
+)
 from ...cpu.nn.linear_fuse_eltwise import IPEXLinearEltwise
 from .weight_only_quantization import (
     WeightOnlyQuantizedLinear,
@@ -58,6 +58,60 @@ def merged_embeddingbag_with_cat(
     )
 
 
+# Budget of one batch tile of MergedEmbeddingBagWithInteraction, sized to stay
+# in the mid level cache
+INTERACTION_TILE_BYTES = 1024 * 1024
+
+
+def merged_embeddingbag_with_interaction(
+    weights,
+    indices,
+    offsets,
+    dense_feature,
+    pooling_mode,
+    include_last_offset,
+    dense_weight,
+    interaction_weight,
+    bias,
+    tile_size,
+):
+    if torch.is_grad_enabled():
+        raise NotImplementedError(
+            "do not support training for merged_embeddingbag_with_interaction"
+        )
+    batch_size, emb_dim = dense_feature.shape
+    n_features = len(weights) + 1
+    out_features = dense_weight.shape[0]
+    output = dense_feature.new_empty((batch_size, out_features))
+    # bag boundaries in the include_last_offset=True form, so that a tile of
+    # bags can be sliced out of indices/offsets of every table
+    bounds = []
+    for idx, ofs in zip(indices, offsets):
+        if not include_last_offset:
+            ofs = torch.cat([ofs, ofs.new_tensor([idx.numel()])])
+        bounds.append(ofs)
+    for start in range(0, batch_size, tile_size):
+        end = min(start + tile_size, batch_size)
+        tile_indices = []
+        tile_offsets = []
+        for idx, ofs in zip(indices, bounds):
+            tile_indices.append(idx[ofs[start] : ofs[end]])
+            tile_offsets.append(ofs[start : end + 1] - ofs[start])
+        pooled = torch.ops.torch_ipex.merged_embeddingbag_forward(
+            weights, tile_indices, tile_offsets, pooling_mode, True
+        )
+        dense = dense_feature[start:end]
+        features = torch.stack([dense] + list(pooled), dim=1)
+        # dot interaction of the tile only, [tile, n_features, n_features]
+        z = torch.bmm(features, features.transpose(1, 2))
+        tile_out = output[start:end]
+        torch.addmm(bias, dense, dense_weight.t(), out=tile_out)
+        tile_out.addmm_(
+            z.view(end - start, n_features * n_features), interaction_weight.t()
+        )
+    return output
+
+
 def merged_embeddingbag_sgd(
     weights, indices, offsets, pooling_mode, include_last_offset, sgd_args
 ):
@@ -653,6 +707,133 @@ class MergedEmbeddingBagWithCat(MergedEmbeddingBag):
         )
 
 
+class MergedEmbeddingBagWithInteraction(MergedEmbeddingBag):
+    r"""
+    Fuse the DLRM inference block from the pooled embeddings to the first
+    top-MLP linear: merged pooled embeddings, the dense (bottom-MLP) output,
+    "dot" interaction (see `ipex.nn.functional.interaction`) and the first
+    linear of the top MLP.
+
+    The native path materializes the pooled embeddings, the whole interaction
+    matrix and the concatenated interaction feature for the whole batch:
+
+        >>> ly = [emb(in_i, of_i) for emb, in_i, of_i in zip(EmbLists, indices, offsets)]
+        >>> R = ipex.nn.functional.interaction(*([dense_feature] + ly))
+        >>> out = top_linear(R)
+
+    The optimized path works on batch tiles sized to stay in cache and never
+    gathers the lower triangle of the interaction matrix. The interaction part
+    of the linear weight is scattered into a `[out_features, N, N]` layout once
+    at construction so that the tile's interaction matrix is fed to the GEMM
+    directly:
+
+        >>> EmbLists = torch.nn.Modulist(emb1, emb2, emb3, ..., emb_m)
+        >>> fused = MergedEmbeddingBagWithInteraction.from_embeddingbag_list(
+        >>>     EmbLists, top_linear
+        >>> )
+        >>> out = fused(indices, offsets, dense_feature)
+
+    The activation following the linear is not fused. Only inference is
+    supported.
+    """
+
+    def __init__(
+        self,
+        embedding_specs: List[EmbeddingSpec],
+        linear: nn.Linear,
+        tile_size: Optional[int] = None,
+    ):
+        super(MergedEmbeddingBagWithInteraction, self).__init__(embedding_specs)
+        n_features = self.n_tables + 1
+        n_pairs = n_features * (n_features - 1) // 2
+        assert linear.in_features == self.embedding_dim + n_pairs, (
+            "expect the linear to take the dense feature and the interaction "
+            "feature of dim {}, got {}".format(
+                self.embedding_dim + n_pairs, linear.in_features
+            )
+        )
+        out_features = linear.out_features
+        weight = linear.weight.detach().to(self.dtype)
+        li = torch.tensor([i for i in range(n_features) for j in range(i)])
+        lj = torch.tensor([j for i in range(n_features) for j in range(i)])
+        interaction_weight = weight.new_zeros((out_features, n_features, n_features))
+        interaction_weight[:, li, lj] = weight[:, self.embedding_dim :]
+        self.register_buffer(
+            "dense_weight", weight[:, : self.embedding_dim].contiguous()
+        )
+        self.register_buffer(
+            "interaction_weight",
+            interaction_weight.view(out_features, n_features * n_features),
+        )
+        bias = (
+            linear.bias.detach().to(self.dtype)
+            if linear.bias is not None
+            else weight.new_zeros(out_features)
+        )
+        self.register_buffer("bias", bias)
+        if tile_size is None:
+            # bytes per sample of the tile: the features, the interaction
+            # matrix and the output
+            elem_size = weight.element_size()
+            per_sample = (
+                n_features * self.embedding_dim + n_features * n_features + out_features
+            ) * elem_size
+            tile_size = max(16, INTERACTION_TILE_BYTES // per_sample // 16 * 16)
+        self.tile_size = tile_size
+
+    @classmethod
+    def from_embeddingbag_list(
+        cls,
+        tables: List[torch.nn.EmbeddingBag],
+        linear: nn.Linear,
+        tile_size: Optional[int] = None,
+    ):
+        embedding_specs = []
+        for emb in tables:
+            emb_shape = emb.weight.shape
+            embedding_specs.append(
+                EmbeddingSpec(
+                    num_embeddings=emb_shape[0],
+                    embedding_dim=emb_shape[1],
+                    pooling_mode=emb.mode,
+                    dtype=emb.weight.dtype,
+                    weight=emb.weight.detach(),
+                    sparse=emb.sparse,
+                    include_last_offset=emb.include_last_offset,
+                )
+            )
+        return cls(embedding_specs, linear, tile_size)
+
+    def extra_repr(self) -> str:
+        s = super(MergedEmbeddingBagWithInteraction, self).extra_repr()
+        s += "\nout_features={}, tile_size={}".format(
+            self.dense_weight.shape[0], self.tile_size
+        )
+        return s
+
+    def forward(self, indices, offsets, dense_feature):
+        r"""
+        Args:
+            indices (List[Tensor]): a list of indices for all tables
+            offsets (List[Tensor]): a list of offsets for all tables
+            dense_feature (Tensor): the bottom-MLP output, shape of `(batch_size, emb_dim)`
+        Returns:
+            output of the first top-MLP linear, shape of `(batch_size, out_features)`.
+        """
+        return merged_embeddingbag_with_interaction(
+            self.weights,
+            indices,
+            offsets,
+            dense_feature,
+            self.pooling_mode,
+            self.include_last_offset,
+            self.dense_weight,
+            self.interaction_weight,
+            self.bias,
+            self.tile_size,
+        )
+
+
 import torch.distributed as dist
 
 
@@ -0,0 +1,413 @@
+import enum
+from typing import List, NamedTuple, Optional
+
+import torch
+import torch.distributed as dist
+from torch import nn
+from torch.autograd import Function
+
+from .merged_embeddingbag import EmbeddingSpec, MergedEmbeddingBag, PoolingMode
+
+
+class ShardingType(enum.Enum):
+    TABLE_WISE = "table_wise"
+    ROW_WISE = "row_wise"
+    COLUMN_WISE = "column_wise"
+
+
+class TableShardingPlan(NamedTuple):
+    sharding_type: ShardingType
+    # ranks holding a shard of the table, a single rank for TABLE_WISE
+    ranks: List[int]
+    # rows (ROW_WISE), columns (COLUMN_WISE) or rows of the whole table
+    # (TABLE_WISE) held by each rank in `ranks`
+    shard_sizes: List[int]
+
+
+def _even_split(size: int, parts: int) -> List[int]:
+    return [size // parts + (1 if i < size % parts else 0) for i in range(parts)]
+
+
+def _bag_lengths(indices, offsets, include_last_offset):
+    if include_last_offset:
+        bounds = offsets
+    else:
+        bounds = torch.cat([offsets, offsets.new_tensor([indices.numel()])])
+    return bounds[1:] - bounds[:-1]
+
+
+def pooling_factors_from_batch(
+    indices: List[torch.Tensor],
+    offsets: List[torch.Tensor],
+    include_last_offset: bool = False,
+) -> List[float]:
+    r"""
+    Collect the average number of lookups per sample for each table from a
+    representative batch, which can be fed to :func:`plan_embedding_sharding`
+    as access statistics.
+    """
+    factors = []
+    for idx, ofs in zip(indices, offsets):
+        batch_size = ofs.numel() - 1 if include_last_offset else ofs.numel()
+        factors.append(idx.numel() / max(batch_size, 1))
+    return factors
+
+
+def plan_embedding_sharding(
+    embedding_specs: List[EmbeddingSpec],
+    world_size: int,
+    pooling_factors: Optional[List[float]] = None,
+    row_wise_threshold: float = 0.5,
+    column_wise_threshold: float = 0.5,
+    column_wise_min_dim: int = 128,
+) -> List[TableShardingPlan]:
+    r"""
+    Choose a sharding scheme for every embedding table.
+
+    The planner balances two costs per rank: the bytes of the embedding rows
+    it holds and the lookup work it does per sample, which is estimated as
+    ``pooling_factor * embedding_dim``. Tables are assigned as follows:
+
+        1). A table larger than ``row_wise_threshold`` of the per-rank memory
+        share is sharded ROW_WISE, so no single rank has to hold it.
+
+        2). A table whose lookup work is larger than ``column_wise_threshold``
+        of the per-rank compute share and whose ``embedding_dim`` is at least
+        ``column_wise_min_dim`` is sharded COLUMN_WISE, which spreads the hot
+        lookups evenly without the partial-sum traffic of ROW_WISE.
+
+        3). The remaining tables are placed TABLE_WISE, largest first, on the
+        rank with the least accumulated cost.
+
+    Args:
+        embedding_specs (List[EmbeddingSpec]): the tables to shard.
+        world_size (int): number of ranks.
+        pooling_factors (List[float], optional): average lookups per sample of
+            each table, see :func:`pooling_factors_from_batch`. All tables are
+            assumed to be equally hot when it is not given.
+        row_wise_threshold (float): see above.
+        column_wise_threshold (float): see above.
+        column_wise_min_dim (int): see above.
+
+    Returns:
+        List[TableShardingPlan], one plan per table.
+    """
+    n_tables = len(embedding_specs)
+    if pooling_factors is None:
+        pooling_factors = [1.0] * n_tables
+    assert len(pooling_factors) == n_tables, "expect one pooling factor per table"
+    if world_size == 1:
+        return [
+            TableShardingPlan(ShardingType.TABLE_WISE, [0], [spec.num_embeddings])
+            for spec in embedding_specs
+        ]
+
+    mem = [
+        spec.num_embeddings
+        * spec.embedding_dim
+        * torch.empty((), dtype=spec.dtype).element_size()
+        for spec in embedding_specs
+    ]
+    compute = [
+        pf * spec.embedding_dim for pf, spec in zip(pooling_factors, embedding_specs)
+    ]
+    mem_share = max(sum(mem) / world_size, 1)
+    compute_share = max(sum(compute) / world_size, 1e-6)
+
+    plans: List[Optional[TableShardingPlan]] = [None] * n_tables
+    all_ranks = list(range(world_size))
+    table_wise = []
+    for i, spec in enumerate(embedding_specs):
+        if (
+            mem[i] > row_wise_threshold * mem_share
+            and spec.num_embeddings >= world_size
+        ):
+            plans[i] = TableShardingPlan(
+                ShardingType.ROW_WISE,
+                all_ranks,
+                _even_split(spec.num_embeddings, world_size),
+            )
+        elif (
+            compute[i] > column_wise_threshold * compute_share
+            and spec.embedding_dim >= column_wise_min_dim
+            and spec.embedding_dim >= world_size
+        ):
+            plans[i] = TableShardingPlan(
+                ShardingType.COLUMN_WISE,
+                all_ranks,
+                _even_split(spec.embedding_dim, world_size),
+            )
+        else:
+            table_wise.append(i)
+
+    # Greedy bin packing (largest first) on the normalized memory + compute
+    # cost. ROW_WISE and COLUMN_WISE tables load every rank evenly, so they
+    # do not change which rank is the least loaded one.
+    def cost(i):
+        return mem[i] / mem_share + compute[i] / compute_share
+
+    load = [0.0] * world_size
+    for i in sorted(table_wise, key=cost, reverse=True):
+        rank = min(all_ranks, key=lambda r: load[r])
+        load[rank] += cost(i)
+        plans[i] = TableShardingPlan(
+            ShardingType.TABLE_WISE, [rank], [embedding_specs[i].num_embeddings]
+        )
+    return plans
+
+
+class AllToAllSingleFunc(Function):
+    @staticmethod
+    def forward(ctx, input, output_split_sizes, input_split_sizes, group, works):
+        ctx.output_split_sizes = output_split_sizes
+        ctx.input_split_sizes = input_split_sizes
+        ctx.group = group
+        from ...distributed import all_to_all_single
+
+        output = input.new_empty(sum(output_split_sizes))
+        # the exchange is left in flight, the caller waits on `works` before
+        # reading the output so that it overlaps with the following lookups
+        works.append(
+            all_to_all_single(
+                output,
+                input.contiguous(),
+                output_split_sizes,
+                input_split_sizes,
+                group,
+                async_op=True,
+            )
+        )
+        return output
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        from ...distributed import all_to_all_single
+
+        grad_input = grad_output.new_empty(sum(ctx.input_split_sizes))
+        all_to_all_single(
+            grad_input,
+            grad_output.contiguous(),
+            ctx.input_split_sizes,
+            ctx.output_split_sizes,
+            ctx.group,
+        )
+        return grad_input, None, None, None, None
+
+
+class ShardedEmbeddingBag(MergedEmbeddingBag):
+    r"""
+    Distribute a list of `EmbeddingBag` tables over the ranks of a process
+    group, choosing TABLE_WISE, ROW_WISE or COLUMN_WISE sharding per table.
+
+    Like `DistMergeEmbeddingBagWithAdaGrad`, every rank is fed with the
+    indices/offsets of the global batch and returns the pooled embeddings of
+    its local batch slice, shape of `[global BS / world_size, num tables,
+    emb_dim]`. Each rank only looks up the shards it holds. The pooled
+    results are exchanged with one all-to-all per sharding type through
+    `ipex.distributed.all_to_all_single`, and each exchange is issued
+    asynchronously as soon as its lookups are done so that it overlaps with
+    the lookups of the next sharding type.
+
+    Weights are plain `nn.Parameter` shards, so any optimizer can be used
+    for training.
+
+    Example usage:
+
+        >>> EmbLists = torch.nn.Modulist(emb1, emb2, emb3, ..., emb_m)
+        >>> dist.init_process_group("ccl", world_size=world_size, rank=rank)
+        >>> pooling_factors = pooling_factors_from_batch(indices, offsets)
+        >>> sharded_emb = ShardedEmbeddingBag.from_embeddingbag_list(
+        >>>     EmbLists, pooling_factors=pooling_factors
+        >>> )
+        >>> out = sharded_emb(indices, offsets)
+    """
+
+    def __init__(
+        self,
+        embedding_specs: List[EmbeddingSpec],
+        plan: Optional[List[TableShardingPlan]] = None,
+        pooling_factors: Optional[List[float]] = None,
+        group=None,
+    ):
+        super(ShardedEmbeddingBag, self).__init__(embedding_specs)
+        self.group = group
+        self._rank = dist.get_rank(group)
+        self._size = dist.get_world_size(group)
+        if plan is None:
+            plan = plan_embedding_sharding(embedding_specs, self._size, pooling_factors)
+        assert len(plan) == self.n_tables, "expect one sharding plan per table"
+        self.plan = plan
+
+        # local shard of every table, None when this rank holds nothing
+        self._shard_index = [None] * self.n_tables
+        # (start, end) row range for ROW_WISE / column range for COLUMN_WISE
+        self._shard_range = [None] * self.n_tables
+        shards = []
+        for i, table_plan in enumerate(plan):
+            weight = self.weights[i].data
+            if table_plan.sharding_type == ShardingType.TABLE_WISE:
+                if table_plan.ranks[0] != self._rank:
+                    continue
+                shard = weight
+            else:
+                pos = table_plan.ranks.index(self._rank)
+                start = sum(table_plan.shard_sizes[:pos])
+                end = start + table_plan.shard_sizes[pos]
+                self._shard_range[i] = (start, end)
+                if table_plan.sharding_type == ShardingType.ROW_WISE:
+                    shard = weight[start:end]
+                else:
+                    shard = weight[:, start:end]
+            self._shard_index[i] = len(shards)
+            shards.append(nn.Parameter(shard.clone()))
+        # drop the original weights
+        self.weights = nn.ParameterList(shards)
+
+        # width of the pooled output each rank sends for every sharding type
+        self._groups = [
+            ShardingType.TABLE_WISE,
+            ShardingType.COLUMN_WISE,
+            ShardingType.ROW_WISE,
+        ]
+        self._tables = {
+            t: [i for i, p in enumerate(plan) if p.sharding_type == t]
+            for t in self._groups
+        }
+        self._widths = {t: [0] * self._size for t in self._groups}
+        for i, table_plan in enumerate(plan):
+            t = table_plan.sharding_type
+            for pos, r in enumerate(table_plan.ranks):
+                if t == ShardingType.COLUMN_WISE:
+                    self._widths[t][r] += table_plan.shard_sizes[pos]
+                else:
+                    self._widths[t][r] += self.embedding_dim
+
+    def _lookup(self, i, indices, offsets):
+        weight = self.weights[self._shard_index[i]]
+        mode = "sum" if self.pooling_mode == PoolingMode.SUM else "mean"
+        if self.plan[i].sharding_type != ShardingType.ROW_WISE:
+            return nn.functional.embedding_bag(
+                indices,
+                weight,
+                offsets,
+                mode=mode,
+                include_last_offset=self.include_last_offset,
+            )
+        # only look up the rows held locally, the partial sums are reduced
+        # after the exchange
+        start, end = self._shard_range[i]
+        lengths = _bag_lengths(indices, offsets, self.include_last_offset)
+        bag_ids = torch.repeat_interleave(
+            torch.arange(lengths.numel()), lengths.to(torch.int64)
+        )
+        local = (indices >= start) & (indices < end)
+        local_lengths = torch.bincount(bag_ids[local], minlength=lengths.numel())
+        local_offsets = torch.cat(
+            [local_lengths.new_zeros(1), torch.cumsum(local_lengths, 0)[:-1]]
+        ).to(indices.dtype)
+        return nn.functional.embedding_bag(
+            indices[local] - start, weight, local_offsets, mode="sum"
+        )
+
+    def forward(self, indices: List[torch.Tensor], offsets: List[torch.Tensor]):
+        global_bs = offsets[0].size(0)
+        if self.include_last_offset:
+            global_bs -= 1
+        assert global_bs % self._size == 0, "expect global BS % world_size == 0"
+        local_bs = global_bs // self._size
+
+        works = []
+        received = {}
+        for t in self._groups:
+            if sum(self._widths[t]) == 0:
+                continue
+            pooled = [
+                self._lookup(i, indices[i], offsets[i])
+                for i in self._tables[t]
+                if self._shard_index[i] is not None
+            ]
+            width = self._widths[t][self._rank]
+            if pooled:
+                send = torch.cat(pooled, dim=1)
+            else:
+                # keep the exchange in the autograd graph of every rank, the
+                # backward all-to-all has to be issued by all of them
+                send = torch.empty(
+                    (global_bs, 0),
+                    dtype=self.dtype,
+                    requires_grad=torch.is_grad_enabled(),
+                )
+            # [global BS, width] -> [world_size, local BS, width] so that the
+            # rows of rank r are contiguous
+            send = send.view(self._size, local_bs, width).reshape(-1)
+            received[t] = AllToAllSingleFunc.apply(
+                send,
+                [local_bs * w for w in self._widths[t]],
+                [local_bs * width] * self._size,
+                self.group,
+                works,
+            )
+        for work in works:
+            work.wait()
+
+        outputs = [None] * self.n_tables
+        for t, recv in received.items():
+            widths = self._widths[t]
+            recv = recv.split([local_bs * w for w in widths])
+            pieces = [r.view(local_bs, w) for r, w in zip(recv, widths)]
+            if t != ShardingType.COLUMN_WISE:
+                pieces = [list(p.split(self.embedding_dim, dim=1)) for p in pieces]
+            for i in self._tables[t]:
+                ranks = self.plan[i].ranks
+                if t == ShardingType.TABLE_WISE:
+                    outputs[i] = pieces[ranks[0]].pop(0)
+                elif t == ShardingType.ROW_WISE:
+                    outputs[i] = torch.stack([pieces[r].pop(0) for r in ranks]).sum(0)
+                    if self.pooling_mode == PoolingMode.MEAN:
+                        lengths = _bag_lengths(
+                            indices[i], offsets[i], self.include_last_offset
+                        )
+                        lengths = lengths.view(self._size, local_bs)[self._rank]
+                        outputs[i] = outputs[i] / lengths.clamp(min=1).unsqueeze(1).to(
+                            outputs[i].dtype
+                        )
+                else:
+                    cols = []
+                    for pos, r in enumerate(ranks):
+                        size = self.plan[i].shard_sizes[pos]
+                        cols.append(pieces[r][:, :size])
+                        pieces[r] = pieces[r][:, size:]
+                    outputs[i] = torch.cat(cols, dim=1)
+        return torch.stack(outputs, dim=1)
+
+    @classmethod
+    def from_embeddingbag_list(
+        cls,
+        tables: List[torch.nn.EmbeddingBag],
+        plan: Optional[List[TableShardingPlan]] = None,
+        pooling_factors: Optional[List[float]] = None,
+        group=None,
+    ):
+        embedding_specs = [
+            EmbeddingSpec(
+                num_embeddings=emb.weight.shape[0],
+                embedding_dim=emb.weight.shape[1],
+                pooling_mode=emb.mode,
+                dtype=emb.weight.dtype,
+                weight=emb.weight.detach(),
+                sparse=emb.sparse,
+                include_last_offset=emb.include_last_offset,
+            )
+            for emb in tables
+        ]
+        return cls(embedding_specs, plan, pooling_factors, group)
+
+    def extra_repr(self) -> str:
+        s = f"world_size: {self._size}, rank_id: {self._rank}\n"
+        for i, table_plan in enumerate(self.plan):
+            s += f"table{i}: {table_plan.sharding_type.value}, ranks={table_plan.ranks}"
+            if self._shard_index[i] is not None:
+                s += f", local shard={tuple(self.weights[self._shard_index[i]].shape)}"
+            if i != self.n_tables - 1:
+                s += "\n"
+        return s
@@ -1,4 +1,4 @@
 from intel_extension_for_pytorch.nn.utils import _weight_prepack
 from intel_extension_for_pytorch.nn.utils import _lstm_convert
 from . import _model_convert, _weight_cast
-from ._weight_prepack import Apply_TPPLinear_weight_prepack
+from ._weight_prepack import Apply_TPPLinear_weight_prepack, prepack_for_batch_sizes
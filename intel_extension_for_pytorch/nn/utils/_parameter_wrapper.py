@@ -7,6 +7,9 @@ from ...utils._logger import logger, WarningType
 from intel_extension_for_pytorch.cpu._auto_kernel_selection import (
     _using_dnnl,
     _using_tpp,
+    _get_kernel_decision,
+    _kernel_selection_key,
+    _select_kernel,
 )
 from intel_extension_for_pytorch import frontend
 import intel_extension_for_pytorch._C as core
@@ -187,6 +190,73 @@ def _should_prepack(module, is_training, is_xpu=False):
     return True
 
 
+def _select_linear_kernel(module, candidates):
+    # Measure the candidate kernels of the linear on its recorded input shape
+    # and return the fastest one. The decision is persisted per shape and ISA,
+    # see _select_kernel, the candidates are only prepacked if there is none.
+    weight = module.weight.detach()
+    key = _kernel_selection_key("linear", weight, module.input_shape)
+    decision = _get_kernel_decision(key, candidates)
+    if decision is not None:
+        return decision
+    bias = module.bias.detach() if module.bias is not None else None
+    x = torch.randn(module.input_shape, dtype=weight.dtype)
+    batch_size_collapsed = x.numel() // x.size(-1)
+
+    def run_dnnl():
+        ctx = torch.ops.ipex_prepack.linear_prepack(weight, bias, batch_size_collapsed)
+        packed_weight = ctx.get_weight()
+        return lambda: torch.ops.torch_ipex.ipex_linear(
+            x, packed_weight, bias, ctx.get_data_handle(), module.out_features
+        )
+
+    def run_mkl():
+        ctx = torch.ops.ipex_prepack.mkl_sgemm_prepack(
+            weight, bias, batch_size_collapsed
+        )
+        packed_weight = ctx.get_weight()
+        return lambda: torch.ops.torch_ipex.ipex_MKLSGEMM(
+            x, packed_weight, bias, ctx.get_data_handle(), module.out_features
+        )
+
+    def run_tpp():
+        from intel_extension_for_pytorch.nn.utils import (
+            Apply_TPPLinear_weight_prepack,
+        )
+
+        # Block a copy of the weight, the module is only blocked if TPP wins
+        linear = torch.nn.Linear(
+            weight.size(1), weight.size(0), bias=bias is not None, device="meta"
+        )
+        linear.weight = torch.nn.Parameter(weight.clone(), requires_grad=False)
+        if bias is not None:
+            linear.bias = torch.nn.Parameter(bias.clone(), requires_grad=False)
+        Apply_TPPLinear_weight_prepack(linear, dtype=weight.dtype)
+        if linear.tpp_fallback:
+            return None
+        tpp_x = x.contiguous()
+        if bias is not None:
+            return lambda: torch.ops.torch_ipex.tpp_linear_bias(
+                tpp_x,
+                linear.weight.detach(),
+                linear.bias.detach(),
+                module.out_features,
+            )
+        return lambda: torch.ops.torch_ipex.tpp_linear(
+            tpp_x, linear.weight.detach(), module.out_features
+        )
+
+    runners = {"dnnl": run_dnnl, "mkl": run_mkl, "tpp": run_tpp}
+    fns = {}
+    for name in candidates:
+        fn = runners[name]()
+        if fn is not None:
+            fns[name] = fn
+    if len(fns) < 2:
+        return next(iter(fns), None)
+    return _select_kernel(key, fns)
+
+
 def get_shared_parameter_status(module, shared_p):
     visited_wrapper = []
 
@@ -329,6 +399,9 @@ class ParameterWrapper(object):
         self.casted_dtype: torch.dtype = None
         # Whether using split optimization
         self.split: bool = None
+        # Whether dropping the trail of the split optimization and rounding
+        # the updates of the bf16 parameter stochastically
+        self.stochastic_rounding: bool = None
         # Whether weight is channels last for Conv/Conv_transpose
         self.weight_channels_last: bool = None
         # op context for prepacked weight
@@ -380,7 +453,7 @@ class ParameterWrapper(object):
         module_cls = IPEX_WEIGHT_CONVERT_MODULE_CPU(False, dtype)
         return all(cls in module_cls for cls in self.modules_cls)
 
-    def cast_for_training(self, dtype, split):
+    def cast_for_training(self, dtype, split, stochastic_rounding=False):
         if self.original_dtype is not None:
             # current parameter is casted
             return
@@ -391,9 +464,8 @@ class ParameterWrapper(object):
             assert (
                 dtype == torch.bfloat16
             ), "master_weight_split is only support for bf16 now"
-            top, self.parameter_trail = torch.ops.torch_ipex.split_float_bfloat16(
-                self.parameter.data
-            )
+            self.stochastic_rounding = stochastic_rounding
+            top = self._split_for_training(self.parameter.data)
             with torch.no_grad():
                 self.parameter.data = top
         else:
@@ -404,6 +476,12 @@ class ParameterWrapper(object):
                 requires_grad=self.master_parameter.requires_grad,
             )
 
+    def _split_for_training(self, param):
+        if self.stochastic_rounding:
+            return param.to(torch.bfloat16)
+        top, self.parameter_trail = torch.ops.torch_ipex.split_float_bfloat16(param)
+        return top
+
     def _training_cast_to_fp32(self):
         if self.original_dtype is None:
             return self.parameter.data.detach()
@@ -411,6 +489,8 @@ class ParameterWrapper(object):
             torch.float,
             torch.float32,
         )
+        if self.stochastic_rounding:
+            return self.parameter.data.to(self.original_dtype).detach()
         if self.split:
             assert self.parameter_trail is not None
             fp32_param = torch.ops.torch_ipex.cat_bfloat16_float(
@@ -584,7 +664,25 @@ class ParameterWrapper(object):
         if not hasattr(module, "out_features"):
             setattr(module, "out_features", module.weight.shape[0])  # noqa: B010
 
-        module.tpp_fallback = False
+        # With auto_kernel_selection and a sample input, measure the kernels
+        # instead of following the dtype rules above
+        kernel = None
+        if _using_dnnl() and not is_training and hasattr(module, "input_shape"):
+            candidates = ["dnnl"]
+            if (
+                module.weight.dtype == torch.float32
+                and frontend.get_fp32_math_mode(device="cpu")
+                == frontend.FP32MathMode.FP32
+            ):
+                candidates.append("mkl")
+            if module.use_tpp:
+                candidates.append("tpp")
+            kernel = _select_linear_kernel(module, candidates)
+        if kernel is not None:
+            use_dnnl = kernel != "mkl"
+            module.use_tpp = kernel == "tpp"
+
+        module.tpp_fallback = kernel is not None and kernel != "tpp" and _using_tpp()
         if module.use_tpp:
             from intel_extension_for_pytorch.nn.utils import (
                 Apply_TPPLinear_weight_prepack,
@@ -620,10 +718,7 @@ class ParameterWrapper(object):
         # load from state dict
         if self.split is not None:
             if self.split:
-                (
-                    to_pack,
-                    self.parameter_trail,
-                ) = torch.ops.torch_ipex.split_float_bfloat16(param)
+                to_pack = self._split_for_training(param)
             else:
                 to_pack = param.to(torch.bfloat16)
         elif self.casted_dtype is not None:
@@ -687,10 +782,7 @@ class ParameterWrapper(object):
     def load_cast(self, param):
         if self.split is not None:
             if self.split:
-                (
-                    self.parameter.data,
-                    self.parameter_trail,
-                ) = torch.ops.torch_ipex.split_float_bfloat16(param)
+                self.parameter.data = self._split_for_training(param)
             else:
                 self.parameter.data = param.to(self.casted_dtype)
                 self.master_parameter.data = param
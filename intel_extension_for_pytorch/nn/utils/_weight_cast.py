@@ -6,7 +6,12 @@ from ._parameter_wrapper import get_shared_parameter_status, patch_state_dict
 
 
 def weight_dtype_convert_with_ipex(
-    model, optimizer, params_attr, master_weight_split, dtype=torch.bfloat16
+    model,
+    optimizer,
+    params_attr,
+    master_weight_split,
+    dtype=torch.bfloat16,
+    stochastic_rounding=False,
 ):
     assert dtype in [
         torch.bfloat16,
@@ -45,7 +50,9 @@ def weight_dtype_convert_with_ipex(
                     continue
                 param_wrapper = params_attr[param]
                 if param_wrapper.can_cast_training(dtype):
-                    param_wrapper.cast_for_training(dtype, master_weight_split)
+                    param_wrapper.cast_for_training(
+                        dtype, master_weight_split, stochastic_rounding
+                    )
                     if not master_weight_split:
                         with torch.no_grad():
                             setattr(
@@ -1,3 +1,4 @@
+import math
 import os
 import torch
 import torch.nn as nn
@@ -165,6 +166,8 @@ def _ipex_module_load_from_state_dict_(self, state_dict, prefix):
         loaded_bias = state_dict[b_name]
         self.bias_wrapper.load(self, loaded_bias)
     self.weight_wrapper.load(self, loaded_weight)
+    if getattr(self, "batch_size_ctxs", None):
+        _prepack_batch_size_ctxs(self, self.batch_size_input_shapes)
 
 
 class _IPEXPrepackModule(nn.Module):
@@ -174,6 +177,22 @@ class _IPEXPrepackModule(nn.Module):
     def _get_forward_bias(self):
         return self.bias if self.training else self._ipex_module_empty_bias_tensor
 
+    def _batch_size(self, x):
+        return x.size(0)
+
+    def _get_ctx(self, x):
+        # The weight prepacked for the batch size range of the input, see
+        # prepack_for_batch_sizes. They are only for inference, as the weight
+        # updated by training is the one of self.ctx.
+        batch_size_ctxs = getattr(self, "batch_size_ctxs", None)
+        if not batch_size_ctxs or self.training:
+            return self.ctx
+        batch_size = self._batch_size(x)
+        for upper_bound, ctx in batch_size_ctxs:
+            if batch_size <= upper_bound:
+                return ctx
+        return self.ctx
+
 
 class _IPEXConvNd(_IPEXPrepackModule):
     __constants__ = [
@@ -228,7 +247,7 @@ class _IPEXConvNd(_IPEXPrepackModule):
                 F.pad(x, self._reversed_padding_repeated_twice, mode=self.padding_mode),
                 self._get_forward_weight(),
                 self._get_forward_bias(),
-                self.ctx.get_data_handle(),
+                self._get_ctx(x).get_data_handle(),
                 self.weight_size,
                 self._real_padding,
                 self.stride,
@@ -239,7 +258,7 @@ class _IPEXConvNd(_IPEXPrepackModule):
             x,
             self._get_forward_weight(),
             self._get_forward_bias(),
-            self.ctx.get_data_handle(),
+            self._get_ctx(x).get_data_handle(),
             self.weight_size,
             self._real_padding,
             self.stride,
@@ -289,6 +308,9 @@ class _IPEXLinear(_IPEXPrepackModule):
         if self.bias is not None:
             self.bias.block()
 
+    def _batch_size(self, x):
+        return x.numel() // x.size(-1)
+
     def pre_ipex_gemm(self, input):
         return input
 
@@ -297,13 +319,15 @@ class _IPEXLinear(_IPEXPrepackModule):
 
     def forward(self, x):
         x = self.pre_ipex_gemm(x)
+        return self.post_ipex_gemm(self.ipex_gemm(x))
 
+    def ipex_gemm(self, x):
         if self.use_dnnl:
             output = torch.ops.torch_ipex.ipex_linear(
                 x,
                 self._get_forward_weight(),
                 self._get_forward_bias(),
-                self.ctx.get_data_handle(),
+                self._get_ctx(x).get_data_handle(),
                 self.out_features,
             )
         elif self.use_tpp:
@@ -332,11 +356,10 @@ class _IPEXLinear(_IPEXPrepackModule):
                 x,
                 self._get_forward_weight(),
                 self._get_forward_bias(),
-                self.ctx.get_data_handle(),
+                self._get_ctx(x).get_data_handle(),
                 self.out_features,
             )
-
-        return self.post_ipex_gemm(output)
+        return output
 
     def _save_to_state_dict(self, destination, prefix, keep_vars):
         if self.use_tpp:
@@ -393,6 +416,17 @@ class _IPEXLinearAllreduce(_IPEXLinear):
     def post_ipex_gemm(self, output):
         return _all_reduce_and_bias_add(self.mp_group, self.original_bias, output)
 
+    def forward(self, x):
+        from ...cpu import comm as ipex_comm
+
+        num_chunks = ipex_comm.get_allreduce_chunks(x)
+        if self.mp_group is None or num_chunks <= 1:
+            return super(_IPEXLinearAllreduce, self).forward(x)
+        # overlap the all-reduce of a chunk with the GEMM of the next
+        return ipex_comm.chunked_allreduce_add(
+            self.ipex_gemm, x, num_chunks, self.post_ipex_gemm
+        )
+
 
 class _IPEXLmHeadLinearAllreduce(_IPEXLinear):
     def __init__(self):
@@ -445,7 +479,7 @@ class _IPEXConvTransposeNd(_IPEXPrepackModule):
             x,
             self._get_forward_weight(),
             self._get_forward_bias(),
-            self.ctx.get_data_handle(),
+            self._get_ctx(x).get_data_handle(),
             self.weight_size,
             self.padding,
             self.output_padding,
@@ -638,3 +672,138 @@ def record_input_shape_for_prepack(module, sample_input):
         module.train()
     for hook in hooks:
         hook.remove()
+
+
+def _prepack_for_input_shape(m, input_shape):
+    weight = m.ctx.to_public(m.ctx.get_weight())
+    if isinstance(m, _IPEXLinear):
+        batch_size_collapsed = math.prod(input_shape[:-1])
+        if m.use_dnnl:
+            return torch.ops.ipex_prepack.linear_prepack(
+                weight, m.bias, batch_size_collapsed
+            )
+        return torch.ops.ipex_prepack.mkl_sgemm_prepack(
+            weight, m.bias, batch_size_collapsed
+        )
+    if m.weight_channels_last:
+        weight = weight.to(
+            memory_format=(
+                torch.channels_last if weight.dim() == 4 else torch.channels_last_3d
+            )
+        )
+    if isinstance(m, _IPEXConvNd):
+        return torch.ops.ipex_prepack.convolution_prepack(
+            weight,
+            m.bias,
+            m.stride,
+            m._real_padding,
+            m.dilation,
+            m.groups,
+            m.weight_channels_last,
+            list(input_shape),
+        )
+    return torch.ops.ipex_prepack.conv_transpose_prepack(
+        weight,
+        m.bias,
+        m.stride,
+        m.padding,
+        m.output_padding,
+        m.groups,
+        m.dilation,
+        m.weight_channels_last,
+        list(input_shape),
+    )
+
+
+def _prepack_batch_size_ctxs(m, input_shapes):
+    # input_shapes are (batch size, input shape) sorted by batch size, an
+    # input runs with the weight prepacked for the nearest batch size in log
+    # scale, and with self.ctx above the largest batch size.
+    upper_bounds = [
+        math.sqrt(input_shapes[i][0] * input_shapes[i + 1][0])
+        for i in range(len(input_shapes) - 1)
+    ] + [input_shapes[-1][0]]
+    m.batch_size_input_shapes = input_shapes
+    m.batch_size_ctxs = [
+        (upper_bound, _prepack_for_input_shape(m, shape))
+        for upper_bound, (_, shape) in zip(upper_bounds, input_shapes)
+    ]
+
+
+def prepack_for_batch_sizes(model, sample_inputs, max_memory=None, max_ctxs=4):
+    r"""
+    Prepack the weights of the linear and convolution modules of a model
+    optimized by ``ipex.optimize`` for inference once for each batch size of
+    the sample inputs, so that the blocked layout of the weight used by a call
+    is the one for the nearest batch size, e.g. when serving both batch size 1
+    and large batches. The batch sizes larger than those of the sample inputs
+    use the weight prepacked by ``ipex.optimize``. Similar to ``cache_weight_for_large_batch`` of
+    ``ipex.llm.optimize`` for the TPP linear.
+
+    Args:
+        model (torch.nn.Module): Model returned by ``ipex.optimize`` in eval mode.
+        sample_inputs (list): Sample inputs of the model, a tuple or a tensor
+            each, covering the batch sizes to serve.
+        max_memory (int): Maximum bytes of the extra prepacked weights. The
+            modules exceeding it keep using the single prepacked weight. No limit
+            by default.
+        max_ctxs (int): Maximum number of prepacked weights of a module.
+
+    Returns:
+        int: Bytes of the extra prepacked weights.
+    """
+
+    assert not model.training, "prepack_for_batch_sizes only supports inference"
+    assert max_ctxs > 0, "max_ctxs should be positive"
+    modules = [
+        m
+        for m in model.modules()
+        if isinstance(m, (_IPEXConvNd, _IPEXConvTransposeNd, _IPEXLinear))
+        and hasattr(m, "ctx")
+        and not getattr(m, "use_tpp", False)
+    ]
+    input_shapes = {m: {} for m in modules}
+    for m in modules:
+        m.batch_size_ctxs = None
+
+    def hook_function(self, input):
+        x = input[0]
+        if isinstance(self, _IPEXConvNd) and self.padding_mode != "zeros":
+            x = F.pad(x, self._reversed_padding_repeated_twice, mode=self.padding_mode)
+        input_shapes[self].setdefault(self._batch_size(x), list(x.shape))
+
+    hooks = [m.register_forward_pre_hook(hook_function) for m in modules]
+    try:
+        with torch.no_grad():
+            for sample_input in sample_inputs:
+                if isinstance(sample_input, torch.Tensor):
+                    sample_input = (sample_input,)
+                model(*sample_input)
+    finally:
+        for hook in hooks:
+            hook.remove()
+
+    used_memory = 0
+    skipped = 0
+    for m in modules:
+        batch_sizes = sorted(input_shapes[m].keys())
+        if len(batch_sizes) > max_ctxs:
+            # spread over the range of the batch sizes
+            batch_sizes = [
+                batch_sizes[i * (len(batch_sizes) - 1) // max(max_ctxs - 1, 1)]
+                for i in range(max_ctxs)
+            ]
+        if len(batch_sizes) == 0:
+            continue
+        weight = m.ctx.get_weight()
+        memory = weight.numel() * weight.element_size() * len(batch_sizes)
+        if max_memory is not None and used_memory + memory > max_memory:
+            skipped += 1
+            continue
+        _prepack_batch_size_ctxs(m, [(bs, input_shapes[m][bs]) for bs in batch_sizes])
+        used_memory += memory
+    if skipped > 0:
+        logger.warning(
+            f"{skipped} modules keep a single prepacked weight because of max_memory={max_memory}."
+        )
+    return used_memory
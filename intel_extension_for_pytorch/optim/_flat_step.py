@@ -0,0 +1,316 @@
+r"""Fused update steps over flattened parameter buffers.
+
+The parameters of a param group, their master weights or trails, gradients and
+states are flattened into contiguous buffers per dtype, so that the fused
+update kernel runs once per buffer instead of once per parameter. The
+parameters and states keep their shapes as views of the buffers, so the
+state_dict of the optimizer doesn't change.
+"""
+
+import types
+import torch
+from ._functional import (
+    adagrad_step,
+    adam_step,
+    get_bf16_grad,
+    get_param2,
+    is_master_weight,
+    is_stochastic_rounding,
+    random_trail,
+    sgd_step,
+)
+
+
+def _sgd_update(bucket, param2, group):
+    torch.ops.torch_ipex.sgd_fused_step(
+        bucket.param,
+        bucket.grad,
+        bucket.states.get("momentum_buffer", None),
+        param2,
+        group["momentum"],
+        group["lr"],
+        group["weight_decay"],
+        group["dampening"],
+        group["nesterov"],
+    )
+
+
+def _adam_update(bucket, param2, group):
+    beta1, beta2 = group["betas"]
+    torch.ops.torch_ipex.adam_fused_step(
+        bucket.param,
+        bucket.states["exp_avg"],
+        bucket.states["exp_avg_sq"],
+        bucket.states.get("max_exp_avg_sq", torch.Tensor()),
+        bucket.grad,
+        param2,
+        group["amsgrad"],
+        bucket.step,
+        beta1,
+        beta2,
+        group["lr"],
+        group["weight_decay"],
+        group["eps"],
+    )
+
+
+def _adagrad_update(bucket, param2, group):
+    torch.ops.torch_ipex.adagrad_fused_step(
+        bucket.param,
+        bucket.grad,
+        bucket.states["sum"],
+        param2,
+        bucket.step,
+        group["lr"],
+        group["weight_decay"],
+        group["lr_decay"],
+        group["eps"],
+    )
+
+
+# fused step: (state keys of a group, whether there is a step count, update of a bucket)
+FLAT_STEP_SPECS = {
+    sgd_step: (
+        lambda group: ["momentum_buffer"] if group["momentum"] != 0 else [],
+        False,
+        _sgd_update,
+    ),
+    adam_step: (
+        lambda group: ["exp_avg", "exp_avg_sq"]
+        + (["max_exp_avg_sq"] if group["amsgrad"] else []),
+        True,
+        _adam_update,
+    ),
+    adagrad_step: (lambda group: ["sum"], True, _adagrad_update),
+}
+
+
+def _get_grad(optimizer, p):
+    if is_master_weight(p, optimizer.params_attr):
+        return get_bf16_grad(p, optimizer.params_attr)
+    return p.grad
+
+
+def _get_param2(optimizer, p):
+    # the random trails of stochastic rounding are drawn per buffer
+    if is_stochastic_rounding(p, optimizer.params_attr):
+        return torch.Tensor()
+    return get_param2(p, optimizer.params_attr)
+
+
+def _flatten(tensors):
+    # copy the tensors into a buffer and make them views of the buffer
+    flat = torch.cat([t.detach().reshape(-1) for t in tensors])
+    offset = 0
+    for t in tensors:
+        t.data = flat[offset : offset + t.numel()].view_as(t)
+        offset += t.numel()
+    return flat
+
+
+class _FlatBucket(object):
+    def __init__(self, params, params2, grad_dtype, states, steps, stochastic_rounding):
+        self.params = params
+        self.stochastic_rounding = stochastic_rounding
+        self.param = _flatten(params)
+        self.param2 = _flatten(params2) if params2[0].numel() > 0 else torch.Tensor()
+        self.states = {k: _flatten(v) for k, v in states.items()}
+        self.steps = steps
+        self.step = steps[0].item() if steps is not None else None
+        self.grad = torch.empty(self.param.numel(), dtype=grad_dtype)
+        self.data_ptrs = [
+            self._data_ptrs(p, p2, [v[i] for v in states.values()])
+            for i, (p, p2) in enumerate(zip(params, params2))
+        ]
+
+    @staticmethod
+    def _data_ptrs(p, p2, states):
+        return (p.data_ptr(), p2.data_ptr()) + tuple(v.data_ptr() for v in states)
+
+    def get_grads(self, optimizer, state_keys):
+        r"""
+        Return the gradients of the parameters, or None if a parameter has no
+        gradient or one of the tensors is no longer a view of the buffers,
+        e.g. after load_state_dict.
+        """
+
+        grads = []
+        for i, p in enumerate(self.params):
+            grad = _get_grad(optimizer, p)
+            if grad is None or grad.is_sparse:
+                return None
+            state = optimizer.state.get(p, {})
+            if any(k not in state for k in state_keys) or (
+                self.steps is not None and state.get("step") is not self.steps[i]
+            ):
+                return None
+            data_ptrs = self._data_ptrs(
+                p,
+                _get_param2(optimizer, p),
+                [state[k] for k in state_keys],
+            )
+            if data_ptrs != self.data_ptrs[i]:
+                return None
+            grads.append(grad)
+        return grads
+
+
+class _FlatGroup(object):
+    def __init__(self, optimizer, group, state_keys, has_step):
+        self.params = group["params"]
+        self.num_params = len(group["params"])
+        # parameters which are updated by the per-parameter fused step
+        self.others = []
+        members = {}
+        for p in group["params"]:
+            info = self._get_info(optimizer, p, state_keys, has_step)
+            if info is None:
+                self.others.append(p)
+                continue
+            key, grad, param2, states, step = info
+            members.setdefault(key, []).append((p, param2, states, step))
+        self.buckets = []
+        for key, items in members.items():
+            params, params2, states, steps = zip(*items)
+            self.buckets.append(
+                _FlatBucket(
+                    list(params),
+                    list(params2),
+                    key[2],
+                    {k: [s[i] for s in states] for i, k in enumerate(state_keys)},
+                    list(steps) if has_step else None,
+                    key[5],
+                )
+            )
+
+    @staticmethod
+    def _get_info(optimizer, p, state_keys, has_step):
+        attr = optimizer.params_attr
+        if id(p) in optimizer._flat_excluded_params or (
+            p in attr and id(attr[p].parameter) in optimizer._flat_excluded_params
+        ):
+            return None
+        grad = _get_grad(optimizer, p)
+        if (
+            grad is None
+            or grad.is_sparse
+            or grad.shape != p.shape
+            or p.device.type != "cpu"
+            or torch.is_complex(p)
+            or not p.is_contiguous()
+        ):
+            return None
+        param2 = _get_param2(optimizer, p)
+        if param2.numel() > 0 and not param2.is_contiguous():
+            return None
+        state = optimizer.state.get(p, {})
+        states = [state.get(k, None) for k in state_keys]
+        if any(
+            not isinstance(s, torch.Tensor)
+            or s.shape != p.shape
+            or not s.is_contiguous()
+            for s in states
+        ):
+            return None
+        step = state.get("step", None)
+        if has_step and not (isinstance(step, torch.Tensor) and step.numel() == 1):
+            return None
+        key = (
+            p.dtype,
+            param2.dtype if param2.numel() > 0 else None,
+            grad.dtype,
+            tuple(s.dtype for s in states),
+            step.item() if has_step else None,
+            is_stochastic_rounding(p, attr),
+        )
+        return key, grad, param2, states, step
+
+    def is_valid(self, group):
+        return group["params"] is self.params and len(self.params) == self.num_params
+
+
+def _run_fused_step(optimizer, param_groups):
+    # run the per-parameter fused step on some param groups
+    all_param_groups = optimizer.param_groups
+    optimizer.param_groups = param_groups
+    try:
+        optimizer._flat_fused_step(optimizer)
+    finally:
+        optimizer.param_groups = all_param_groups
+
+
+@torch.no_grad()
+def flat_step(self, closure=None):
+    """Performs a single optimization step.
+
+    Args:
+        closure (callable, optional): A closure that reevaluates the model
+            and returns the loss.
+    """
+    loss = None
+    if closure is not None:
+        with torch.enable_grad():
+            loss = closure()
+
+    get_state_keys, has_step, update = FLAT_STEP_SPECS[self._flat_fused_step]
+    fused_step_groups = []
+    flat_groups_to_build = []
+    for i, group in enumerate(self.param_groups):
+        state_keys = get_state_keys(group)
+        flat_group = self._flat_groups.get(i, None)
+        grads = None
+        if flat_group is not None and flat_group.is_valid(group):
+            grads = [
+                bucket.get_grads(self, state_keys) for bucket in flat_group.buckets
+            ]
+        if grads is None or any(g is None for g in grads):
+            # The states are initialized by the first step, or the tensors are
+            # no longer in the buffers: update the group per parameter and
+            # flatten it again
+            fused_step_groups.append(group)
+            flat_groups_to_build.append(i)
+            continue
+        for bucket, bucket_grads in zip(flat_group.buckets, grads):
+            torch.cat([g.reshape(-1) for g in bucket_grads], out=bucket.grad)
+            if group.get("maximize", False):
+                bucket.grad.neg_()
+            if has_step:
+                torch._foreach_add_(bucket.steps, 1)
+                bucket.step += 1
+            param2 = (
+                random_trail(bucket.param)
+                if bucket.stochastic_rounding
+                else bucket.param2
+            )
+            update(bucket, param2, group)
+        if len(flat_group.others) > 0:
+            fused_step_groups.append(dict(group, params=flat_group.others))
+
+    if len(fused_step_groups) > 0:
+        _run_fused_step(self, fused_step_groups)
+    for i in flat_groups_to_build:
+        group = self.param_groups[i]
+        self._flat_groups[i] = _FlatGroup(self, group, get_state_keys(group), has_step)
+    return loss
+
+
+def enable_flat_step(optimizer, fused_step, model=None):
+    r"""
+    Patch "step" method to run the fused update kernel on flattened buffers.
+    The weights of the prepacked modules of ``model`` share their storages
+    with the op contexts, they are updated per parameter.
+    """
+
+    excluded_params = set()
+    if model is not None:
+        from ..nn.utils._parameter_wrapper import IPEX_WEIGHT_PREPACK_MODULE_CPU
+
+        prepack_modules = tuple(IPEX_WEIGHT_PREPACK_MODULE_CPU().values())
+        for m in model.modules():
+            if isinstance(m, prepack_modules):
+                excluded_params.update(id(p) for p in m.parameters(recurse=False))
+    setattr(optimizer, "_flat_fused_step", fused_step)  # noqa: B010
+    setattr(optimizer, "_flat_excluded_params", excluded_params)  # noqa: B010
+    setattr(optimizer, "_flat_groups", {})  # noqa: B010
+    optimizer.step = types.MethodType(flat_step, optimizer)
+    return optimizer
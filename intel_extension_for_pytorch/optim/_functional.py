@@ -21,15 +21,34 @@ def get_bf16_grad(param, params_attr):
     return params_attr[param].parameter.grad
 
 
+def is_stochastic_rounding(param, params_attr):
+    return param in params_attr and bool(params_attr[param].stochastic_rounding)
+
+
+def random_trail(param):
+    # The fused kernels update the fp32 weight made of the bf16 param and the
+    # trail, and keep its upper 16 bits. With random lower 16 bits, the updated
+    # weight is rounded to bf16 stochastically: it is rounded away from the
+    # param with a probability proportional to the update, so the expectation
+    # of the rounded weight is the updated weight.
+    return torch.randint(
+        -(2**15), 2**15, param.shape, dtype=torch.int16, device=param.device
+    ).view(torch.bfloat16)
+
+
 def get_param2(param, params_attr):
     # For pure fp32 case, param2 is not needed.
     # For master weight case, param2 is the bf16 copy of fp32 weight
     # For master weight split case, param2 is the trail part of fp32 weight
+    # For stochastic rounding case, param2 is a random trail
     param2 = torch.Tensor()
     if param in params_attr:
         if params_attr[param].parameter_trail is not None:
             assert param.dtype is torch.bfloat16
             param2 = params_attr[param].parameter_trail
+        elif is_stochastic_rounding(param, params_attr):
+            assert param.dtype is torch.bfloat16
+            param2 = random_trail(param)
         elif is_master_weight(param, params_attr):
             param2 = params_attr[param].parameter
     return param2
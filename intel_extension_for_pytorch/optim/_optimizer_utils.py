@@ -15,6 +15,7 @@ from ._functional import (
 )
 from ._lamb import Lamb
 from ._lars import Lars
+from ._flat_step import enable_flat_step, FLAT_STEP_SPECS
 from ..nn import utils
 
 IPEX_FUSED_OPTIMIZER_LIST_CPU = [
@@ -357,9 +358,11 @@ def patch_state_dict(optimizer):
         )
 
 
-def optimizer_fusion(optimizer, device_type, user_explict_fuse):
+def optimizer_fusion(optimizer, device_type, user_explict_fuse, model=None):
     r"""
     Patch "step" method to choose IPEX optimized fused update kernel.
+    When the fused update step is explicitly enabled on CPU, the SGD, Adam and
+    Adagrad steps run on flattened buffers, see ``enable_flat_step``.
     """
 
     if not hasattr(optimizer, "params_attr"):
@@ -380,6 +383,12 @@ def optimizer_fusion(optimizer, device_type, user_explict_fuse):
         if not hasattr(optimizer, "_original_step"):
             setattr(optimizer, "_original_step", optimizer.step)  # noqa: B010
         optimizer.step = types.MethodType(step, optimizer)
+        if (
+            user_explict_fuse is True
+            and device_type == "cpu"
+            and step in FLAT_STEP_SPECS
+        ):
+            enable_flat_step(optimizer, step, model)
         setattr(optimizer, "fused", True)  # noqa: B010
     except KeyError:
         msg = (
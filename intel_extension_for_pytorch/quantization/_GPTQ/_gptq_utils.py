@@ -19,6 +19,9 @@ def gptq_quantize(
     device=torch.device("cpu"),
     layer_wise=False,
     model_path=None,
+    offload_dir=None,
+    checkpoint_dir=None,
+    cpu_pools=None,
 ):
     """Run weight-only quantization with weight configs.
 
@@ -44,6 +47,9 @@ def gptq_quantize(
         device: set to torch.device("cpu").
         layer_wise (bool): whether to do LWQ.
         model_path (str): path to register LWQ weight hooks.
+        offload_dir (str): directory to store the calibration hidden states on disk.
+        checkpoint_dir (str): directory to save the progress to, and to resume from.
+        cpu_pools (list): CPU pools to quantize the layers of a transformer block concurrently.
     """
     assert isinstance(model, torch.nn.Module), "only support torch module"
     if layer_wise:
@@ -65,6 +71,9 @@ def gptq_quantize(
         pad_max_length,
         device,
         layer_wise=layer_wise,
+        offload_dir=offload_dir,
+        checkpoint_dir=checkpoint_dir,
+        cpu_pools=cpu_pools,
     )
     fp32_modified_model, gptq_config = gptq_quantizer.execute_quantization(
         model_path=model_path
@@ -26,6 +26,9 @@ def gptq(
     compression_dim=1,
     scale_dtype=torch.float16,
     save_dir="saved_results",
+    offload_dir=None,
+    checkpoint_dir=None,
+    cpu_pools=None,
 ):
     """User API to run GPTQ; quantize and save checkpoint to designated path.
 
@@ -47,6 +50,13 @@ def gptq(
         compression_dim (int): 0 means output channel while 1 means input channel.
         scale_dtype: data type for scale and bias.
         save_dir (str): path to save checkpoint.
+        offload_dir (str): directory where the calibration hidden states between transformer blocks are
+                        stored and read back memory-mapped instead of being kept in memory.
+        checkpoint_dir (str): directory where the progress is saved after every transformer block.
+                        Running again with the same directory resumes from the last saved block.
+        cpu_pools (list): intel_extension_for_pytorch.cpu.runtime.CPUPool objects, e.g. from
+                        ipex.cpu.runtime.get_cpu_pools(). The independent layers of a transformer
+                        block are quantized concurrently, one per pool.
     """
     logger.warning(
         "The GPTQ API is deprecated. Please use the Intel(R) Neural Compressor to run GPTQ instead."
@@ -96,6 +106,9 @@ def gptq(
         pad_max_length,
         layer_wise,
         model_path,
+        offload_dir=offload_dir,
+        checkpoint_dir=checkpoint_dir,
+        cpu_pools=cpu_pools,
     )
     logger.info("Exporting compressed model...")
     compressed_model = gptq_export(
@@ -1,14 +1,19 @@
 import logging
 import math
+import os
+import queue
 import random
 import re
 import time
 import torch
 import torch.nn as nn
 import transformers
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from tqdm import tqdm
+import intel_extension_for_pytorch as ipex
 from .model_utils import (
+    ActivationBuffer,
     find_layers,
     trace_gptq_target_blocks,
     log_quantizable_layers_per_transformer,
@@ -34,6 +39,9 @@ class GPTQuantizer(object):
         pad_max_length=2048,
         device=None,
         layer_wise=False,
+        offload_dir=None,
+        checkpoint_dir=None,
+        cpu_pools=None,
     ):
         """
         Args:
@@ -51,6 +59,12 @@ class GPTQuantizer(object):
                 ...
             }
             dataloader: an iterable containing calibration datasets, contains (inputs, targets)
+            offload_dir (str, optional): directory where the hidden states between transformer blocks are
+                stored and read back memory-mapped, instead of being kept in memory.
+            checkpoint_dir (str, optional): directory where the progress is saved after every transformer
+                block. The quantization resumes from the last saved block when it is run again.
+            cpu_pools (list, optional): intel_extension_for_pytorch.cpu.runtime.CPUPool objects, the
+                independent layers of a transformer block are quantized concurrently, one per pool.
         """
         self.model = model
         self.gptq_related_blocks = trace_gptq_target_blocks(
@@ -77,6 +91,19 @@ class GPTQuantizer(object):
         self.device = "cpu"
         self.is_ready = False
         self.layer_wise = layer_wise
+        self.offload_dir = offload_dir
+        if offload_dir is not None:
+            os.makedirs(offload_dir, exist_ok=True)
+        self.checkpoint_dir = checkpoint_dir
+        if checkpoint_dir is not None:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+        if cpu_pools is not None and not ipex.cpu.runtime.is_runtime_ext_enabled():
+            logger.warning(
+                "The runtime extension is not enabled, quantize the layers one by one "
+                + "instead of on cpu_pools. Please preload the Intel OpenMP library."
+            )
+            cpu_pools = None
+        self.cpu_pools = cpu_pools
 
         # dataloader
         self.use_max_length = use_max_length
@@ -348,7 +375,11 @@ class GPTQuantizer(object):
                 # each outputs can be different shape, hence also use list to store
                 if isinstance(kwargs[arg], torch.Tensor) or arg == "alibi":
                     if self.cache_key_arguments.get(arg, None) is None:
-                        self.cache_key_arguments[arg] = []
+                        self.cache_key_arguments[arg] = (
+                            self.new_hidden_states_cache(0)
+                            if arg == "hidden_states"
+                            else []
+                        )
                     self.cache_key_arguments[arg].append(kwargs[arg])
                 continue
             # copy positional arguments, positional arguments are sensitive for their order, be cautious!
@@ -357,7 +388,9 @@ class GPTQuantizer(object):
             for idx, item in enumerate(args):
                 if (idx + 1) > len(self.cache_positional_arguments):
                     # initialize
-                    self.cache_positional_arguments.append([])
+                    self.cache_positional_arguments.append(
+                        self.new_hidden_states_cache(0) if idx == 0 else []
+                    )
                 self.cache_positional_arguments[idx].append(item)
             raise ValueError
 
@@ -426,11 +459,127 @@ class GPTQuantizer(object):
             single_batch.append(data_item[idx])
         return single_batch
 
+    def new_hidden_states_cache(self, block_idx):
+        # the hidden states cache of the inputs of the given transformer block
+        if self.offload_dir is None:
+            return []
+        return ActivationBuffer(
+            os.path.join(self.offload_dir, "hidden_states_{}.bin".format(block_idx))
+        )
+
     def update_blockwise_hidden_states(self, outs):
+        if isinstance(outs, list):
+            outs = outs[:]
         if "hidden_states" in self.cache_key_arguments:
-            self.cache_key_arguments["hidden_states"] = outs[:]
+            old_outs = self.cache_key_arguments["hidden_states"]
+            self.cache_key_arguments["hidden_states"] = outs
+        else:
+            old_outs = self.cache_positional_arguments[0]
+            self.cache_positional_arguments[0] = outs
+        if isinstance(old_outs, ActivationBuffer) and old_outs is not outs:
+            old_outs.close(remove=True)
+
+    def save_checkpoint(self, block_idx, quantized_layers, gptq_config, outs):
+        """Save the progress after quantizing a transformer block."""
+        torch.save(
+            {n: layer.weight.data for n, layer in quantized_layers.items()},
+            os.path.join(self.checkpoint_dir, "block_{}.pt".format(block_idx)),
+        )
+        if isinstance(outs, ActivationBuffer):
+            outs.save_index()
+            hidden_states = outs.path
+        else:
+            hidden_states = os.path.join(self.checkpoint_dir, "hidden_states.pt")
+            torch.save(outs, hidden_states + ".tmp")
+            os.replace(hidden_states + ".tmp", hidden_states)
+        progress_file = os.path.join(self.checkpoint_dir, "progress.pt")
+        torch.save(
+            {
+                "num_blocks": len(self.gptq_related_blocks["transformers"]),
+                "nsamples": len(self.dataloader),
+                "block_idx": block_idx,
+                "gptq_config": gptq_config,
+                "hidden_states": hidden_states,
+            },
+            progress_file + ".tmp",
+        )
+        # the progress is updated at once, so that a crash leaves the previous one
+        os.replace(progress_file + ".tmp", progress_file)
+
+    def load_checkpoint(self):
+        """Restore the progress saved by save_checkpoint, and return the first
+        transformer block to quantize and the gptq config of the quantized ones."""
+        progress_file = os.path.join(self.checkpoint_dir, "progress.pt")
+        if not os.path.exists(progress_file):
+            return 0, {}
+        progress = torch.load(progress_file)
+        if progress["num_blocks"] != len(
+            self.gptq_related_blocks["transformers"]
+        ) or progress["nsamples"] != len(self.dataloader):
+            logger.warning(
+                f"The checkpoint in {self.checkpoint_dir} doesn't match the model or "
+                + "the calibration data, quantize from the first transformer block."
+            )
+            return 0, {}
+        for block_idx in range(progress["block_idx"] + 1):
+            weights = torch.load(
+                os.path.join(self.checkpoint_dir, "block_{}.pt".format(block_idx))
+            )
+            layers = find_layers(self.gptq_related_blocks["transformers"][block_idx])
+            for layer_name, weight in weights.items():
+                layers[layer_name].weight.data = weight
+        hidden_states = progress["hidden_states"]
+        if hidden_states.endswith(".bin"):
+            hidden_states = ActivationBuffer.load(hidden_states)
         else:
-            self.cache_positional_arguments[0] = outs[:]
+            hidden_states = torch.load(hidden_states)
+        self.update_blockwise_hidden_states(hidden_states)
+        logger.info(
+            f"Resume from transformer block {progress['block_idx'] + 2} "
+            + f"with the checkpoint in {self.checkpoint_dir}"
+        )
+        return progress["block_idx"] + 1, progress["gptq_config"]
+
+    def run_fasterquant(self, gptq_for_this_block, layers, block_idx):
+        """Run GPTQ for the layers of a transformer block, which are independent
+        of each other, concurrently on self.cpu_pools if it is set."""
+
+        def fasterquant(layer_name):
+            weight_config_this_layer = self.get_layer_config(
+                self.get_full_layer_name(layer_name, block_idx)
+            )
+            logger.info(f"Quantizing layer {layer_name}")
+            W = layers[layer_name].weight.data.clone()
+            return gptq_for_this_block[layer_name].fasterquant(
+                W,
+                blocksize=weight_config_this_layer["block_size"],
+                percdamp=weight_config_this_layer["percdamp"],
+                groupsize=weight_config_this_layer["group_size"],
+                act_order=weight_config_this_layer["act_order"],
+                static_groups=weight_config_this_layer["static_groups"],
+            )
+
+        if self.cpu_pools is None or len(layers) <= 1:
+            return {layer_name: fasterquant(layer_name) for layer_name in layers}
+
+        free_pools = queue.Queue()
+        for pool in self.cpu_pools:
+            free_pools.put(pool)
+
+        def fasterquant_on_pool(layer_name):
+            pool = free_pools.get()
+            try:
+                with ipex.cpu.runtime.pin(pool):
+                    return fasterquant(layer_name)
+            finally:
+                free_pools.put(pool)
+
+        with ThreadPoolExecutor(max_workers=len(self.cpu_pools)) as executor:
+            futures = {
+                layer_name: executor.submit(fasterquant_on_pool, layer_name)
+                for layer_name in layers
+            }
+            return {layer_name: f.result() for layer_name, f in futures.items()}
 
     def find_true_sequential_config(self):
         for layer_name in self.weight_config:
@@ -474,6 +623,9 @@ class GPTQuantizer(object):
 
         # Step2: run gptq quantization in a transformer block-wise manner.
         gptq_config = {}
+        start_block_idx = 0
+        if self.checkpoint_dir is not None:
+            start_block_idx, gptq_config = self.load_checkpoint()
 
         self.true_sequential = self.find_true_sequential_config()
         # automatically get true_sequential
@@ -482,7 +634,7 @@ class GPTQuantizer(object):
         )
         logger.info(f"Sequential Name: {true_sequential_map}")
         tblock_length = len(self.gptq_related_blocks["transformers"])
-        for block_idx in range(tblock_length):
+        for block_idx in range(start_block_idx, tblock_length):
             logger.info(f"Quantizing layer {block_idx + 1} / {tblock_length}..")
             transformer_block = self.gptq_related_blocks["transformers"][block_idx].to(
                 self.device
@@ -495,6 +647,7 @@ class GPTQuantizer(object):
                 sequentials = true_sequential_map
             else:
                 sequentials = [list(sub_layers.keys())]
+            quantized_layers = {}
             # start to process every layers in a sequential
             for sequential in sequentials:
                 logger.info(f"Current quantization sequential: {sequential}")
@@ -565,22 +718,17 @@ class GPTQuantizer(object):
                 for h in handles:
                     h.remove()
                 # Step 2.4: everything is prepared, so start quantization!
+                results = self.run_fasterquant(
+                    gptq_for_this_block, sequential_layers, block_idx
+                )
                 for layer_name in sequential_layers:
                     weight_config_this_layer = self.get_layer_config(
                         self.get_full_layer_name(layer_name, block_idx)
                     )
-                    logger.info(f"Quantizing layer {layer_name}")
-                    W = sequential_layers[layer_name].weight.data.clone()
-                    scale, zp, Q = gptq_for_this_block[layer_name].fasterquant(
-                        W,
-                        blocksize=weight_config_this_layer["block_size"],
-                        percdamp=weight_config_this_layer["percdamp"],
-                        groupsize=weight_config_this_layer["group_size"],
-                        act_order=weight_config_this_layer["act_order"],
-                        static_groups=weight_config_this_layer["static_groups"],
-                    )
+                    scale, zp, Q = results[layer_name]
 
                     sequential_layers[layer_name].weight.data = Q
+                    quantized_layers[layer_name] = sequential_layers[layer_name]
                     gptq_config[self.get_full_layer_name(layer_name, block_idx)] = {
                         "scale": scale
                     }
@@ -599,7 +747,7 @@ class GPTQuantizer(object):
                     gptq_for_this_block[layer_name].free()
 
             # Step 2.5: replace output data with quantized weights
-            outs = []
+            outs = self.new_hidden_states_cache(block_idx + 1)
             idx = self.cache_key_arguments.pop("i")
             for j in range(len(self.dataloader)):
                 cache_keyword_batch = self.gather_single_batch_from_dict(
@@ -617,6 +765,8 @@ class GPTQuantizer(object):
             ] = transformer_block.cpu()
             del gptq_for_this_block
             torch.cuda.empty_cache()
+            if self.checkpoint_dir is not None:
+                self.save_checkpoint(block_idx, quantized_layers, gptq_config, outs)
             # iteratively replace the input with output, thus layerwise quantization can continue.
             self.update_blockwise_hidden_states(outs)
             logger.info("------------------------------")
@@ -709,6 +859,9 @@ class GPTQuantizer(object):
                     ].perm
                 gptq_post_block[layer_name].free()
 
+        # the hidden states of the last block are kept with the checkpoint
+        if self.checkpoint_dir is None:
+            self.update_blockwise_hidden_states([])
         logger.info("Quantization done")
 
         # obtain model (all weight only quantization API function should return)
@@ -1,4 +1,6 @@
+import json
 import logging
+import os
 import torch
 import torch.nn as nn
 import transformers
@@ -171,3 +173,96 @@ def quantize(x, scale, zero, maxq):
         return (x > scale / 2).float() * scale + (x < zero / 2).float() * zero
     q = torch.clamp(torch.round(x / scale) + zero, 0, maxq)
     return scale * (q - zero)
+
+
+class ActivationBuffer(object):
+    """A list of tensors appended to a file and read back memory-mapped.
+
+    It stores the calibration activations between transformer blocks on disk, so
+    they are paged in when a block reads them instead of being kept in memory.
+    """
+
+    alignment = 64
+
+    def __init__(self, path):
+        self.path = path
+        self.index = []  # (offset, shape, dtype) of the tensors
+        self.size = 0
+        self._file = open(path, "wb")
+        self._data = None
+
+    @classmethod
+    def load(cls, path):
+        """Open the buffer saved to ``path`` by :meth:`save_index`."""
+        buffer = cls.__new__(cls)
+        buffer.path = path
+        with open(path + ".json", "r") as f:
+            buffer.index = [
+                (offset, shape, getattr(torch, dtype))
+                for offset, shape, dtype in json.load(f)
+            ]
+        buffer.size = os.path.getsize(path)
+        buffer._file = None
+        buffer._data = None
+        return buffer
+
+    def save_index(self):
+        self.flush()
+        with open(self.path + ".json", "w") as f:
+            json.dump(
+                [
+                    (offset, shape, str(dtype).split(".")[-1])
+                    for offset, shape, dtype in self.index
+                ],
+                f,
+            )
+
+    def append(self, t):
+        assert self._file is not None, "ActivationBuffer is read only"
+        t = t.detach().contiguous()
+        if t.numel() == 0:
+            self.index.append((self.size, list(t.shape), t.dtype))
+            return
+        offset = (self.size + self.alignment - 1) // self.alignment * self.alignment
+        self._file.seek(offset)
+        self._file.write(t.reshape(-1).view(torch.uint8).numpy().tobytes())
+        self.index.append((offset, list(t.shape), t.dtype))
+        self.size = offset + t.numel() * t.element_size()
+        self._data = None
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, idx):
+        offset, shape, dtype = self.index[idx]
+        numel = 1
+        for size in shape:
+            numel *= size
+        if numel == 0:
+            return torch.empty(shape, dtype=dtype)
+        if self._data is None:
+            self.flush()
+            # Private mapping: the pages are loaded on access and never written back
+            self._data = torch.from_file(
+                self.path, shared=False, size=self.size, dtype=torch.uint8
+            )
+        nbytes = numel * torch.empty((), dtype=dtype).element_size()
+        return self._data[offset : offset + nbytes].view(dtype).view(shape)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def close(self, remove=False):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._data = None
+        if remove:
+            for path in [self.path, self.path + ".json"]:
+                if os.path.exists(path):
+                    os.remove(path)
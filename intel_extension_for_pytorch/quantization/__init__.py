@@ -13,6 +13,8 @@ from ._qconfig import (
     WoqWeightQScheme,
 )
 from ._autotune import autotune
+from ._calibration import calibrate
+from ._woq_calibration import woq_calibrate
 from ._quantize_utils import (
     quantize_per_channel,
     dequantize_per_channel,
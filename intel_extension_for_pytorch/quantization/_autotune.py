@@ -1,14 +1,20 @@
 # This Python file uses the following encoding: utf-8
 
+import itertools
 import os
+import re
 import sys
+import tempfile
 import copy
 import json
-from ..utils._logger import logger
+from ..utils._logger import logger, WarningType
 import subprocess
 import torch
 import time
 import intel_extension_for_pytorch as ipex
+from ._calibration import calibrate, _run_batch
+from ._quantize_utils import copy_prepared_model
+from ._recipe import fallback_ops, get_quantized_ops
 
 
 def autotune(
@@ -20,6 +26,7 @@ def autotune(
     sampling_sizes=None,
     accuracy_criterion=None,
     tuning_time=0,
+    backend="neural_compressor",
 ):
     r"""
     Automatic accuracy-driven tuning helps users quickly find out the advanced recipe for INT8 inference.
@@ -39,6 +46,13 @@ def autotune(
         accuracy_criterion ({accuracy_criterion_type(str, 'relative' or 'absolute') : accuracy_criterion_value(float)}):
             set the maximum allowed accuracy loss, either relative or absolute. The default value is ``{'relative': 0.01}``.
         tuning_time (seconds): tuning timeout. The default value is ``0`` which means early stop.
+        backend (str): ``"neural_compressor"`` tunes with Intel® Neural Compressor, which is installed
+            if it is missing. ``"ipex"`` uses the built-in tuner, which works offline: it ranks the
+            quantized ops by the error of the model output when only this op is quantized, and falls
+            back the most sensitive ops to their original dtype one at a time until the accuracy
+            criterion is met. The accuracy and throughput of every candidate are logged and kept in
+            the ``tuning_results`` attribute of the returned model. ``op_type_dict`` forces the ops
+            of a type to fp32, e.g. ``{"Linear": {"activation": {"dtype": ["fp32"]}}}``.
 
     Returns:
         prepared_model (torch.nn.Module): the prepared model loaded qconfig after tuning.
@@ -49,6 +63,21 @@ def autotune(
         accuracy_criterion = {"relative": 0.01}
     if op_type_dict is None:
         op_type_dict = {}
+    assert backend in [
+        "neural_compressor",
+        "ipex",
+    ], "autotune backend {} is not supported".format(backend)
+    if backend == "ipex":
+        return _ipex_autotune(
+            model,
+            calib_dataloader,
+            calib_func,
+            eval_func,
+            op_type_dict,
+            sampling_sizes[0],
+            accuracy_criterion,
+            tuning_time,
+        )
     smoothquant_args = {}
 
     neural_compressor_version = "2.4.1"
@@ -173,3 +202,244 @@ def autotune(
         print(f"Failed to delete {dirname_str}. Reason: {e}")
 
     return prepared_model
+
+
+def _get_model_inputs(batch):
+    # The batches of a dataloader with labels are (inputs, label)
+    if isinstance(batch, (tuple, list)) and len(batch) == 2:
+        return batch[0]
+    return batch
+
+
+def _batch_size(inputs):
+    if isinstance(inputs, torch.Tensor):
+        return inputs.size(0) if inputs.dim() > 0 else 1
+    if isinstance(inputs, dict):
+        inputs = list(inputs.values())
+    if isinstance(inputs, (tuple, list)):
+        for x in inputs:
+            if isinstance(x, torch.Tensor):
+                return _batch_size(x)
+    return 1
+
+
+def _flatten_tensors(outputs):
+    if isinstance(outputs, torch.Tensor):
+        return [outputs.float()]
+    if isinstance(outputs, dict):
+        outputs = list(outputs.values())
+    if isinstance(outputs, (tuple, list)):
+        return [t for x in outputs for t in _flatten_tensors(x)]
+    return []
+
+
+def _output_error(outputs, ref_outputs):
+    # Mean squared error relative to the mean square of the reference outputs
+    error = 0.0
+    for out, ref in zip(_flatten_tensors(outputs), _flatten_tensors(ref_outputs)):
+        error += ((out - ref).pow(2).mean() / ref.pow(2).mean().clamp_min(1e-12)).item()
+    return error
+
+
+def _op_type_name(op_type):
+    # e.g. "<class 'torch.nn.modules.linear.Linear'>" -> "Linear",
+    # "<built-in function linear>" -> "linear" and
+    # "<method 'add' of 'torch._C.TensorBase' objects>" -> "add"
+    match = re.match(
+        r"<class '(?:[\w.]*\.)?(\w+)'>|<method '(\w+)'|<(?:built-in )?(?:function|method) (\w+)",
+        op_type,
+    )
+    if match is None:
+        return op_type
+    return next(name for name in match.groups() if name is not None)
+
+
+def _is_forced_fp32(op_type, op_type_dict):
+    for name, config in op_type_dict.items():
+        if name.lower() != _op_type_name(op_type).lower():
+            continue
+        for tensor_config in config.values():
+            if "fp32" in tensor_config.get("dtype", []):
+                return True
+    return False
+
+
+def _trace(model, example_inputs):
+    # Run the candidates as the INT8 graph used for deployment, or in eager
+    # mode if they can't be traced.
+    try:
+        with torch.no_grad():
+            if isinstance(example_inputs, dict):
+                traced_model = torch.jit.trace(
+                    model,
+                    example_kwarg_inputs=example_inputs,
+                    check_trace=False,
+                    strict=False,
+                )
+            else:
+                if not isinstance(example_inputs, (tuple, list)):
+                    example_inputs = (example_inputs,)
+                traced_model = torch.jit.trace(
+                    model, tuple(example_inputs), check_trace=False, strict=False
+                )
+            traced_model = torch.jit.freeze(traced_model)
+            # Run the graph optimization passes
+            for _ in range(2):
+                _run_batch(traced_model, example_inputs)
+        return traced_model
+    except Exception as e:
+        logger.warning(
+            "Failed to trace the quantized model ({}), tune it in eager mode.".format(
+                e
+            ),
+            _type=WarningType.NotSupported,
+        )
+        return model
+
+
+def _throughput(model, example_inputs, iterations=20):
+    with torch.no_grad():
+        _run_batch(model, example_inputs)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            _run_batch(model, example_inputs)
+        elapsed = time.perf_counter() - start
+    return _batch_size(example_inputs) * iterations / elapsed
+
+
+def _meet_criterion(accuracy, baseline, accuracy_criterion):
+    criterion, value = list(accuracy_criterion.items())[0]
+    if criterion == "relative":
+        return accuracy >= baseline * (1 - value)
+    return accuracy >= baseline - value
+
+
+def _ipex_autotune(
+    model,
+    calib_dataloader,
+    calib_func,
+    eval_func,
+    op_type_dict,
+    sampling_size,
+    accuracy_criterion,
+    tuning_time,
+):
+    start_time = time.time()
+    batches = iter(calib_dataloader)
+    first_batch = next(batches)
+    example_inputs = _get_model_inputs(first_batch)
+    qconfig = ipex.quantization.default_static_qconfig_mapping
+    if isinstance(example_inputs, dict):
+        prepared_model = ipex.quantization.prepare(
+            model, qconfig, example_kwarg_inputs=example_inputs, inplace=False
+        )
+    else:
+        prepared_model = ipex.quantization.prepare(
+            model, qconfig, example_inputs=example_inputs, inplace=False
+        )
+
+    if calib_func is not None:
+        calib_func(prepared_model)
+    else:
+
+        def sampled_batches():
+            num_samples = 0
+            for batch in itertools.chain([first_batch], batches):
+                yield batch
+                num_samples += _batch_size(_get_model_inputs(batch))
+                if num_samples >= sampling_size:
+                    return
+
+        calibrate(
+            prepared_model,
+            sampled_batches(),
+            run_fn=lambda m, batch: _run_batch(m, _get_model_inputs(batch)),
+        )
+    # Set the scales and the default recipe
+    with tempfile.TemporaryDirectory() as tmp:
+        prepared_model.save_qconf_summary(
+            os.path.join(tmp, "default_configure.qconf"), binary=True
+        )
+
+    quant_state_map = prepared_model._fqn_to_auto_quant_state_map
+
+    def op_name(op):
+        op_info = quant_state_map[op[0]].idx_to_seen_q_op_infos[op[1]]
+        return "{} ({})".format(op_info.fqn, _op_type_name(op_info.type))
+
+    def op_type(op):
+        return quant_state_map[op[0]].idx_to_seen_q_op_infos[op[1]].type
+
+    quantized_ops = get_quantized_ops(quant_state_map)
+    forced_ops = [
+        op for op in quantized_ops if _is_forced_fp32(op_type(op), op_type_dict)
+    ]
+    tunable_ops = [op for op in quantized_ops if op not in forced_ops]
+
+    def candidate_model(fallback):
+        candidate = copy_prepared_model(prepared_model)
+        fallback_ops(candidate._fqn_to_auto_quant_state_map, forced_ops + fallback)
+        return candidate
+
+    # Sensitivity of an op: the error of the model outputs when only this op is
+    # quantized, in eager mode with the fake quant of the quantization state
+    with torch.no_grad():
+        ref_outputs = _run_batch(model, example_inputs)
+        sensitivity = {}
+        for op in tunable_ops:
+            others = [o for o in tunable_ops if o != op]
+            converted_model = ipex.quantization.convert(candidate_model(others))
+            outputs = _run_batch(converted_model, example_inputs)
+            sensitivity[op] = _output_error(outputs, ref_outputs)
+    ranked_ops = sorted(tunable_ops, key=lambda op: sensitivity[op], reverse=True)
+    logger.info(
+        "Quantized ops by sensitivity: "
+        + ", ".join(
+            "{}: {:.3g}".format(op_name(op), sensitivity[op]) for op in ranked_ops
+        )
+    )
+
+    baseline = eval_func(model)
+    logger.info(
+        "FP32 baseline: accuracy {:.5f}, throughput {:.2f} samples/s".format(
+            baseline, _throughput(model, example_inputs)
+        )
+    )
+    # Greedily fall back the most sensitive ops until the accuracy is met
+    tuning_results = []
+    best_model, best_accuracy = None, None
+    met = False
+    for num_fallback in range(len(ranked_ops) + 1):
+        fallback = ranked_ops[:num_fallback]
+        candidate = candidate_model(fallback)
+        quantized_model = _trace(ipex.quantization.convert(candidate), example_inputs)
+        accuracy = eval_func(quantized_model)
+        throughput = _throughput(quantized_model, example_inputs)
+        tuning_results.append(
+            {
+                "fallback_ops": [op_name(op) for op in forced_ops + fallback],
+                "accuracy": accuracy,
+                "throughput": throughput,
+            }
+        )
+        logger.info(
+            "Candidate with {} fallback ops: accuracy {:.5f}, throughput {:.2f} samples/s".format(
+                len(forced_ops) + num_fallback, accuracy, throughput
+            )
+        )
+        if best_accuracy is None or accuracy > best_accuracy:
+            best_model, best_accuracy = candidate, accuracy
+        if _meet_criterion(accuracy, baseline, accuracy_criterion):
+            best_model, best_accuracy = candidate, accuracy
+            met = True
+            break
+        if tuning_time > 0 and time.time() - start_time > tuning_time:
+            break
+    if not met:
+        logger.warning(
+            "No tuned recipe meets the accuracy criterion {}, return the most accurate one.".format(
+                accuracy_criterion
+            )
+        )
+    best_model.tuning_results = tuning_results
+    return best_model
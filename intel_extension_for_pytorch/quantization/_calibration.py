@@ -0,0 +1,331 @@
+import io
+import itertools
+import queue
+import traceback
+import types
+
+import torch
+import torch.multiprocessing as mp
+from torch.ao.quantization import (
+    HistogramObserver,
+    MinMaxObserver,
+    ObserverBase,
+    PerChannelMinMaxObserver,
+)
+
+from ..utils._logger import logger, WarningType
+
+
+def _run_batch(model, batch):
+    if isinstance(batch, dict):
+        return model(**batch)
+    if isinstance(batch, (tuple, list)):
+        return model(*batch)
+    return model(batch)
+
+
+def _named_observers(model):
+    return [(n, m) for n, m in model.named_modules() if isinstance(m, ObserverBase)]
+
+
+def _is_min_max_observer(observer):
+    # MovingAverage(PerChannel)MinMaxObserver are merged as their min/max
+    # observer counterparts, which is an approximation for them.
+    return isinstance(observer, (MinMaxObserver, PerChannelMinMaxObserver))
+
+
+def _reset_observer(observer):
+    if _is_min_max_observer(observer):
+        observer.reset_min_max_vals()
+    elif isinstance(observer, HistogramObserver):
+        observer.histogram.zero_()
+        observer.min_val.resize_(()).fill_(float("inf"))
+        observer.max_val.resize_(()).fill_(float("-inf"))
+
+
+def _observer_state(observer):
+    if _is_min_max_observer(observer):
+        return {"min_val": observer.min_val, "max_val": observer.max_val}
+    if isinstance(observer, HistogramObserver):
+        return {
+            "histogram": observer.histogram,
+            "min_val": observer.min_val,
+            "max_val": observer.max_val,
+        }
+    return None
+
+
+def _interp(x, xp, fp):
+    # Piecewise linear interpolation of (xp, fp) at x, constant outside of xp
+    idx = torch.searchsorted(xp, x).clamp(1, xp.numel() - 1)
+    x0, x1 = xp[idx - 1], xp[idx]
+    weight = ((x - x0) / (x1 - x0).clamp_min(torch.finfo(xp.dtype).tiny)).clamp(0, 1)
+    return fp[idx - 1] + weight * (fp[idx] - fp[idx - 1])
+
+
+def _rebin_histogram(histogram, min_val, max_val, edges):
+    # Redistribute the counts of a histogram of [min_val, max_val] to the
+    # bins of the given edges, assuming the counts are uniform in a bin.
+    if min_val == max_val:
+        ret = torch.zeros(edges.numel() - 1, dtype=histogram.dtype)
+        idx = torch.searchsorted(edges, min_val.reshape(1), right=True) - 1
+        ret[idx.clamp(0, ret.numel() - 1)] = histogram.sum()
+        return ret
+    src_edges = torch.linspace(
+        min_val.item(), max_val.item(), histogram.numel() + 1, dtype=torch.float64
+    )
+    cdf = torch.cat([torch.zeros(1, dtype=torch.float64), histogram.double().cumsum(0)])
+    return _interp(edges, src_edges, cdf).diff().to(histogram.dtype)
+
+
+def _merge_histogram(observer, state):
+    min_val, max_val = state["min_val"], state["max_val"]
+    if min_val.numel() == 0 or min_val == float("inf"):
+        return
+    if observer.min_val == float("inf"):
+        observer.histogram.copy_(state["histogram"])
+        observer.min_val.resize_(min_val.shape).copy_(min_val)
+        observer.max_val.resize_(max_val.shape).copy_(max_val)
+        return
+    new_min = torch.min(observer.min_val, min_val)
+    new_max = torch.max(observer.max_val, max_val)
+    edges = torch.linspace(
+        new_min.item(), new_max.item(), observer.bins + 1, dtype=torch.float64
+    )
+    histogram = _rebin_histogram(
+        observer.histogram, observer.min_val, observer.max_val, edges
+    ) + _rebin_histogram(state["histogram"], min_val, max_val, edges)
+    observer.histogram.copy_(histogram)
+    observer.min_val.copy_(new_min)
+    observer.max_val.copy_(new_max)
+
+
+def _merge_min_max(observer, state):
+    min_val, max_val = state["min_val"], state["max_val"]
+    if min_val.numel() == 0:
+        return
+    if observer.min_val.numel() == 0 or observer.min_val.shape != min_val.shape:
+        # Not observed yet, per-channel min/max are empty tensors
+        observer.min_val.resize_(min_val.shape).copy_(min_val)
+        observer.max_val.resize_(max_val.shape).copy_(max_val)
+        return
+    torch.minimum(observer.min_val, min_val, out=observer.min_val)
+    torch.maximum(observer.max_val, max_val, out=observer.max_val)
+
+
+def merge_observer_states(model, states):
+    r"""
+    Merge the observer states collected by :func:`calibrate` workers, as
+    returned by ``_observer_states``, into the observers of ``model``: the
+    min/max are reduced and the histograms are re-binned to the merged range
+    and summed.
+    """
+
+    observers = dict(_named_observers(model))
+    for state in states:
+        for name, observer_state in state.items():
+            observer = observers[name]
+            if isinstance(observer, HistogramObserver):
+                _merge_histogram(observer, observer_state)
+            else:
+                _merge_min_max(observer, observer_state)
+
+
+def _observer_states(model):
+    states = {}
+    for name, observer in _named_observers(model):
+        state = _observer_state(observer)
+        if state is not None:
+            states[name] = {k: v.detach().clone() for k, v in state.items()}
+    return states
+
+
+class _BatchedHistograms(object):
+    r"""
+    Gather the activations of ``num_batches`` calls of every histogram
+    observer of the model and observe them at once, so that the histograms
+    are re-binned once per ``num_batches`` batches instead of every batch.
+    """
+
+    def __init__(self, model, num_batches):
+        self.observers = [
+            o
+            for _, o in _named_observers(model)
+            if isinstance(o, HistogramObserver) and num_batches > 1
+        ]
+        self.num_batches = num_batches
+        self.buffers = {}
+
+    def _forward(self, observer, x_orig):
+        if x_orig.numel() == 0:
+            return x_orig
+        buffer = self.buffers.setdefault(id(observer), [])
+        buffer.append(x_orig.detach().reshape(-1).to(observer.min_val.dtype))
+        if len(buffer) >= self.num_batches:
+            self._flush(observer)
+        return x_orig
+
+    def _flush(self, observer):
+        buffer = self.buffers.pop(id(observer), [])
+        if len(buffer) > 0:
+            type(observer).forward(observer, torch.cat(buffer))
+
+    def __enter__(self):
+        for observer in self.observers:
+            observer.forward = types.MethodType(
+                lambda obs, x, self=self: self._forward(obs, x), observer
+            )
+        return self
+
+    def __exit__(self, *args):
+        for observer in self.observers:
+            del observer.forward
+            self._flush(observer)
+
+
+def _calibrate_worker(model, run_fn, batches, results, rank, histogram_batches):
+    try:
+        # The worker is forked after the OpenMP runtime of the parent started,
+        # which is not fork-safe with libgomp: run the ops without OpenMP
+        # parallel regions, before any op of the worker.
+        torch.set_num_threads(1)
+        # Only send the statistics of the batches of this worker
+        for _, observer in _named_observers(model):
+            _reset_observer(observer)
+        with torch.no_grad(), _BatchedHistograms(model, histogram_batches):
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    break
+                run_fn(model, batch)
+        # Serialize the states, shared tensors would be released when the
+        # worker exits before they are received.
+        buffer = io.BytesIO()
+        torch.save(_observer_states(model), buffer)
+        results.put((rank, buffer.getvalue(), None))
+    except BaseException:
+        results.put((rank, None, traceback.format_exc()))
+
+
+def calibrate(
+    model,
+    dataloader,
+    num_workers=1,
+    max_batches=None,
+    histogram_batches=1,
+    run_fn=None,
+):
+    r"""
+    Run the calibration of a model prepared by :func:`prepare` for static
+    quantization on the batches of ``dataloader``, which are read one at a
+    time so that the dataset doesn't need to fit in memory.
+
+    Args:
+        model (torch.nn.Module): The model returned by :func:`prepare`.
+        dataloader (Iterable): The calibration batches. A batch is passed to the
+            model as ``model(**batch)`` for a dict, ``model(*batch)`` for a tuple
+            or a list, and ``model(batch)`` otherwise.
+        num_workers (int): Number of processes running the calibration. The
+            current process keeps running the batches with the CPU threads left
+            to it, and the ``num_workers - 1`` forked workers run one thread
+            each, since OpenMP can't be used again after a fork. The batches
+            go to the first free worker, or to the current process when all of
+            them are busy, and the observer states of the workers are merged
+            into the model at the end. It needs the ``fork`` start method. The
+            default value is ``1``, which calibrates in the current process.
+        max_batches (int): Stop after this number of batches. All the batches
+            are used by default.
+        histogram_batches (int): Number of batches whose activations are
+            gathered before updating the histogram observers, which reduces the
+            re-binning of the histograms at the cost of keeping the activations
+            of these batches. The default value is ``1``.
+        run_fn (Callable): ``run_fn(model, batch)`` runs the model on a batch, for
+            the batches not matching the rules above, e.g.
+            ``lambda model, batch: model(batch[0])`` to drop the labels.
+
+    Returns:
+        torch.nn.Module: The calibrated model.
+    """
+
+    run_fn = run_fn if run_fn is not None else _run_batch
+    batches = iter(dataloader)
+    if max_batches is not None:
+        batches = itertools.islice(batches, max_batches)
+    if num_workers > 1 and "fork" not in mp.get_all_start_methods():
+        logger.warning(
+            "Multi-process calibration needs the fork start method, calibrate in the current process.",
+            _type=WarningType.NotSupported,
+        )
+        num_workers = 1
+    if num_workers <= 1:
+        with torch.no_grad(), _BatchedHistograms(model, histogram_batches):
+            for batch in batches:
+                run_fn(model, batch)
+        return model
+
+    # The current process is the worker 0, the others are forked with a copy
+    # of the model and take their batches from a bounded queue. The prepared
+    # model can't be pickled, so the workers can't be spawned.
+    ctx = mp.get_context("fork")
+    num_threads = torch.get_num_threads()
+    batch_queue = ctx.Queue(maxsize=2 * (num_workers - 1))
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(
+            target=_calibrate_worker,
+            args=(model, run_fn, batch_queue, results, i + 1, histogram_batches),
+            daemon=True,
+        )
+        for i in range(num_workers - 1)
+    ]
+    for worker in workers:
+        worker.start()
+
+    def check_workers():
+        for worker in workers:
+            if not worker.is_alive() and worker.exitcode != 0:
+                raise RuntimeError(
+                    "A calibration worker exited with code {}".format(worker.exitcode)
+                )
+
+    def put(item):
+        while True:
+            try:
+                batch_queue.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                check_workers()
+
+    states = []
+    try:
+        # the workers run one thread each
+        torch.set_num_threads(max(1, num_threads - len(workers)))
+        with torch.no_grad(), _BatchedHistograms(model, histogram_batches):
+            for batch in batches:
+                try:
+                    batch_queue.put_nowait(batch)
+                except queue.Full:
+                    # all the workers are busy
+                    check_workers()
+                    run_fn(model, batch)
+        for _ in workers:
+            put(None)
+        while len(states) < len(workers):
+            try:
+                rank, state, error = results.get(timeout=1.0)
+            except queue.Empty:
+                check_workers()
+                continue
+            if error is not None:
+                raise RuntimeError(
+                    "Calibration failed in worker {}:\n{}".format(rank, error)
+                )
+            states.append(torch.load(io.BytesIO(state)))
+    finally:
+        torch.set_num_threads(num_threads)
+        for worker in workers:
+            worker.join(timeout=1.0)
+            if worker.is_alive():
+                worker.terminate()
+    merge_observer_states(model, states)
+    return model
@@ -83,6 +83,9 @@ class AutoQuantizationState(torch.nn.Module):
         ] = {}
         self.idx_to_smooth_quant_scaling_factor: Dict[str, torch.Tensor] = {}
         self.idx_to_weight_updated_for_smooth_quant: set[str] = set()
+        # (observer id, weight id, weight version) of the weights observed in
+        # calibration, to not observe the same weights again on every batch
+        self.weight_tensor_id_to_observed_version: Dict[str, Tuple[int, int, int]] = {}
 
     def get_extra_state(self):
         return {"tensor_id_to_scale_zp": self.tensor_id_to_scale_zp}
@@ -294,24 +297,31 @@ class AutoQuantizationState(torch.nn.Module):
             if tensor_info is None:
                 continue
             tensor_id = tensor_info.id
-            if (
-                str(seen_q_op_info.idx) + "_" + str(tensor_id)
-                in self.weight_tensor_id_to_observer
-            ):
-                observer = self.weight_tensor_id_to_observer[
-                    str(seen_q_op_info.idx) + "_" + str(tensor_id)
-                ]
+            observer_key = str(seen_q_op_info.idx) + "_" + str(tensor_id)
+            if observer_key in self.weight_tensor_id_to_observer:
+                observer = self.weight_tensor_id_to_observer[observer_key]
                 set_tensor_info_dtype(tensor_info, observer)
-                # if has bias, the dim is 1, we don't need run observer for it.
                 if isinstance(op, torch.nn.LSTM):
-                    if op._flat_weights[i].dim() > 1:
-                        observer(op._flat_weights[i])
-                    else:
-                        pass
+                    weight = op._flat_weights[i]
                 elif isinstance(op, MergedEmbeddingBagWithCat):
-                    observer(op.weights[i])
+                    weight = op.weights[i]
                 else:
-                    observer(op.weight)
+                    weight = op.weight
+                # The weights don't change during calibration, observing them
+                # again on the next batches gives the same statistics.
+                observed_version = (id(observer), id(weight), weight._version)
+                if (
+                    self.weight_tensor_id_to_observed_version.get(observer_key)
+                    == observed_version
+                ):
+                    continue
+                # if has bias, the dim is 1, we don't need run observer for it.
+                if isinstance(op, torch.nn.LSTM) and weight.dim() <= 1:
+                    continue
+                observer(weight)
+                self.weight_tensor_id_to_observed_version[observer_key] = (
+                    observed_version
+                )
 
         return args, kwargs
 
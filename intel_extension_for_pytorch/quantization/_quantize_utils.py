@@ -441,9 +441,12 @@ def auto_prepare(
                 torch.nn.Sequential.forward = orig_nn_sequential_forward  # type: ignore[assignment]
                 first_call = False
 
-        def save_qconf_summary(self, qconf_summary):
+        def save_qconf_summary(self, qconf_summary, binary=False):
             r"""
             This function is about save model's quant_state_map to a json file.
+            With ``binary=True``, it is saved to a compact binary file whose scales
+            and zero points are loaded without parsing, which is faster to load
+            for large models. :meth:`load_qconf_summary` detects the format.
             """
             assert (
                 qconf_summary is not None
@@ -467,7 +470,7 @@ def auto_prepare(
                     pass
             # Setting model qconf_summary attr which can be easily to check the whether the scale/zp has been computed.
             self._qconf_summary = qconf_summary
-            save_quant_state(quant_state_map, qconf_summary)
+            save_quant_state(quant_state_map, qconf_summary, binary)
 
         def load_qconf_summary(self, qconf_summary):
             r"""
@@ -600,3 +600,46 @@ def get_default_recipe(nodes):
                     ].inf_dtype
 
     set_node_output_quantized(nodes)
+
+
+def get_quantized_ops(quant_state_map):
+    r"""
+    Return the (quant state key, op idx) of the quantizable ops whose inputs or
+    weights are quantized by the recipe.
+    """
+    quantized_dtype = [torch.qint8, torch.quint8]
+    ops = []
+    for k, v in quant_state_map.items():
+        for idx, op_info in v.idx_to_seen_q_op_infos.items():
+            if op_info.qconfig is None:
+                continue
+            if any(
+                dtype in quantized_dtype
+                for dtype in op_info.input_tensor_force_inf_dtype
+            ) or any(
+                tensor_info is not None and tensor_info.inf_dtype in quantized_dtype
+                for tensor_info in op_info.weight_tensor_infos
+            ):
+                ops.append((k, idx))
+    return ops
+
+
+def fallback_ops(quant_state_map, ops):
+    r"""
+    Fall back the given quantizable ops, as (quant state key, op idx) pairs, to
+    their original dtype after the recipe is set: their inputs and weights are not
+    quantized any more, neither are their outputs if the recipe quantized them.
+    """
+    for k, idx in ops:
+        op_info = quant_state_map[k].idx_to_seen_q_op_infos[idx]
+        for i, tensor_info in enumerate(op_info.input_tensor_infos):
+            if tensor_info is not None:
+                tensor_info.inf_dtype = tensor_info.orig_dtype
+                op_info.input_tensor_force_inf_dtype[i] = tensor_info.orig_dtype
+        for tensor_info in op_info.weight_tensor_infos:
+            if tensor_info is not None:
+                tensor_info.inf_dtype = tensor_info.orig_dtype
+        for i, tensor_info in enumerate(op_info.output_tensor_infos):
+            if tensor_info is not None and op_info.insert_fake_quant_after_outputs[i]:
+                tensor_info.inf_dtype = tensor_info.orig_dtype
+                op_info.insert_fake_quant_after_outputs[i] = False
@@ -4,6 +4,8 @@ from collections import OrderedDict
 from typing import Callable, Optional
 import inspect
 import numbers
+import os
+import struct
 
 import torch
 import torch.nn as nn
@@ -666,8 +668,132 @@ def _create_observer(setting):
         raise NameError("torch.quantization.observer %s not found" % setting["name"])
 
 
-def save_quant_state(quant_state_map, configure_file):
-    # save qparam's as json file for tunning
+# The binary qconf summary is made of a header and the raw data of the
+# tensors (scales, zero points, scaling factors):
+#   magic | version (uint32) | header size (uint64) | header | data
+# The header is the JSON summary in which every tensor is replaced by
+# {"__tensor__": index} and indexes the dtype, shape and data offset of the
+# tensors, which are loaded from the data without parsing.
+_QCONF_MAGIC = b"IPEXQCNF"
+_QCONF_VERSION = 1
+_QCONF_ALIGNMENT = 64
+_QCONF_PREFIX = struct.Struct("<8sIQ")
+
+
+def _tensors_to_lists(obj):
+    if isinstance(obj, torch.Tensor):
+        return obj.tolist()
+    if isinstance(obj, dict):
+        return OrderedDict((k, _tensors_to_lists(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return [_tensors_to_lists(v) for v in obj]
+    return obj
+
+
+def _to_tensor(val, dtype):
+    if isinstance(val, torch.Tensor):
+        return val.to(dtype)
+    return torch.tensor(val, dtype=dtype)
+
+
+def _align(offset):
+    return (offset + _QCONF_ALIGNMENT - 1) // _QCONF_ALIGNMENT * _QCONF_ALIGNMENT
+
+
+def _save_binary_qconf_summary(quant_state_dict, configure_file):
+    tensors = []
+    tensor_infos = []
+    offset = 0
+
+    def extract_tensors(obj):
+        nonlocal offset
+        if isinstance(obj, torch.Tensor):
+            t = obj.detach().cpu().contiguous()
+            tensor_infos.append(
+                {"dtype": str(t.dtype), "shape": list(t.shape), "offset": offset}
+            )
+            tensors.append(t)
+            offset = _align(offset + t.numel() * t.element_size())
+            return {"__tensor__": len(tensors) - 1}
+        if isinstance(obj, dict):
+            return OrderedDict((k, extract_tensors(v)) for k, v in obj.items())
+        if isinstance(obj, (list, tuple)):
+            return [extract_tensors(v) for v in obj]
+        return obj
+
+    summary = extract_tensors(quant_state_dict)
+    header = json.dumps(
+        {"tensors": tensor_infos, "qconf_summary": summary}, separators=(",", ":")
+    ).encode("utf-8")
+    data_start = _align(_QCONF_PREFIX.size + len(header))
+    with open(configure_file, "wb") as f:
+        f.write(_QCONF_PREFIX.pack(_QCONF_MAGIC, _QCONF_VERSION, len(header)))
+        f.write(header)
+        for t, info in zip(tensors, tensor_infos):
+            f.seek(data_start + info["offset"])
+            f.write(t.numpy().tobytes() if t.numel() > 0 else b"")
+        f.truncate(data_start + offset)
+
+
+def _load_binary_qconf_summary(qconf_summary):
+    with open(qconf_summary, "rb") as f:
+        data = bytearray(os.fstat(f.fileno()).st_size)
+        f.readinto(data)
+    magic, version, header_size = _QCONF_PREFIX.unpack_from(data)
+    assert (
+        version <= _QCONF_VERSION
+    ), "The qconf summary version {} is newer than the supported version {}".format(
+        version, _QCONF_VERSION
+    )
+    header_end = _QCONF_PREFIX.size + header_size
+    header = json.loads(bytes(data[_QCONF_PREFIX.size : header_end]))
+    data_start = _align(header_end)
+    tensors = []
+    for info in header["tensors"]:
+        dtype = getattr(torch, info["dtype"].split(".")[-1])
+        numel = 1
+        for size in info["shape"]:
+            numel *= size
+        if numel == 0:
+            tensors.append(torch.empty(info["shape"], dtype=dtype))
+            continue
+        # The tensors share the memory of the file data
+        tensors.append(
+            torch.frombuffer(
+                data, dtype=dtype, count=numel, offset=data_start + info["offset"]
+            ).reshape(info["shape"])
+        )
+
+    def restore_tensors(obj):
+        if isinstance(obj, dict):
+            if len(obj) == 1 and "__tensor__" in obj:
+                return tensors[obj["__tensor__"]]
+            return OrderedDict((k, restore_tensors(v)) for k, v in obj.items())
+        if isinstance(obj, list):
+            return [restore_tensors(v) for v in obj]
+        return obj
+
+    return restore_tensors(header["qconf_summary"])
+
+
+def _is_binary_qconf_summary(qconf_summary):
+    with open(qconf_summary, "rb") as f:
+        return f.read(len(_QCONF_MAGIC)) == _QCONF_MAGIC
+
+
+def _load_qconf_summary(qconf_summary):
+    r"""
+    Load a qconf summary saved as json or binary file. The scales and zero
+    points are lists for a json file and tensors for a binary file.
+    """
+    if _is_binary_qconf_summary(qconf_summary):
+        return _load_binary_qconf_summary(qconf_summary)
+    with open(qconf_summary, "r") as f:
+        return json.load(f)
+
+
+def save_quant_state(quant_state_map, configure_file, binary=False):
+    # save qparam's as json or binary file for tunning
     quant_state_dict = OrderedDict()
     for k, v in quant_state_map.items():
         layer_infos = OrderedDict()
@@ -698,9 +824,9 @@ def save_quant_state(quant_state_map, configure_file):
                             ):
                                 cur_tensor_infos["scale"] = v.tensor_id_to_scale_zp[
                                     tensor_info.id
-                                ][0].tolist()
+                                ][0]
                                 cur_tensor_infos["zero_point"] = (
-                                    v.tensor_id_to_scale_zp[tensor_info.id][1].tolist()
+                                    v.tensor_id_to_scale_zp[tensor_info.id][1]
                                 )
                             else:
                                 scales_dict = v.tensor_id_to_scale_zp[tensor_info.id][0]
@@ -711,9 +837,9 @@ def save_quant_state(quant_state_map, configure_file):
                                 scales_to_save = {}
                                 zp_to_save = {}
                                 for key, val in scales_dict.items():
-                                    scales_to_save.update({key: val.tolist()})
+                                    scales_to_save.update({key: val})
                                 for key, val in zp_dict.items():
-                                    zp_to_save.update({key: val.tolist()})
+                                    zp_to_save.update({key: val})
                                 cur_tensor_infos["scale"] = scales_to_save
                                 cur_tensor_infos["zero_point"] = zp_to_save
                         if (
@@ -732,7 +858,7 @@ def save_quant_state(quant_state_map, configure_file):
                             assert isinstance(scaling_factor_dict, dict)
                             scaling_factors_to_save = {}
                             for key, val in scaling_factor_dict.items():
-                                scaling_factors_to_save.update({key: val.tolist()})
+                                scaling_factors_to_save.update({key: val})
                             cur_tensor_infos["smooth_quant_scaling_factor"] = (
                                 scaling_factors_to_save
                             )
@@ -750,9 +876,9 @@ def save_quant_state(quant_state_map, configure_file):
                         if weight_idx in v.weight_tensor_id_to_scale_zp:
                             cur_tensor_infos["scale"] = v.weight_tensor_id_to_scale_zp[
                                 weight_idx
-                            ][0].tolist()
+                            ][0]
                             cur_tensor_infos["zero_point"] = (
-                                v.weight_tensor_id_to_scale_zp[weight_idx][1].tolist()
+                                v.weight_tensor_id_to_scale_zp[weight_idx][1]
                             )
                         if (
                             weight_idx
@@ -767,7 +893,7 @@ def save_quant_state(quant_state_map, configure_file):
                                 cur_tensor_infos["smooth_quant_scaling_factor"] = (
                                     v.weight_tensor_id_to_smooth_quant_scaling_factor[
                                         weight_idx
-                                    ].tolist()
+                                    ]
                                 )
                     weight_tensor_infos.append(cur_tensor_infos)
                 info["weight_tensor_infos"] = weight_tensor_infos
@@ -785,9 +911,9 @@ def save_quant_state(quant_state_map, configure_file):
                             ):
                                 cur_tensor_infos["scale"] = v.tensor_id_to_scale_zp[
                                     tensor_info.id
-                                ][0].tolist()
+                                ][0]
                                 cur_tensor_infos["zero_point"] = (
-                                    v.tensor_id_to_scale_zp[tensor_info.id][1].tolist()
+                                    v.tensor_id_to_scale_zp[tensor_info.id][1]
                                 )
                             else:
                                 scales_dict = v.tensor_id_to_scale_zp[tensor_info.id][0]
@@ -798,9 +924,9 @@ def save_quant_state(quant_state_map, configure_file):
                                 scales_to_save = {}
                                 zp_to_save = {}
                                 for key, val in scales_dict.items():
-                                    scales_to_save.update({key: val.tolist()})
+                                    scales_to_save.update({key: val})
                                 for key, val in zp_dict.items():
-                                    zp_to_save.update({key: val.tolist()})
+                                    zp_to_save.update({key: val})
                                 cur_tensor_infos["scale"] = scales_to_save
                                 cur_tensor_infos["zero_point"] = zp_to_save
                         if (
@@ -819,7 +945,7 @@ def save_quant_state(quant_state_map, configure_file):
                                 ), f"Expect scaling factors is a dict but found {type(scaling_factors)}"
                                 scaling_factors_to_save = {}
                                 for key, val in scaling_factors.items():
-                                    scaling_factors_to_save.update({key: val.tolist()})
+                                    scaling_factors_to_save.update({key: val})
                             cur_tensor_infos["smooth_quant_scaling_factor"] = (
                                 scaling_factors_to_save
                             )
@@ -897,25 +1023,26 @@ def save_quant_state(quant_state_map, configure_file):
                 if tensor_info.id in v.tensor_id_to_scale_zp:
                     cur_tensor_infos["scale"] = v.tensor_id_to_scale_zp[tensor_info.id][
                         0
-                    ].tolist()
+                    ]
                     cur_tensor_infos["zero_point"] = v.tensor_id_to_scale_zp[
                         tensor_info.id
-                    ][1].tolist()
+                    ][1]
             layer_output_infos.append(cur_tensor_infos)
         layer_infos["layer_output_infos"] = layer_output_infos
         quant_state_dict[k] = layer_infos
-    # save qparms as json file
     if configure_file is not None:
-        with open(configure_file, "w") as fp:
-            json.dump(quant_state_dict, fp, indent=4)
+        if binary:
+            _save_binary_qconf_summary(quant_state_dict, configure_file)
+        else:
+            with open(configure_file, "w") as fp:
+                json.dump(_tensors_to_lists(quant_state_dict), fp, indent=4)
 
 
 def load_qconf_summary_to_model(model, qconf_summary):
     """
     This function is about load the user given configure to origin model.
     """
-    with open(qconf_summary, "r") as f:
-        quant_state_dict = json.load(f)
+    quant_state_dict = _load_qconf_summary(qconf_summary)
     quant_state_map = model._fqn_to_auto_quant_state_map
     for k, v in quant_state_map.items():
         layer_info = quant_state_dict[k]
@@ -941,9 +1068,9 @@ def load_qconf_summary_to_model(model, qconf_summary):
                         dtype_dict[tensor_info["force_dtype"]]
                     )
                     if "scale" in tensor_info:
-                        if isinstance(tensor_info["scale"], list):
-                            scale = torch.FloatTensor(tensor_info["scale"])
-                            zp = torch.LongTensor(tensor_info["zero_point"])
+                        if isinstance(tensor_info["scale"], (list, torch.Tensor)):
+                            scale = _to_tensor(tensor_info["scale"], torch.float)
+                            zp = _to_tensor(tensor_info["zero_point"], torch.long)
                         else:
                             scale, zp = {}, {}
                             scale_to_load = tensor_info["scale"]
@@ -955,10 +1082,10 @@ def load_qconf_summary_to_model(model, qconf_summary):
                                 f"found types {type(scale_to_load)} and {type(zp_to_load)}"
                             )
                             for key, val in scale_to_load.items():
-                                s = torch.FloatTensor(val)
+                                s = _to_tensor(val, torch.float)
                                 scale.update({key: s})
                             for key, val in zp_to_load.items():
-                                z = torch.LongTensor(val)
+                                z = _to_tensor(val, torch.long)
                                 zp.update({key: z})
                         v.tensor_id_to_scale_zp[tensor_info["id"]] = (scale, zp)
                     if "smooth_quant_scaling_factor" in tensor_info:
@@ -968,15 +1095,19 @@ def load_qconf_summary_to_model(model, qconf_summary):
                         ]
                         if isinstance(scaling_factors_to_load, dict):
                             for key, val in scaling_factors_to_load.items():
-                                scaling_factor = torch.FloatTensor(val)
+                                scaling_factor = _to_tensor(val, torch.float)
                                 scaling_factors.update({key: scaling_factor})
                         else:
                             # for backward compatibility
-                            assert isinstance(scaling_factors_to_load, list), (
+                            assert isinstance(
+                                scaling_factors_to_load, (list, torch.Tensor)
+                            ), (
                                 f"Expect scaling factors to load to be a dict or list "
                                 f"but found type {type(scaling_factors_to_load)}"
                             )
-                            scaling_factor = torch.FloatTensor(scaling_factors_to_load)
+                            scaling_factor = _to_tensor(
+                                scaling_factors_to_load, torch.float
+                            )
                             dummy_weight_key = "0_0"
                             scaling_factors.update({dummy_weight_key: scaling_factor})
                         v.tensor_id_to_smooth_quant_scaling_factor[
@@ -997,14 +1128,14 @@ def load_qconf_summary_to_model(model, qconf_summary):
                         )
                     )
                     if "scale" in tensor_info:
-                        scale = torch.FloatTensor(tensor_info["scale"])
-                        zp = torch.LongTensor(tensor_info["zero_point"])
+                        scale = _to_tensor(tensor_info["scale"], torch.float)
+                        zp = _to_tensor(tensor_info["zero_point"], torch.long)
                         v.weight_tensor_id_to_scale_zp[
                             str(i) + "_" + str(weight_idx)
                         ] = (scale, zp)
                     if "smooth_quant_scaling_factor" in tensor_info:
-                        scaling_factor = torch.FloatTensor(
-                            tensor_info["smooth_quant_scaling_factor"]
+                        scaling_factor = _to_tensor(
+                            tensor_info["smooth_quant_scaling_factor"], torch.float
                         )
                         v.weight_tensor_id_to_smooth_quant_scaling_factor[
                             str(i) + "_" + str(weight_idx)
@@ -1025,9 +1156,9 @@ def load_qconf_summary_to_model(model, qconf_summary):
                     )
                     insert_fake_quant_after_outputs.append(False)
                     if "scale" in tensor_info:
-                        if isinstance(tensor_info["scale"], list):
-                            scale = torch.FloatTensor(tensor_info["scale"])
-                            zp = torch.LongTensor(tensor_info["zero_point"])
+                        if isinstance(tensor_info["scale"], (list, torch.Tensor)):
+                            scale = _to_tensor(tensor_info["scale"], torch.float)
+                            zp = _to_tensor(tensor_info["zero_point"], torch.long)
                         else:
                             scale, zp = {}, {}
                             scale_to_load = tensor_info["scale"]
@@ -1039,10 +1170,10 @@ def load_qconf_summary_to_model(model, qconf_summary):
                                 f"found types {type(scale_to_load)} and {type(zp_to_load)}"
                             )
                             for key, val in scale_to_load.items():
-                                s = torch.FloatTensor(val)
+                                s = _to_tensor(val, torch.float)
                                 scale.update({key: s})
                             for key, val in zp_to_load.items():
-                                z = torch.LongTensor(val)
+                                z = _to_tensor(val, torch.long)
                                 zp.update({key: z})
                         v.tensor_id_to_scale_zp[tensor_info["id"]] = (scale, zp)
                 else:
@@ -1122,8 +1253,8 @@ def load_qconf_summary_to_model(model, qconf_summary):
                     )
                 )
                 if "scale" in tensor_info:
-                    scale = torch.FloatTensor(tensor_info["scale"])
-                    zp = torch.LongTensor(tensor_info["zero_point"])
+                    scale = _to_tensor(tensor_info["scale"], torch.float)
+                    zp = _to_tensor(tensor_info["zero_point"], torch.long)
                     v.tensor_id_to_scale_zp[tensor_info["id"]] = (scale, zp)
             else:
                 layer_output_info.append(None)
@@ -0,0 +1,246 @@
+import json
+import os
+
+import torch
+
+from ..utils._logger import logger, WarningType
+from ._calibration import _run_batch
+
+# Layers kept in floating point, as in the GPTQ flow
+_SKIPPED_LAYERS = ["lm_head", "output_layer", "embed_out"]
+
+# Checkpoints are in the GPTQ format, 8 int4 values per int32
+_COMP_RATIO = 8
+
+
+def _collect_input_stats(model, layers, dataloader, nsamples, run_fn):
+    # Mean of the squared activations of every input channel of the layers,
+    # which is the diagonal of the Hessian of the output error.
+    sums = {name: None for name in layers}
+    counts = {name: 0 for name in layers}
+
+    def hook(name):
+        def fn(mod, inputs):
+            x = inputs[0].detach()
+            x = x.reshape(-1, x.shape[-1]).float()
+            square_sum = x.pow(2).sum(0)
+            sums[name] = square_sum if sums[name] is None else sums[name] + square_sum
+            counts[name] += x.shape[0]
+
+        return fn
+
+    handles = [
+        mod.register_forward_pre_hook(hook(name)) for name, mod in layers.items()
+    ]
+    try:
+        with torch.no_grad():
+            for i, batch in enumerate(dataloader):
+                if i >= nsamples:
+                    break
+                run_fn(model, batch)
+    finally:
+        for handle in handles:
+            handle.remove()
+    return {
+        name: sums[name] / counts[name] for name in layers if sums[name] is not None
+    }
+
+
+def _search_group_qparams(weight, group_size, sym, clip_ratios, importance=None):
+    r"""
+    Search the scales and zero points of every group of ``weight`` among the
+    ranges of the groups shrunk by ``clip_ratios``, keeping for each group the
+    ratio with the least quantization error weighted by the ``importance`` of
+    the input channels. All the groups are searched at once for each ratio.
+    """
+
+    qmax = 2**4 - 1
+    N, K = weight.shape
+    w = weight.float().reshape(N, K // group_size, group_size)
+    if importance is None:
+        importance = torch.ones(K)
+    importance = importance.float().reshape(1, K // group_size, group_size)
+    w_max = w.amax(-1, keepdim=True)
+    w_min = w.amin(-1, keepdim=True)
+    if sym:
+        w_max = torch.max(w_max.abs(), w_min.abs())
+        w_min = -w_max
+    else:
+        w_max = w_max.clamp_min(0)
+        w_min = w_min.clamp_max(0)
+    best_error = None
+    for ratio in clip_ratios:
+        scale = ((w_max - w_min) * ratio / qmax).clamp_min(1e-9)
+        if sym:
+            zp = torch.full_like(scale, (qmax + 1) // 2)
+        else:
+            zp = torch.round(-w_min * ratio / scale).clamp(0, qmax)
+        q = torch.clamp(torch.round(w / scale) + zp, 0, qmax)
+        error = ((q - zp) * scale - w).pow(2).mul(importance).sum(-1, keepdim=True)
+        if best_error is None:
+            best_error, best_scale, best_zp = error, scale, zp
+            continue
+        better = error < best_error
+        best_error = torch.where(better, error, best_error)
+        best_scale = torch.where(better, scale, best_scale)
+        best_zp = torch.where(better, zp, best_zp)
+    q = torch.clamp(torch.round(w / best_scale) + best_zp, 0, qmax)
+    return (
+        q.reshape(N, K).to(torch.int32),
+        best_scale.reshape(N, -1),
+        best_zp.reshape(N, -1).to(torch.int32),
+    )
+
+
+def _pack_int4(t):
+    # Pack 8 int4 values along the last dimension into int32, the i-th value
+    # of every 8 in bits [4 * i, 4 * i + 4).
+    t = (t & 0xF).reshape(*t.shape[:-1], -1, _COMP_RATIO)
+    packed = torch.zeros(t.shape[:-1], dtype=torch.int32)
+    for i in range(_COMP_RATIO):
+        packed |= t[..., i] << (4 * i)
+    return packed
+
+
+def _to_gptq_format(q, scale, zp, scale_dtype):
+    # qweight (K // 8, N), scales (n_groups, N), qzeros (n_groups, N // 8), and
+    # the zero points are stored minus one.
+    qweight = _pack_int4(q).t().contiguous()
+    qzeros = _pack_int4((zp - 1).t().contiguous())
+    return qweight, scale.t().contiguous().to(scale_dtype), qzeros
+
+
+def woq_calibrate(
+    model,
+    dataloader=None,
+    method="awq",
+    group_size=128,
+    sym=False,
+    nsamples=128,
+    clip_ratios=None,
+    scale_dtype=torch.float16,
+    save_dir=None,
+    run_fn=None,
+):
+    r"""
+    Quantize the weights of the linear layers of a model to INT4 and return a
+    checkpoint for ``ipex.llm.optimize(low_precision_checkpoint=...)``, as
+    :func:`intel_extension_for_pytorch.llm.load_low_precision_checkpoint`
+    does for checkpoints of external tools.
+
+    With ``method="awq"``, the mean squared activation of every input
+    channel is collected on the calibration batches, and the scale and zero
+    point of every group are searched among clipped ranges of the group so as
+    to minimize the quantization error of the weights weighted by these
+    activations, i.e. the output error of the layer. With ``method="rtn"``,
+    the weights are quantized with the full range of the groups, without
+    calibration.
+
+    Args:
+        model (torch.nn.Module): The floating point model. The ``lm_head`` is
+            kept in floating point.
+        dataloader (Iterable): The calibration batches, passed to the model as
+            ``model(**batch)`` for a dict, ``model(*batch)`` for a tuple or a
+            list, and ``model(batch)`` otherwise. Not needed by ``"rtn"``.
+        method (str): ``"awq"`` or ``"rtn"``. The default value is ``"awq"``.
+        group_size (int): Number of input channels sharing a scale and a zero
+            point. ``-1`` means one group per output channel. The default value
+            is ``128``.
+        sym (bool): Whether to quantize symmetrically, with the zero points in
+            the middle of the INT4 range. The default value is ``False``.
+        nsamples (int): Maximum number of calibration batches. The default value
+            is ``128``.
+        clip_ratios (list): Ratios of the range of a group searched by
+            ``"awq"``. The default value is 20 ratios from ``1.0`` to ``0.525``.
+        scale_dtype (torch.dtype): Data type of the scales. The default value is
+            ``torch.float16``.
+        save_dir (str): If given, the checkpoint is saved in this directory with
+            a ``config.json``, so that it can be loaded with
+            ``load_low_precision_checkpoint``.
+        run_fn (Callable): ``run_fn(model, batch)`` runs the model on a batch,
+            for the batches not matching the rules above.
+
+    Returns:
+        Tuple[Dict[str, torch.Tensor], Dict[str, Any]]: The checkpoint in the
+        GPTQ format and its quantization config.
+    """
+
+    assert method in [
+        "awq",
+        "rtn",
+    ], f"WOQ calibration method {method} is not supported."
+    if clip_ratios is None:
+        clip_ratios = [1.0 - 0.025 * i for i in range(20)]
+    if method == "rtn":
+        clip_ratios = [1.0]
+
+    layers = {}
+    for name, mod in model.named_modules():
+        if not isinstance(mod, torch.nn.Linear) or any(
+            n in name for n in _SKIPPED_LAYERS
+        ):
+            continue
+        N, K = mod.weight.shape
+        layer_group_size = K if group_size == -1 else group_size
+        if K % layer_group_size != 0 or K % _COMP_RATIO != 0 or N % _COMP_RATIO != 0:
+            logger.warning(
+                f"Weight shape {tuple(mod.weight.shape)} of {name} is not divisible by "
+                + f"the group size {group_size} or the packing ratio {_COMP_RATIO}, "
+                + "keep it in floating point.",
+                _type=WarningType.NotSupported,
+            )
+            continue
+        layers[name] = mod
+
+    importance = {}
+    if method == "awq":
+        assert dataloader is not None, "AWQ calibration needs a dataloader."
+        importance = _collect_input_stats(
+            model,
+            layers,
+            dataloader,
+            nsamples,
+            run_fn if run_fn is not None else _run_batch,
+        )
+
+    state_dict = {}
+    with torch.no_grad():
+        for name, mod in layers.items():
+            K = mod.weight.shape[1]
+            q, scale, zp = _search_group_qparams(
+                mod.weight,
+                K if group_size == -1 else group_size,
+                sym,
+                clip_ratios,
+                importance.get(name, None),
+            )
+            qweight, scales, qzeros = _to_gptq_format(q, scale, zp, scale_dtype)
+            state_dict[name + ".qweight"] = qweight
+            state_dict[name + ".scales"] = scales
+            state_dict[name + ".qzeros"] = qzeros
+            if mod.bias is not None:
+                state_dict[name + ".bias"] = mod.bias.detach().to(scale_dtype)
+    quant_config = {
+        "quant_method": "gptq",
+        "group_size": group_size,
+        "desc_act": False,
+        "weight_block_size": None,
+        "bits": 4,
+    }
+
+    if save_dir is not None:
+        os.makedirs(save_dir, exist_ok=True)
+        torch.save(state_dict, os.path.join(save_dir, f"woq_{method}_checkpoint.pt"))
+        config = {}
+        if hasattr(model, "config") and hasattr(model.config, "to_dict"):
+            config = model.config.to_dict()
+        config["quantization_config"] = {
+            "quant_method": "gptq",
+            "bits": 4,
+            "group_size": group_size,
+            "desc_act": False,
+            "sym": sym,
+        }
+        with open(os.path.join(save_dir, "config.json"), "w") as f:
+            json.dump(config, f, indent=2, default=str)
+    return state_dict, quant_config
@@ -7,7 +7,9 @@ try:
     from .models.reference.models import detect_language
 except ImportError:
     pass
+from .pipeline_parallel import enable_pipeline_parallel, PipelineStage
 from .tensor_parallel import (
+    enable_sequence_parallel,
     shard_lm_head_weights,
     shard_mha_weights,
     shard_mlp_weights,
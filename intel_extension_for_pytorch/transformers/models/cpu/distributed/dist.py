@@ -47,6 +47,8 @@ def all_reduce_cpu(t: torch.Tensor, op=ReduceOp.SUM, group=None, async_op=False)
         and op is ReduceOp.SUM
         and torch.distributed.is_available()
         and torch.distributed.is_initialized()
+        # the ipex_shm backend already all-reduces through shared memory
+        and "ipex_shm" not in str(dist.get_backend(pg))
     ):
 
         ipex._C.tpp_shm_allreduce(t, pg)
@@ -63,3 +65,26 @@ def all_gather_cpu(
 
 def all_gather_into_tensor_cpu(output_tensor, input_tensor, group=None, async_op=False):
     return dist.all_gather_into_tensor(output_tensor, input_tensor, group, async_op)
+
+
+def reduce_scatter_tensor_cpu(
+    output, input, op=ReduceOp.SUM, group=None, async_op=False
+):
+    return dist.reduce_scatter_tensor(output, input, op, group, async_op)
+
+
+def all_to_all_single_cpu(
+    output,
+    input,
+    output_split_sizes=None,
+    input_split_sizes=None,
+    group=None,
+    async_op=False,
+):
+    return dist.all_to_all_single(
+        output, input, output_split_sizes, input_split_sizes, group, async_op
+    )
+
+
+def broadcast_cpu(tensor, src, group=None, async_op=False):
+    return dist.broadcast(tensor, src, group, async_op)
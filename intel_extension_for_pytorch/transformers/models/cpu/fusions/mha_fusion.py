@@ -1,4 +1,5 @@
 import torch
+import torch.distributed as dist
 from torch import nn
 from typing import Optional, Tuple
 from ...reference.fusions.mha_fusion import RotaryEmbedding
@@ -792,6 +793,70 @@ def gelu_mul_cpu(x, y, out=None, approximate="none"):
     return res
 
 
+def _merge_attention_block(out, lse, block_out, block_lse):
+    # Merge the attention outputs of two blocks of keys with the log-sum-exp
+    # of their softmax denominators
+    if out is None:
+        return block_out.float(), block_lse
+    new_lse = torch.logaddexp(lse, block_lse)
+    out = out * torch.exp(lse - new_lse).unsqueeze(-1) + block_out.float() * torch.exp(
+        block_lse - new_lse
+    ).unsqueeze(-1)
+    return out, new_lse
+
+
+def ring_attention_cpu(
+    query: torch.Tensor,
+    key: torch.Tensor,
+    value: torch.Tensor,
+    is_causal: bool = True,
+    scale: Optional[float] = None,
+    group=None,
+):
+    rank = dist.get_rank(group)
+    world_size = dist.get_world_size(group)
+    kv_groups = query.size(1) // key.size(1)
+
+    def attention(kv, causal):
+        k, v = kv[0], kv[1]
+        if kv_groups > 1:
+            k = k.repeat_interleave(kv_groups, dim=1)
+            v = v.repeat_interleave(kv_groups, dim=1)
+        return torch.ops.torch_ipex.flash_attention(
+            query, k, v, dropout_p=0.0, is_causal=causal, scale=scale
+        )
+
+    # The keys and values of the shards go around the ring, the shard of the
+    # next step is received while the current one is computed.
+    kv = torch.stack([key, value]).contiguous()
+    next_rank = (rank + 1) % world_size
+    prev_rank = (rank - 1) % world_size
+    if group is not None:
+        next_rank = dist.get_global_rank(group, next_rank)
+        prev_rank = dist.get_global_rank(group, prev_rank)
+    out, lse = None, None
+    for step in range(world_size):
+        if step + 1 < world_size:
+            next_kv = torch.empty_like(kv)
+            reqs = dist.batch_isend_irecv(
+                [
+                    dist.P2POp(dist.isend, kv, next_rank, group),
+                    dist.P2POp(dist.irecv, next_kv, prev_rank, group),
+                ]
+            )
+        src = (rank - step) % world_size
+        # With causal attention, the shards after the one of the queries are
+        # masked out, and the mask of its own shard is the causal one.
+        if not is_causal or src <= rank:
+            block_out, block_lse = attention(kv, is_causal and src == rank)
+            out, lse = _merge_attention_block(out, lse, block_out, block_lse)
+        if step + 1 < world_size:
+            for req in reqs:
+                req.wait()
+            kv = next_kv
+    return out.to(query.dtype)
+
+
 def bgmv_shrink_cpu(
     inputs: torch.Tensor,
     lora_a_weights: torch.Tensor,
@@ -1,5 +1,6 @@
 import torch
 import copy
+import os
 from ..utils._logger import logger, WarningType
 from importlib.metadata import distributions
 from intel_extension_for_pytorch.cpu._auto_kernel_selection import (
@@ -15,7 +16,10 @@ from ..utils.weight_only_quantization import (
     _convert_woq_with_low_precision_checkpoint,
 )
 
+from .pipeline_parallel import enable_pipeline_parallel
 from .tensor_parallel import (
+    enable_sequence_parallel,
+    SEQUENCE_PARALLEL_ENV,
     shard_lm_head_weights,
     shard_mha_weights,
     shard_mlp_weights,
@@ -117,7 +121,7 @@ def check_transformers_for_llm_support():
         )
 
 
-def model_convert_reference(_model):
+def model_convert_reference(_model, tp_size=None):
     import transformers
     from packaging import version
 
@@ -494,8 +498,17 @@ def model_convert_reference(_model):
     if _model.device.type == "cpu":
         from ..cpu import comm as ipex_comm
 
-        world_size = ipex_comm.get_world_size() if ipex_comm.has_ccl() else 1
-        rank = ipex_comm.get_rank() if ipex_comm.has_ccl else 0
+        if tp_size is not None:
+            # Explicit tensor parallel, on oneCCL or on the default process
+            # group of torch.distributed
+            world_size = ipex_comm.get_world_size()
+            assert (
+                tp_size == world_size
+            ), f"tp_size {tp_size} doesn't match the world size {world_size}"
+            rank = ipex_comm.get_rank()
+        else:
+            world_size = ipex_comm.get_world_size() if ipex_comm.has_ccl() else 1
+            rank = ipex_comm.get_rank() if ipex_comm.has_ccl() else 0
         if world_size > 1:
             global distributed
             global is_deepspeed
@@ -2136,6 +2149,8 @@ def optimize(
     sample_inputs=None,
     deployment_mode=True,
     cache_weight_for_large_batch=False,
+    tp_size=None,
+    pp_size=None,
 ):
     r"""
     Apply optimizations at Python frontend to the given transformers model (nn.Module).
@@ -2176,6 +2191,19 @@ def optimize(
             its inference (e.g., prefill phase) with extra memory usage. It is only valid for non-quantization cases
             where dtype = bfloat16 and weight-only quantization cases where lowp-mode=BF16/INT8. In other cases, an
             error will be raised. Default value is ``False``.
+        tp_size (int): Number of ranks of tensor parallel inference without DeepSpeed. The attention,
+            MLP and lm_head weights of Llama, GPT-J, Yuan and Phi models are sharded across the ranks,
+            whose outputs are reduced with ``ipex.cpu.comm.allreduce_add``. It must be the world size of
+            oneCCL or, without oneCCL, of the default process group of ``torch.distributed``, which must
+            be initialized before. Use ``inplace=True`` with a model loaded by
+            ``ipex.llm.load_checkpoint_mmap`` so that each rank only reads its slices of the weights.
+            The default value is ``None``, meaning tensor parallel is enabled by the world size of oneCCL.
+        pp_size (int): Number of stages of pipeline parallel inference in the current process. The decoder
+            layers are split into ``pp_size`` contiguous ranges, each one run on the cores of a NUMA node
+            with its weights on the memory of the node, and the batches of ``model.generate`` are split into
+            ``pp_size`` micro-batches run concurrently by the stages, see
+            ``ipex.transformers.pipeline_parallel.enable_pipeline_parallel``. It implies
+            ``deployment_mode=False``. The default value is ``None``, meaning no pipeline parallel.
 
     Returns:
         Optimized model object for model.generate(), also workable with model.forward
@@ -2257,6 +2285,8 @@ def optimize(
                     sample_inputs=sample_inputs,
                     deployment_mode=False,
                     cache_weight_for_large_batch=cache_weight_for_large_batch,
+                    tp_size=tp_size,
+                    pp_size=pp_size,
                 )
         else:
             if quantization_config is not None:
@@ -2302,6 +2332,20 @@ def optimize(
             is_quantization = True
             if _is_woq_qconfig(quantization_config):
                 is_woq = True
+        if tp_size is not None and tp_size > 1:
+            assert (
+                low_precision_checkpoint is None
+            ), "tp_size is not supported with low_precision_checkpoint yet"
+        if pp_size is not None and pp_size > 1:
+            assert (
+                tp_size is None or tp_size == 1
+            ), "pp_size and tp_size can't be used together yet"
+            if deployment_mode:
+                logger.warning(
+                    "Pipeline parallel runs the model in eager mode, set deployment_mode to False.",
+                    _type=WarningType.WrongArgument,
+                )
+                deployment_mode = False
 
         if cache_weight_for_large_batch:
             assert (
@@ -2347,7 +2391,7 @@ def optimize(
 
         # model reference conversion
         logger.debug("ipex.llm.optimize is converting model to reference model")
-        _model = model_convert_reference(_model)
+        _model = model_convert_reference(_model, tp_size)
 
         # model quantization if needed
         if is_quantization:
@@ -2475,6 +2519,20 @@ def optimize(
             is_woq,
             cache_weight_for_large_batch,
         )
+        if distributed and device == "cpu" and os.environ.get(SEQUENCE_PARALLEL_ENV):
+            if deployment_mode:
+                logger.warning(
+                    "Sequence parallel prefill needs deployment_mode=False, it's disabled.",
+                    _type=WarningType.NotSupported,
+                )
+            else:
+                from ..cpu import comm as ipex_comm
+
+                _model = enable_sequence_parallel(
+                    _model, ipex_comm.get_rank(), ipex_comm.get_world_size()
+                )
+        if pp_size is not None and pp_size > 1 and device == "cpu":
+            _model = enable_pipeline_parallel(_model, num_stages=pp_size)
         # do not register output hook when doing calibration in static int8
         if not (is_quantization and not is_woq and qconfig_summary_file is None):
             from .models.reference.models import output_hook
@@ -0,0 +1,289 @@
+import concurrent.futures
+import contextlib
+import copy
+import functools
+import torch
+from ..cpu.runtime import (
+    CPUPool,
+    get_core_lists,
+    get_cpu_pools,
+    is_runtime_ext_enabled,
+    pin,
+)
+from ..cpu.runtime.topology import (
+    move_tensors_to_nodes,
+    restore_mempolicy,
+    set_mempolicy,
+)
+from ..utils._logger import logger, WarningType
+
+
+def _get_decoder_layers(model):
+    for path in [
+        "model.layers",
+        "model.decoder.layers",
+        "transformer.h",
+        "transformer.layers",
+        "transformer.encoder.layers",
+        "gpt_neox.layers",
+    ]:
+        m = model
+        for name in path.split("."):
+            m = getattr(m, name, None)
+        if isinstance(m, torch.nn.ModuleList):
+            return m
+    return None
+
+
+def _capture_modes():
+    # The thread local states of the caller to apply in the stage threads
+    return (
+        torch.is_grad_enabled(),
+        torch.is_inference_mode_enabled(),
+        torch.is_autocast_cpu_enabled(),
+        torch.get_autocast_cpu_dtype(),
+    )
+
+
+@contextlib.contextmanager
+def _apply_modes(modes):
+    grad, inference, autocast, autocast_dtype = modes
+    with torch.inference_mode(inference), torch.set_grad_enabled(grad), torch.autocast(
+        "cpu", enabled=autocast, dtype=autocast_dtype
+    ):
+        yield
+
+
+class PipelineStage(object):
+    r"""
+    A stage of pipeline parallel: the modules attached to the stage run on a
+    thread of the stage pinned to the cores of its :class:`CPUPool`, one call
+    at a time and in the order of the calls. The weights of the modules and
+    the activations of the stage are allocated on the NUMA nodes of the pool.
+    :meth:`shutdown` restores the affinity of the thread and stops it.
+
+    Args:
+        cpu_pool (intel_extension_for_pytorch.cpu.runtime.CPUPool): The cores
+            of the stage.
+    """
+
+    def __init__(self, cpu_pool: CPUPool):
+        self.cpu_pool = cpu_pool
+        self.mem_node_ids = getattr(cpu_pool, "mem_node_ids", None)
+        # The pin context or the memory policy of the thread, restored by
+        # shutdown in the thread
+        self.pin_context = None
+        self.previous_mempolicy = None
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="ipex_pipeline_stage",
+            initializer=self._init_thread,
+        )
+
+    def _init_thread(self):
+        if is_runtime_ext_enabled():
+            self.pin_context = pin(self.cpu_pool)
+            self.pin_context.__enter__()
+        elif self.mem_node_ids:
+            self.previous_mempolicy = set_mempolicy(self.mem_node_ids)
+
+    def _exit_thread(self):
+        if self.pin_context is not None:
+            self.pin_context.__exit__(None, None, None)
+            self.pin_context = None
+        restore_mempolicy(self.previous_mempolicy)
+        self.previous_mempolicy = None
+
+    def _run(self, modes, fn, *args, **kwargs):
+        with _apply_modes(modes):
+            return fn(*args, **kwargs)
+
+    def run(self, fn, *args, **kwargs):
+        return self.executor.submit(
+            self._run, _capture_modes(), fn, *args, **kwargs
+        ).result()
+
+    def attach(self, module):
+        r"""
+        Run the forward of ``module`` on this stage.
+        """
+
+        if self.mem_node_ids:
+            move_tensors_to_nodes(
+                list(module.parameters()) + list(module.buffers()), self.mem_node_ids
+            )
+        module.forward = functools.partial(self.run, module.forward)
+
+    def shutdown(self):
+        r"""
+        Restore the affinity and the memory policy of the thread of the stage,
+        and stop the thread.
+        """
+
+        self.executor.submit(self._exit_thread).result()
+        self.executor.shutdown()
+
+
+def _get_stage_pools(num_stages):
+    # One pool per NUMA node, or the cores split evenly if there are fewer
+    # nodes than stages
+    pools = get_cpu_pools(policy="numa")
+    if len(pools) >= num_stages:
+        return pools[:num_stages]
+    logger.warning(
+        f"There are fewer NUMA nodes than the {num_stages} pipeline stages, "
+        + "the stages share the NUMA nodes.",
+        _type=WarningType.NotSupported,
+    )
+    cores = get_core_lists(policy="all")[0]
+    assert (
+        len(cores) >= num_stages
+    ), f"There are fewer cores than the {num_stages} pipeline stages."
+    return [
+        CPUPool(
+            core_ids=cores[
+                len(cores) * i // num_stages : len(cores) * (i + 1) // num_stages
+            ]
+        )
+        for i in range(num_stages)
+    ]
+
+
+def _pad_and_cat(sequences, pad_value):
+    max_len = max(s.size(-1) for s in sequences)
+    return torch.cat(
+        [
+            torch.nn.functional.pad(s, (0, max_len - s.size(-1)), value=pad_value)
+            for s in sequences
+        ]
+    )
+
+
+def _pipeline_generate(self, generate, num_micro_batches, *args, **kwargs):
+    input_ids = kwargs.get("input_ids", kwargs.get("inputs", args[0] if args else None))
+    if (
+        not isinstance(input_ids, torch.Tensor)
+        or kwargs.get("return_dict_in_generate", False)
+        or min(num_micro_batches, input_ids.size(0)) == 1
+    ):
+        return generate(*args, **kwargs)
+    batch_size = input_ids.size(0)
+    num_micro_batches = min(num_micro_batches, batch_size)
+
+    def split(x):
+        if isinstance(x, torch.Tensor) and x.dim() > 0 and x.size(0) == batch_size:
+            return torch.tensor_split(x, num_micro_batches)
+        return [x] * num_micro_batches
+
+    split_args = [split(a) for a in args]
+    split_kwargs = {k: split(v) for k, v in kwargs.items()}
+    modes = _capture_modes()
+    generate_fn = getattr(generate, "__func__", None)
+
+    def replicate():
+        # A shallow copy of the model with its own attributes, e.g. the
+        # generation config and the caches set by generate, sharing the
+        # submodules and their weights
+        replica = copy.copy(self)
+        replica._modules = dict(self._modules)
+        replica._buffers = dict(self._buffers)
+        replica.generation_config = copy.deepcopy(self.generation_config)
+        return replica
+
+    def run(i):
+        fn = generate
+        if generate_fn is not None and getattr(generate, "__self__", None) is self:
+            fn = generate_fn.__get__(replicate())
+        with _apply_modes(modes):
+            return fn(
+                *[a[i] for a in split_args],
+                **{k: v[i] for k, v in split_kwargs.items()},
+            )
+
+    # The micro-batches are generated concurrently, each one by a replica of
+    # the model, so that a stage runs the step of a micro-batch while the next
+    # stages run the other ones.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_micro_batches) as pool:
+        outputs = list(pool.map(run, range(num_micro_batches)))
+    pad_value = self.generation_config.pad_token_id
+    if pad_value is None:
+        pad_value = self.generation_config.eos_token_id
+    if isinstance(pad_value, (list, tuple)):
+        pad_value = pad_value[0]
+    return _pad_and_cat(outputs, pad_value if pad_value is not None else 0)
+
+
+def enable_pipeline_parallel(
+    model, cpu_pools=None, num_stages=2, num_micro_batches=None
+):
+    r"""
+    Run the decoder layers of a model in pipeline parallel in the current
+    process: the layers are split in contiguous ranges, one per stage, each
+    stage running its layers on a :class:`CPUPool`, e.g. one per NUMA node
+    of a multi-socket machine, with the weights of its layers on the memory
+    of the node. The embedding runs on the first stage and the LM head on the
+    last one, and the activations are passed between the stages in the memory
+    shared by the threads of the process.
+
+    The batches of ``model.generate`` are split into micro-batches generated
+    concurrently, so that the stages work on different micro-batches at the
+    same time during the decoding. Every micro-batch is generated by a
+    shallow copy of the model with its own attributes and generation config,
+    sharing the submodules, so the submodules must not keep the state of a
+    generation in their attributes. The threads of the stages keep running
+    until ``shutdown`` is called on each of them, e.g.
+    ``for stage in model.pipeline_stages: stage.shutdown()``.
+
+    Args:
+        model (torch.nn.Module): The model optimized by ``ipex.llm.optimize``
+            with ``deployment_mode=False``.
+        cpu_pools (list): The :class:`CPUPool` of every stage. The default
+            is one pool per NUMA node for ``num_stages`` stages.
+        num_stages (int): Number of stages if ``cpu_pools`` is not given.
+        num_micro_batches (int): Number of micro-batches ``model.generate``
+            splits the batches into. The default is the number of stages.
+
+    Returns:
+        torch.nn.Module: The model, whose layers are run by the stages.
+    """
+
+    layers = _get_decoder_layers(model)
+    if layers is None:
+        logger.warning(
+            "Pipeline parallel doesn't find the decoder layers of the model, it's disabled.",
+            _type=WarningType.NotSupported,
+        )
+        return model
+    if cpu_pools is None:
+        cpu_pools = _get_stage_pools(num_stages)
+    num_stages = len(cpu_pools)
+    assert (
+        len(layers) >= num_stages
+    ), f"The {len(layers)} decoder layers can't be split into {num_stages} pipeline stages."
+    if not is_runtime_ext_enabled():
+        logger.warning(
+            "The threads of the pipeline stages are not pinned to the cores of their CPUPools, "
+            + "as the IPEX Runtime extension is not enabled by preloading Intel OpenMP.",
+            _type=WarningType.NotSupported,
+        )
+    stages = [PipelineStage(pool) for pool in cpu_pools]
+    for i, stage in enumerate(stages):
+        start = len(layers) * i // num_stages
+        end = len(layers) * (i + 1) // num_stages
+        for layer in layers[start:end]:
+            stage.attach(layer)
+    if hasattr(model, "get_input_embeddings"):
+        stages[0].attach(model.get_input_embeddings())
+    if hasattr(model, "get_output_embeddings") and isinstance(
+        model.get_output_embeddings(), torch.nn.Module
+    ):
+        stages[-1].attach(model.get_output_embeddings())
+    model.pipeline_stages = stages
+    if hasattr(model, "generate"):
+        model.generate = functools.partial(
+            _pipeline_generate,
+            model,
+            model.generate,
+            num_micro_batches if num_micro_batches is not None else num_stages,
+        )
+    return model
@@ -1,6 +1,8 @@
 import torch
+import torch.distributed as dist
 import torch.nn as nn
 from ..cpu import comm as ipex_comm
+from ..utils._logger import logger, WarningType
 import os
 
 
@@ -437,8 +439,18 @@ class TensorParallelRowLinear(TensorParallellLinear):
             shard_by_col=False,
             value_with_share_qk=value_with_share_qk,
         )
+        # set by enable_sequence_parallel
+        self.sequence_parallel = None
 
     def forward(self, input: torch.Tensor) -> torch.Tensor:
+        if self.sequence_parallel is not None and self.sequence_parallel.active:
+            # reduce the partial sums of the tokens of the shard of the rank
+            return reduce_scatter_sequence(self.linear(input), self.world_size)
+        if self.world_size > 1:
+            num_chunks = ipex_comm.get_allreduce_chunks(input)
+            if num_chunks > 1:
+                # overlap the all-reduce of a chunk with the GEMM of the next
+                return ipex_comm.chunked_allreduce_add(self.linear, input, num_chunks)
         out = self.linear(input)
         if self.world_size > 1:
             ipex_comm.allreduce_add(out)
@@ -688,3 +700,173 @@ def update_heads_info(_model, rank, world_size):
             update(sub_m, group_size, kv_head_range)
 
     update(_model, group_size, kv_heads_range)
+
+
+# Minimum number of prompt tokens to run the prefill in sequence parallel, see
+# enable_sequence_parallel
+SEQUENCE_PARALLEL_ENV = "TP_SEQUENCE_PARALLEL_MIN_TOKENS"
+
+
+def split_sequence(hidden_states, rank, world_size):
+    r"""
+    Return the shard of the sequence (dim 1) of ``hidden_states`` of ``rank``,
+    the sequence being padded to a multiple of ``world_size``.
+    """
+
+    seq_len = hidden_states.size(1)
+    shard_len = (seq_len + world_size - 1) // world_size
+    pad = shard_len * world_size - seq_len
+    if pad > 0:
+        hidden_states = torch.nn.functional.pad(hidden_states, (0, 0, 0, pad))
+    return hidden_states[:, rank * shard_len : (rank + 1) * shard_len].contiguous()
+
+
+def gather_sequence(hidden_states, world_size, seq_len):
+    r"""
+    All-gather the shards of the sequence (dim 1) made by :func:`split_sequence`
+    and remove the padding, ``seq_len`` being the original length.
+    """
+
+    from ..distributed import all_gather_into_tensor
+
+    # the sequence is made the first dim so that the shards are contiguous
+    shard = hidden_states.transpose(0, 1).contiguous()
+    out = shard.new_empty(world_size * shard.size(0), *shard.shape[1:])
+    all_gather_into_tensor(out, shard)
+    return out[:seq_len].transpose(0, 1).contiguous()
+
+
+def reduce_scatter_sequence(hidden_states, world_size):
+    r"""
+    Sum the partial results of the ranks for the full sequence (dim 1) and
+    return the shard of the rank, as made by :func:`split_sequence`.
+    """
+
+    from ..distributed import reduce_scatter_tensor
+
+    seq_len = hidden_states.size(1)
+    shard_len = (seq_len + world_size - 1) // world_size
+    t = hidden_states.transpose(0, 1)
+    pad = shard_len * world_size - seq_len
+    if pad > 0:
+        t = torch.nn.functional.pad(t, (0, 0, 0, 0, 0, pad))
+    t = t.contiguous()
+    out = t.new_empty(shard_len, *t.shape[1:])
+    reduce_scatter_tensor(out, t)
+    return out.transpose(0, 1).contiguous()
+
+
+class _SequenceParallelState(object):
+    def __init__(self, rank, world_size, min_tokens):
+        self.rank = rank
+        self.world_size = world_size
+        self.min_tokens = min_tokens
+        # length of the sequence of the running prefill, None out of it
+        self.seq_len = None
+
+    @property
+    def active(self):
+        return self.seq_len is not None
+
+
+def _get_hidden_states(args, kwargs):
+    if "hidden_states" in kwargs:
+        return kwargs["hidden_states"]
+    return args[0]
+
+
+def _set_hidden_states(args, kwargs, hidden_states):
+    if "hidden_states" in kwargs:
+        kwargs["hidden_states"] = hidden_states
+    else:
+        args = (hidden_states,) + tuple(args[1:])
+    return args, kwargs
+
+
+def enable_sequence_parallel(model, rank, world_size, min_tokens=None):
+    r"""
+    Run the prefill of the prompts of at least ``min_tokens`` tokens of a
+    tensor parallel model in sequence parallel: the hidden states between the
+    attention and MLP blocks are sharded by sequence across the ranks, so that
+    the norms and residual adds of a rank only compute its shard. The shards
+    are all-gathered at the input of the attention and the MLP, whose weights
+    are sharded by tensor parallel, and the all-reduce of their row-parallel
+    output linears is replaced by a reduce-scatter to the shards.
+
+    The KV cache holds the full sequence as in tensor parallel, and the
+    following tokens are generated without sequence parallel. It's supported
+    for the Llama models sharded by ``ipex.llm.optimize(tp_size=...)``, in
+    eager mode, i.e. ``deployment_mode=False``, and needs the default process
+    group of ``torch.distributed``.
+
+    Args:
+        model (torch.nn.Module): The model sharded by tensor parallel.
+        rank (int): The rank of the process.
+        world_size (int): Number of ranks of tensor parallel.
+        min_tokens (int): The minimum number of tokens of the prompts run in
+            sequence parallel. It's read from the ``TP_SEQUENCE_PARALLEL_MIN_TOKENS``
+            environment variable by default, and ``0`` disables sequence parallel.
+    """
+
+    if min_tokens is None:
+        min_tokens = int(os.environ.get(SEQUENCE_PARALLEL_ENV, "0"))
+    if world_size == 1 or min_tokens <= 0:
+        return model
+    if not (dist.is_available() and dist.is_initialized()):
+        logger.warning(
+            "Sequence parallel needs the default process group of torch.distributed, "
+            + "it's disabled.",
+            _type=WarningType.NotSupported,
+        )
+        return model
+    layers = getattr(getattr(model, "model", None), "layers", None)
+    if (
+        model.config.architectures[0] != "LlamaForCausalLM"
+        or layers is None
+        or not all(
+            isinstance(layer.self_attn.o_proj, TensorParallelRowLinear)
+            and isinstance(layer.mlp.down_proj, TensorParallelRowLinear)
+            and hasattr(layer, "linear_silu_mul")
+            for layer in layers
+        )
+    ):
+        logger.warning(
+            "Sequence parallel is only supported by Llama models sharded by "
+            + "tensor parallel, it's disabled.",
+            _type=WarningType.NotSupported,
+        )
+        return model
+
+    state = _SequenceParallelState(rank, world_size, max(min_tokens, 2))
+
+    def split_hook(mod, args, kwargs):
+        hidden_states = _get_hidden_states(args, kwargs)
+        state.seq_len = None
+        if torch.jit.is_tracing() or hidden_states.size(1) < state.min_tokens:
+            return None
+        state.seq_len = hidden_states.size(1)
+        hidden_states = split_sequence(hidden_states, rank, world_size)
+        return _set_hidden_states(args, kwargs, hidden_states)
+
+    def gather_hook(mod, args, kwargs):
+        if not state.active:
+            return None
+        hidden_states = _get_hidden_states(args, kwargs)
+        hidden_states = gather_sequence(hidden_states, world_size, state.seq_len)
+        return _set_hidden_states(args, kwargs, hidden_states)
+
+    def output_hook(mod, args, output):
+        if not state.active:
+            return None
+        output = gather_sequence(output, world_size, state.seq_len)
+        state.seq_len = None
+        return output
+
+    layers[0].register_forward_pre_hook(split_hook, with_kwargs=True)
+    for layer in layers:
+        layer.self_attn.register_forward_pre_hook(gather_hook, with_kwargs=True)
+        layer.linear_silu_mul.register_forward_pre_hook(gather_hook, with_kwargs=True)
+        layer.self_attn.o_proj.sequence_parallel = state
+        layer.mlp.down_proj.sequence_parallel = state
+    model.model.norm.register_forward_hook(output_hook)
+    return model
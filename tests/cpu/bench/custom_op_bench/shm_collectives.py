@@ -0,0 +1,80 @@
+import argparse
+import os
+import socket
+import time
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import intel_extension_for_pytorch as ipex
+
+
+def run_bench(bench_name, fn, iters):
+    for _ in range(10):
+        fn()
+    dist.barrier()
+    start = time.time()
+    for _ in range(iters):
+        fn()
+    dist.barrier()
+    elapsed = (time.time() - start) / iters * 1000
+    if dist.get_rank() == 0:
+        print("Took {:.3f} ms on average to run {}".format(elapsed, bench_name))
+
+
+def worker(rank, args, backend, port):
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    dist.init_process_group(backend, rank=rank, world_size=args.world_size)
+    torch.set_num_threads(args.num_threads)
+    world_size = args.world_size
+    dtype = torch.bfloat16 if args.bf16 else torch.float
+    for size in args.sizes:
+        numel = size // dtype.itemsize // world_size * world_size
+        x = torch.randn(numel).to(dtype)
+        shard = torch.empty(numel // world_size, dtype=dtype)
+        out = torch.empty(numel, dtype=dtype)
+        name = f"{{}} of {size} bytes on {backend}"
+        run_bench(name.format("all_reduce"), lambda: dist.all_reduce(x), args.iters)
+        run_bench(
+            name.format("reduce_scatter"),
+            lambda: dist.reduce_scatter_tensor(shard, x),
+            args.iters,
+        )
+        run_bench(
+            name.format("all_gather"),
+            lambda: dist.all_gather_into_tensor(out, shard),
+            args.iters,
+        )
+        run_bench(
+            name.format("all_to_all"),
+            lambda: dist.all_to_all_single(out, x),
+            args.iters,
+        )
+        run_bench(name.format("broadcast"), lambda: dist.broadcast(x, 0), args.iters)
+    dist.destroy_process_group()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the collectives of the ipex_shm process group against gloo"
+    )
+    parser.add_argument("--world-size", type=int, default=2)
+    parser.add_argument("--num-threads", type=int, default=1)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[4 * 1024, 256 * 1024, 16 * 1024 * 1024, 64 * 1024 * 1024],
+    )
+    parser.add_argument(
+        "--backends", nargs="+", default=["gloo", ipex.distributed.SHM_BACKEND]
+    )
+    parser.add_argument("--iters", type=int, default=50)
+    parser.add_argument("--bf16", action="store_true")
+    args = parser.parse_args()
+    for backend in args.backends:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        mp.spawn(worker, args=(args, backend, port), nprocs=args.world_size)
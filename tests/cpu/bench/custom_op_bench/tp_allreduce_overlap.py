@@ -0,0 +1,79 @@
+import argparse
+import os
+import socket
+import time
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import intel_extension_for_pytorch as ipex
+from intel_extension_for_pytorch.cpu import comm as ipex_comm
+from intel_extension_for_pytorch.transformers import TensorParallelRowLinear
+
+
+def run_bench(bench_name, model, x, iters):
+    with torch.no_grad():
+        for _ in range(10):
+            model(x)
+        ipex_comm.barrier()
+        start = time.time()
+        for _ in range(iters):
+            model(x)
+        ipex_comm.barrier()
+        elapsed = (time.time() - start) / iters * 1000
+    if ipex_comm.get_rank() == 0:
+        print("Took {:.3f} ms on average to run {}".format(elapsed, bench_name))
+
+
+def worker(rank, args, port):
+    if not ipex_comm.has_ccl():
+        os.environ["MASTER_ADDR"] = "127.0.0.1"
+        os.environ["MASTER_PORT"] = str(port)
+        dist.init_process_group("gloo", rank=rank, world_size=args.world_size)
+    torch.set_num_threads(args.num_threads)
+    rank = ipex_comm.get_rank()
+    world_size = ipex_comm.get_world_size()
+    dtype = torch.bfloat16 if args.bf16 else torch.float
+    linear = torch.nn.Linear(args.intermediate_size, args.hidden_size, bias=False)
+    tp_linear = TensorParallelRowLinear(
+        linear, 1, 1, args.intermediate_size, rank, world_size, shard_by_head=False
+    ).eval()
+    tp_linear = ipex.optimize(tp_linear, dtype=dtype, inplace=True)
+    x = torch.randn(
+        args.batch_size, args.seq_len, args.intermediate_size // world_size
+    ).to(dtype)
+    for chunks in args.chunks:
+        os.environ[ipex_comm.ALLREDUCE_CHUNKS_ENV] = str(chunks)
+        run_bench(
+            f"row-parallel linear, {chunks} chunk(s), eager", tp_linear, x, args.iters
+        )
+        traced = torch.jit.freeze(torch.jit.trace(tp_linear, x, check_trace=False))
+        run_bench(
+            f"row-parallel linear, {chunks} chunk(s), traced", traced, x, args.iters
+        )
+    if dist.is_initialized():
+        dist.destroy_process_group()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the overlap of the GEMM and the all-reduce of row-parallel linears"
+    )
+    parser.add_argument("--world-size", type=int, default=2)
+    parser.add_argument("--num-threads", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--seq-len", type=int, default=512)
+    parser.add_argument("--hidden-size", type=int, default=4096)
+    parser.add_argument("--intermediate-size", type=int, default=11008)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--iters", type=int, default=50)
+    parser.add_argument("--bf16", action="store_true")
+    args = parser.parse_args()
+    if ipex_comm.has_ccl():
+        # launched by mpirun, one process per rank
+        worker(0, args, None)
+    else:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        mp.spawn(worker, args=(args, port), nprocs=args.world_size)
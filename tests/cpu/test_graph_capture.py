@@ -2,6 +2,7 @@ import unittest
 import copy
 import os
 import tempfile
+import threading
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -90,6 +91,83 @@ class TestGraphCapture(TestCase):
                 y2 = model(x)
         self.assertEqual(y1, y2)
 
+    def test_inference_graph_mode_jit_shape_cache(self):
+        model = Conv_Bn_Relu().to(memory_format=torch.channels_last).eval()
+        model = ipex.optimize(model, graph_mode=True)
+        graph_capture = model.forward.graph_capture
+        graph_capture.max_graphs = 2
+
+        xs = [
+            torch.randn(bs, 6, 10, 10).to(memory_format=torch.channels_last)
+            for bs in [1, 3, 1, 5, 3]
+        ]
+        with torch.no_grad():
+            for x in xs:
+                self.assertEqual(model(x), graph_capture.model(x))
+        # the graph of batch size 3 is evicted by the one of batch size 5
+        self.assertEqual(
+            graph_capture.stats,
+            {"hits": 1, "misses": 4, "retraces": 1, "evictions": 2, "graphs": 2},
+        )
+
+    def test_inference_graph_mode_jit_shape_cache_threads(self):
+        model = Conv_Bn_Relu().to(memory_format=torch.channels_last).eval()
+        model = ipex.optimize(model, graph_mode=True)
+        graph_capture = model.forward.graph_capture
+        graph_capture.max_graphs = 2
+        xs = {
+            bs: torch.randn(bs, 6, 10, 10).to(memory_format=torch.channels_last)
+            for bs in [1, 2, 3]
+        }
+        num_threads, num_calls = 4, 30
+        errors = []
+
+        def run(thread_id):
+            try:
+                with torch.no_grad():
+                    for i in range(num_calls):
+                        # the lookups race the evictions of the other threads
+                        x = xs[[1, 2, 3][(thread_id + i) % 3]]
+                        model(x)
+            except BaseException as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(num_threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        stats = graph_capture.stats
+        # every call is counted once, as a hit or as a miss
+        self.assertEqual(stats["hits"] + stats["misses"], num_threads * num_calls)
+        self.assertEqual(stats["graphs"], 2)
+
+    def test_inference_graph_mode_async(self):
+        for model in [Conv_Bn_Relu(), Conv_IF_Relu()]:
+            model = model.to(memory_format=torch.channels_last).eval()
+            x = torch.randn(3, 6, 10, 10).to(memory_format=torch.channels_last)
+            y1 = model(x)
+            model = ipex.optimize(model, graph_mode="async")
+            graph_capture = model.forward.graph_capture
+            self.assertTrue(graph_capture.async_capture)
+
+            with torch.no_grad():
+                # served in eager mode while capturing
+                y2 = model(x)
+                graph_capture.synchronize()
+                self.assertIn(
+                    graph_capture.method,
+                    [
+                        ipex.cpu.graph_capture.RunMethods.JIT,
+                        ipex.cpu.graph_capture.RunMethods.TorchDynamo,
+                    ],
+                )
+                for _ in range(10):
+                    y3 = model(x)
+            self.assertEqual(y1, y2)
+            self.assertEqual(y1, y3)
+
     def test_inference_graph_mode_torchdynamo(self):
         model = Conv_IF_Relu().to(memory_format=torch.channels_last).eval()
         x = torch.randn(3, 6, 10, 10).to(memory_format=torch.channels_last)
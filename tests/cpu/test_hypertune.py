@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+
+from common_utils import TestCase
+from intel_extension_for_pytorch.cpu.hypertune.conf.config import Conf
+from intel_extension_for_pytorch.cpu.hypertune.strategy import STRATEGIES
+
+PROGRAM = """
+print("@hypertune {'name': 'latency'}")
+print(latency)
+print("@hypertune {'name': 'throughput', 'higher_is_better': True}")
+print(throughput)
+"""
+
+NCORES = list(range(1, 17))
+NINSTANCES = [1, 2, 4, 8]
+
+
+def latency(cfg):
+    return (cfg["ncores_per_instance"] - 11) ** 2 + abs(cfg["ninstances"] - 2)
+
+
+class Evaluator(object):
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, cfg, budget=None):
+        self.calls.append((cfg, budget))
+        # results of short runs are noisier but keep the order of good and bad
+        # configurations
+        noise = 0.0 if budget is None else 1.0 / budget
+        lat = latency(cfg) + noise
+        return [lat, 1000.0 / (lat + 1)]
+
+
+class TestHypertune(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.program = os.path.join(self.tmp.name, "program.py")
+        with open(self.program, "w") as f:
+            f.write(PROGRAM)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build_strategy(self, tuning):
+        conf_file = os.path.join(self.tmp.name, "conf.yaml")
+        with open(conf_file, "w") as f:
+            f.write(
+                "tuning:\n"
+                + "".join(f"  {k}: {v}\n" for k, v in tuning.items())
+                + f"output_dir: {self.tmp.name}\n"
+                + "hyperparams:\n"
+                + "  launcher:\n"
+                + "    hp: ['ncores_per_instance', 'ninstances']\n"
+                + f"    ncores_per_instance: {NCORES}\n"
+                + f"    ninstances: {NINSTANCES}\n"
+            )
+        conf = Conf(conf_file, self.program, [])
+        strategy = STRATEGIES[conf.execution_conf.tuning.strategy](conf)
+        strategy.multiobjective.evaluate = Evaluator()
+        return strategy
+
+    def test_bayesian(self):
+        strategy = self.build_strategy(
+            {"strategy": "bayesian", "max_trials": 24, "n_initial_trials": 8}
+        )
+        strategy.traverse()
+        calls = strategy.multiobjective.evaluate.calls
+        self.assertEqual(len(calls), 24)
+        self.assertEqual(len(set(str(cfg) for cfg, _ in calls)), 24)
+        # a random search of 24 out of 64 configurations is unlikely to get
+        # this close
+        self.assertLessEqual(latency(strategy.best_tune_cfg), 1)
+
+    def test_halving(self):
+        strategy = self.build_strategy(
+            {
+                "strategy": "halving",
+                "max_trials": 100,
+                "min_budget": 1,
+                "max_budget": 9,
+                "reduction_factor": 3,
+                "budget_arg": "--iterations",
+            }
+        )
+        self.assertEqual(strategy.budgets, [1, 3, 9])
+        self.assertEqual(strategy.multiobjective.budget_arg, "--iterations")
+        strategy.traverse()
+        calls = strategy.multiobjective.evaluate.calls
+        budgets = [budget for _, budget in calls]
+        self.assertEqual(budgets, [1] * 64 + [3] * 21 + [9] * 7)
+        # only the survivors of a rung are promoted
+        promoted = [cfg for cfg, budget in calls if budget == 3]
+        rung = sorted([cfg for cfg, budget in calls if budget == 1], key=latency)[:21]
+        self.assertEqual(
+            sorted(str(cfg) for cfg in promoted), sorted(str(cfg) for cfg in rung)
+        )
+        best = min((cfg for cfg, _ in calls), key=latency)
+        self.assertEqual(strategy.best_tune_cfg, best)
+
+    def test_resume(self):
+        strategy = self.build_strategy({"strategy": "random", "max_trials": 5})
+        strategy.traverse()
+        first = strategy.multiobjective.evaluate.calls
+        self.assertEqual(len(first), 5)
+
+        strategy = self.build_strategy(
+            {"strategy": "bayesian", "max_trials": 10, "resume": True}
+        )
+        self.assertEqual(len(strategy.history), 5)
+        strategy.traverse()
+        second = strategy.multiobjective.evaluate.calls
+        # the configurations evaluated before aren't run again
+        self.assertEqual(len(second), 5)
+        self.assertTrue(
+            all(str(cfg) not in [str(c) for c, _ in first] for cfg, _ in second)
+        )
+        with open(os.path.join(self.tmp.name, "record.csv")) as f:
+            self.assertEqual(len(f.readlines()), 1 + 5 + 10)
+
+
+if __name__ == "__main__":
+    test = unittest.main()
@@ -21,6 +21,9 @@ from torch.optim import (
 import unittest
 import itertools
 import copy
+import json
+import tempfile
+from unittest import mock
 from common_utils import TestModule, _empty_weight_bias_parameter_names
 from intel_extension_for_pytorch.optim._lamb import Lamb
 import os
@@ -448,6 +451,47 @@ class TestOptimizeCases(TestCase):
                 self.assertEqual(M.embeddingbag.weight.dtype, dtype)
                 self.assertEqual(M.bn.weight.dtype, torch.float)
 
+    def test_optimize_low_memory(self):
+        M_ori = TestModule()
+        for dtype in dtypes:
+            # inference: the weights not converted are shared with the model
+            M = copy.deepcopy(M_ori).eval()
+            ref_weights = copy.deepcopy(M.state_dict())
+            opt_M = ipex.optimize(M, dtype=dtype, low_memory=True)
+            self.assertTrue(isinstance(opt_M.linear, _IPEXLinear))
+            self.assertTrue(
+                M.linear.weight.data_ptr() != opt_M.linear.weight.data_ptr()
+            )
+            if dtype == torch.float32:
+                self.assertTrue(
+                    M.embeddingbag.weight.data_ptr()
+                    == opt_M.embeddingbag.weight.data_ptr()
+                )
+            self.assertEqual(M.state_dict(), ref_weights)
+            stats = opt_M.optimize_memory_stats
+            self.assertGreaterEqual(stats["peak_rss"], stats["start_rss"])
+            self.assertGreaterEqual(stats["peak_rss"], stats["end_rss"])
+            with torch.no_grad(), torch.cpu.amp.autocast(
+                enabled=dtype == torch.bfloat16
+            ):
+                self.assertEqual(opt_M(*M.input), M(*M.input), rtol=1e-2, atol=1e-1)
+
+            # training: the optimized model doesn't update the model weights
+            M = copy.deepcopy(M_ori).train()
+            ref_weights = copy.deepcopy(M.state_dict())
+            sgd = torch.optim.SGD(M.parameters(), lr=0.1)
+            opt_M, opt_sgd = ipex.optimize(
+                M, dtype=dtype, optimizer=sgd, low_memory=True
+            )
+            for p in M.parameters():
+                self.assertTrue(
+                    all(p.data_ptr() != q.data_ptr() for q in opt_M.parameters())
+                )
+            with torch.cpu.amp.autocast(enabled=dtype == torch.bfloat16):
+                opt_M(*M.input).sum().backward()
+            opt_sgd.step()
+            self.assertEqual(M.state_dict(), ref_weights)
+
     def _test_tensor_convert(self, tensor, bf16_tensor):
         top_half, bot_half = torch.ops.torch_ipex.split_float_bfloat16(tensor)
         # truncated top half should equal with convert fp32 to bf16 by ".bfloat()"
@@ -514,6 +558,51 @@ class TestOptimizeCases(TestCase):
             if isinstance(M, TwoLayerMLP):
                 self.assertEqual(opt_M.l2.batch_size_collapsed, 3)
 
+    def test_measured_kernel_selection(self):
+        from intel_extension_for_pytorch.cpu import _auto_kernel_selection as aks
+        from intel_extension_for_pytorch.nn.utils import _parameter_wrapper
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_file = os.path.join(tmp, "kernel_selection.json")
+            os.environ[aks.KERNEL_SELECTION_CACHE_ENV] = cache_file
+            try:
+                aks._clear_kernel_decisions()
+                M = TwoLayerMLP().eval()
+                input = (M.input1, M.input2)
+                opt_M = ipex.optimize(M, sample_input=input, auto_kernel_selection=True)
+                # one decision per linear shape, persisted for the next runs
+                with open(cache_file) as f:
+                    decisions = json.load(f)
+                key = aks._kernel_selection_key("linear", M.l1.weight, M.input1.shape)
+                self.assertIn(decisions[key], ["dnnl", "mkl"])
+                self.assertEqual(opt_M.l1.use_dnnl, decisions[key] == "dnnl")
+                with torch.no_grad():
+                    self.assertEqual(opt_M(*input), M(*input))
+
+                # the persisted decisions are used instead of measuring again
+                for kernel in ["mkl", "dnnl"]:
+                    for k in decisions:
+                        decisions[k] = kernel
+                    with open(cache_file, "w") as f:
+                        json.dump(decisions, f)
+                    aks._clear_kernel_decisions()
+                    # the candidates are neither prepacked nor measured
+                    with mock.patch.object(
+                        _parameter_wrapper,
+                        "_select_kernel",
+                        side_effect=AssertionError("measured a persisted decision"),
+                    ):
+                        opt_M = ipex.optimize(
+                            TwoLayerMLP().eval(),
+                            sample_input=input,
+                            auto_kernel_selection=True,
+                        )
+                    self.assertEqual(opt_M.l1.use_dnnl, kernel == "dnnl")
+                    self.assertEqual(opt_M.l2.use_dnnl, kernel == "dnnl")
+            finally:
+                del os.environ[aks.KERNEL_SELECTION_CACHE_ENV]
+                aks._clear_kernel_decisions()
+
     def test_traced_model_serialization(self):
         for module in [ConvBatchNorm, OneLayerMLP, ConvTranspose2d]:
             for dtype in dtypes:
@@ -8,6 +8,7 @@ import os
 import copy
 import re
 import tempfile
+from unittest import mock
 from intel_extension_for_pytorch.quantization import prepare, convert
 from collections import namedtuple
 import itertools
@@ -413,6 +414,126 @@ class OptimizeTransformersTester(TestCase):
                 # the optimized model is ipex_m.trace_graph
                 ipex_m.trace_graph(*example_inputs)
 
+    def test_gptq_offload_and_resume(self):
+        from intel_extension_for_pytorch.quantization._GPTQ.gptq.gptq import (
+            GPTQuantizer,
+        )
+
+        config = AutoConfig.from_pretrained(
+            f"{curpath}/hf_configs/gptj",
+            n_embd=256,
+            n_head=4,
+            n_layer=3,
+            rotary_dim=16,
+            vocab_size=1000,
+            return_dict=False,
+        )
+        m = transformers.models.gptj.modeling_gptj.GPTJForCausalLM(config).eval()
+        dataloader = [torch.randint(0, 1000, (1, 32)) for _ in range(4)]
+        save_checkpoint = GPTQuantizer.save_checkpoint
+        saved_blocks = []
+
+        class Interrupted(Exception):
+            pass
+
+        def save_and_stop(self, block_idx, *args):
+            save_checkpoint(self, block_idx, *args)
+            saved_blocks.append(block_idx)
+            if block_idx == 1:
+                raise Interrupted()
+
+        def run(work_dir, **kwargs):
+            return ipex.quantization.gptq(
+                copy.deepcopy(m),
+                dataloader,
+                group_size=128,
+                nsamples=len(dataloader),
+                use_max_length=False,
+                save_dir=work_dir,
+                **kwargs,
+            ).state_dict()
+
+        def assert_same_quantization(state_dict, ref):
+            keys = [k for k in ref if k.endswith((".qweight", ".scales", ".qzeros"))]
+            # q, k, v, out, fc_in and fc_out of every block
+            self.assertEqual(len(keys), 3 * 6 * config.n_layer)
+            for k in keys:
+                self.assertTrue(torch.equal(state_dict[k], ref[k]), k)
+
+        num_threads = torch.get_num_threads()
+        # The same number of threads for all the runs, including those on the pools
+        torch.set_num_threads(1)
+        try:
+            with tempfile.TemporaryDirectory() as work_dir:
+                ref = run(work_dir)
+                offloaded = run(work_dir, offload_dir=work_dir + "/offload")
+                assert_same_quantization(offloaded, ref)
+                self.assertEqual(os.listdir(work_dir + "/offload"), [])
+                if ipex.cpu.runtime.is_runtime_ext_enabled():
+                    cpu_pools = [
+                        ipex.cpu.runtime.CPUPool(core_ids=[0]) for _ in range(2)
+                    ]
+                    assert_same_quantization(run(work_dir, cpu_pools=cpu_pools), ref)
+                for offload_dir in [None, work_dir + "/resumed_offload"]:
+                    checkpoint_dir = tempfile.mkdtemp(dir=work_dir)
+                    saved_blocks.clear()
+                    with mock.patch.object(
+                        GPTQuantizer, "save_checkpoint", save_and_stop
+                    ), self.assertRaises(Interrupted):
+                        run(
+                            work_dir,
+                            offload_dir=offload_dir,
+                            checkpoint_dir=checkpoint_dir,
+                        )
+                    self.assertEqual(saved_blocks, [0, 1])
+                    saved_blocks.clear()
+                    with mock.patch.object(
+                        GPTQuantizer, "save_checkpoint", save_and_stop
+                    ):
+                        resumed = run(
+                            work_dir,
+                            offload_dir=offload_dir,
+                            checkpoint_dir=checkpoint_dir,
+                        )
+                    # only the last block is quantized again
+                    self.assertEqual(saved_blocks, [2])
+                    assert_same_quantization(resumed, ref)
+        finally:
+            torch.set_num_threads(num_threads)
+
+    def test_gptq_activation_buffer(self):
+        from intel_extension_for_pytorch.quantization._GPTQ.gptq.model_utils import (
+            ActivationBuffer,
+        )
+
+        tensors = [
+            torch.randn(2, 7, 16).to(torch.bfloat16),
+            torch.randn(1, 5, 16).to(torch.bfloat16),
+            torch.randn(0, 16).to(torch.bfloat16),
+            torch.randn(3, 16),
+            torch.randn(4, 9, 16).to(torch.bfloat16).transpose(0, 1),
+        ]
+        with tempfile.TemporaryDirectory() as work_dir:
+            path = work_dir + "/hidden_states.bin"
+            buffer = ActivationBuffer(path)
+            for i, t in enumerate(tensors):
+                buffer.append(t)
+                # read back while appending the other batches
+                self.assertEqual(buffer[i].dtype, t.dtype)
+                self.assertTrue(torch.equal(buffer[i], t))
+            self.assertEqual(len(buffer), len(tensors))
+            buffer.save_index()
+            for loaded in [buffer, ActivationBuffer.load(path)]:
+                for x, t in zip(loaded, tensors):
+                    self.assertEqual(x.dtype, t.dtype)
+                    self.assertEqual(x.shape, t.shape)
+                    self.assertTrue(torch.equal(x, t))
+                    # the data is aligned for the kernels reading it
+                    if x.numel() > 0:
+                        self.assertEqual(x.data_ptr() % ActivationBuffer.alignment, 0)
+            buffer.close(remove=True)
+            self.assertEqual(os.listdir(work_dir), [])
+
     def test_weight_only_quant_awq(self):
         config = AutoConfig.from_pretrained(
             f"{curpath}/hf_configs/gptj", return_dict=False
@@ -477,6 +598,50 @@ class OptimizeTransformersTester(TestCase):
                 # the optimized model is ipex_m.trace_graph
                 ipex_m.trace_graph(*example_inputs)
 
+    def test_weight_only_quant_woq_calibrate(self):
+        config = AutoConfig.from_pretrained(
+            f"{curpath}/hf_configs/gptj", return_dict=False
+        )
+        m = transformers.models.gptj.modeling_gptj.GPTJForCausalLM(config).eval()
+        calib_data = [torch.randint(0, config.vocab_size, (1, 32)) for _ in range(4)]
+        input_ids = torch.randint(0, config.vocab_size, (1, 16))
+        with torch.no_grad():
+            ref_out = m(input_ids)[0]
+        for method in ["awq", "rtn"]:
+            with tempfile.TemporaryDirectory() as work_dir:
+                ipex.quantization.woq_calibrate(
+                    m,
+                    calib_data,
+                    method=method,
+                    group_size=32,
+                    save_dir=work_dir,
+                )
+                checkpoint = ipex.llm.load_low_precision_checkpoint(work_dir)
+            self.assertEqual(checkpoint[1]["quant_method"], "gptq")
+            self.assertEqual(checkpoint[1]["group_size"], 32)
+            qconfig = ipex.quantization.get_weight_only_quant_qconfig_mapping(
+                weight_dtype=ipex.quantization.WoqWeightDtype.INT4,
+                lowp_mode=ipex.quantization.WoqLowpMode.NONE,
+            )
+            ipex_m = ipex.llm.optimize(
+                copy.deepcopy(m),
+                dtype=torch.float,
+                quantization_config=qconfig,
+                low_precision_checkpoint=checkpoint,
+                deployment_mode=False,
+                inplace=True,
+            )
+            with torch.no_grad():
+                out = ipex_m(input_ids)[0]
+            # INT4 weights, the logits stay close to the fp32 ones
+            self.assertEqual(out.shape, ref_out.shape)
+            self.assertTrue(
+                torch.nn.functional.cosine_similarity(
+                    out.flatten(), ref_out.flatten(), dim=0
+                )
+                > 0.9
+            )
+
     def test_generate_functions(self):
         config = AutoConfig.from_pretrained(
             f"{curpath}/hf_configs/gptj", return_dict=False
@@ -5,6 +5,10 @@ import sys
 import subprocess
 import os
 import copy
+import socket
+import tempfile
+import torch.distributed as dist
+import torch.multiprocessing as mp
 from intel_extension_for_pytorch.transformers import (
     shard_mha_weights,
     shard_mlp_weights,
@@ -208,5 +212,159 @@ class TensorParallelTester(TestCase):
         self.tensor_parallel_with_optimize_transformers(model)
 
 
+def _run_tp_with_gloo(rank, world_size, port, checkpoint_dir, allreduce_chunks):
+    os.environ[ipex_comm.ALLREDUCE_CHUNKS_ENV] = str(allreduce_chunks)
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    try:
+        torch.manual_seed(0)
+        config = AutoConfig.from_pretrained(
+            f"{curpath}/hf_configs/gptj", return_dict=False
+        )
+        ref_m = transformers.models.gptj.modeling_gptj.GPTJForCausalLM(config).eval()
+        ref_m.load_state_dict(torch.load(f"{checkpoint_dir}/model.pt"))
+        # randomly initialized, the weights are read from the checkpoint
+        torch.manual_seed(rank + 1)
+        model = transformers.models.gptj.modeling_gptj.GPTJForCausalLM(config).eval()
+        model = ipex.llm.load_checkpoint_mmap(model, checkpoint_dir)
+        num_heads = config.num_attention_heads
+        tp_model = ipex.llm.optimize(model, tp_size=world_size, inplace=True)
+        # the heads are sharded across the ranks
+        assert tp_model.config.num_attention_heads == num_heads // world_size
+        input_ids = torch.ones(10).to(torch.long).unsqueeze(0)
+        input_dict = {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "position_ids": torch.arange(10).unsqueeze(0),
+            "use_cache": True,
+        }
+        with torch.no_grad():
+            ref_out = ref_m(**input_dict)[0]
+            tp_out = tp_model(**input_dict)[0]
+        torch.testing.assert_close(tp_out, ref_out, atol=1e-3, rtol=1e-3)
+    finally:
+        dist.destroy_process_group()
+
+
+def _run_sp_with_gloo(rank, world_size, port, checkpoint_dir):
+    # the prompts of at least 8 tokens are run in sequence parallel
+    os.environ["TP_SEQUENCE_PARALLEL_MIN_TOKENS"] = "8"
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    try:
+        config = AutoConfig.from_pretrained(
+            f"{curpath}/hf_configs/llama", return_dict=False
+        )
+        ref_m = transformers.models.llama.modeling_llama.LlamaForCausalLM(config).eval()
+        ref_m.load_state_dict(torch.load(f"{checkpoint_dir}/model.pt"))
+        model = copy.deepcopy(ref_m)
+        tp_model = ipex.llm.optimize(
+            model, tp_size=world_size, inplace=True, deployment_mode=False
+        )
+        self_attn = tp_model.model.layers[0].self_attn
+        assert self_attn.o_proj.sequence_parallel is not None
+        for seq_len in [11, 4]:
+            input_ids = torch.ones(seq_len).to(torch.long).unsqueeze(0)
+            input_dict = {
+                "input_ids": input_ids,
+                "attention_mask": torch.ones_like(input_ids),
+                "position_ids": torch.arange(seq_len).unsqueeze(0),
+                "use_cache": True,
+            }
+            with torch.no_grad():
+                ref_out = ref_m(**input_dict)[0]
+                tp_out = tp_model(**input_dict)[0]
+            torch.testing.assert_close(tp_out, ref_out, atol=1e-3, rtol=1e-3)
+    finally:
+        dist.destroy_process_group()
+
+
+def _run_ring_attention_with_gloo(rank, world_size, port):
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    try:
+        torch.manual_seed(0)
+        shard_len = 16
+        query = torch.randn(2, 8, shard_len * world_size, 64)
+        key = torch.randn(2, 4, shard_len * world_size, 64)
+        value = torch.randn(2, 4, shard_len * world_size, 64)
+        shard = slice(rank * shard_len, (rank + 1) * shard_len)
+        for is_causal in [True, False]:
+            ref_out = torch.nn.functional.scaled_dot_product_attention(
+                query,
+                key.repeat_interleave(2, dim=1),
+                value.repeat_interleave(2, dim=1),
+                is_causal=is_causal,
+            )
+            out = ipex.llm.functional.ring_attention(
+                query[:, :, shard],
+                key[:, :, shard],
+                value[:, :, shard],
+                is_causal=is_causal,
+            )
+            torch.testing.assert_close(out, ref_out[:, :, shard])
+    finally:
+        dist.destroy_process_group()
+
+
+@unittest.skipIf(has_ccl, "oneccl collectives are used when it is built")
+class TensorParallelGlooTester(TestCase):
+    def _test_tensor_parallel_with_gloo_gptj(self, allreduce_chunks):
+        config = AutoConfig.from_pretrained(
+            f"{curpath}/hf_configs/gptj", return_dict=False
+        )
+        torch.manual_seed(0)
+        model = transformers.models.gptj.modeling_gptj.GPTJForCausalLM(config).eval()
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            torch.save(model.state_dict(), f"{checkpoint_dir}/model.pt")
+            world_size = 2
+            mp.spawn(
+                _run_tp_with_gloo,
+                args=(world_size, port, checkpoint_dir, allreduce_chunks),
+                nprocs=world_size,
+            )
+
+    def test_tensor_parallel_with_gloo_gptj(self):
+        self._test_tensor_parallel_with_gloo_gptj(allreduce_chunks=1)
+
+    def test_tensor_parallel_with_gloo_gptj_allreduce_overlap(self):
+        # the all-reduces of the row-parallel linears are chunked by tokens
+        self._test_tensor_parallel_with_gloo_gptj(allreduce_chunks=2)
+
+    def test_sequence_parallel_with_gloo_llama(self):
+        config = AutoConfig.from_pretrained(
+            f"{curpath}/hf_configs/llama", return_dict=False
+        )
+        torch.manual_seed(0)
+        model = transformers.models.llama.modeling_llama.LlamaForCausalLM(config).eval()
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            torch.save(model.state_dict(), f"{checkpoint_dir}/model.pt")
+            mp.spawn(
+                _run_sp_with_gloo,
+                args=(2, port, checkpoint_dir),
+                nprocs=2,
+            )
+
+    def test_ring_attention_with_gloo(self):
+        for world_size in [2, 3]:
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", 0))
+                port = s.getsockname()[1]
+            mp.spawn(
+                _run_ring_attention_with_gloo,
+                args=(world_size, port),
+                nprocs=world_size,
+            )
+
+
 if __name__ == "__main__":
     test = unittest.main()
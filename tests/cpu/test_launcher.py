@@ -5,11 +5,23 @@ from intel_extension_for_pytorch.cpu.launch import (
     CPUPoolList,
     Launcher,
     DistributedTrainingLauncher,
+    MultiInstancesLauncher,
+    report_metrics,
 )
+from intel_extension_for_pytorch.cpu.launch.supervisor import (
+    METRICS_FILE_ENV,
+    Autoscaler,
+    InstanceSupervisor,
+    aggregate_metrics,
+    read_metrics,
+)
+import argparse
 import os
 from os.path import expanduser
 import glob
 import subprocess
+import sys
+import tempfile
 
 
 class TestLauncher(TestCase):
@@ -715,5 +727,112 @@ class TestLauncher(TestCase):
         self.verify_affinity(cpuinfo.pools_ondemand, ground_truth)
 
 
+class TestSupervisor(TestCase):
+    def test_metrics(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "metrics.jsonl")
+            os.environ[METRICS_FILE_ENV] = path
+            try:
+                report_metrics(throughput=10, latency=2)
+                report_metrics(throughput=20, latency=4)
+            finally:
+                del os.environ[METRICS_FILE_ENV]
+            # no-op without the launcher
+            report_metrics(throughput=100)
+            metrics = read_metrics(path)
+            self.assertEqual(metrics, {"throughput": 15.0, "latency": 3.0})
+            self.assertEqual(read_metrics(os.path.join(tmp, "missing")), None)
+        self.assertEqual(
+            aggregate_metrics([metrics, None, {"throughput": 5.0, "latency": 1.0}]),
+            {"throughput": 20.0, "latency": 2.0},
+        )
+
+    def test_autoscaler(self):
+        autoscaler = Autoscaler(12)
+        self.assertEqual(autoscaler.candidates, [1, 2, 3, 4, 6, 12])
+        self.assertEqual(autoscaler.propose(initial=5), 4)
+        self.assertEqual(autoscaler.propose(initial=6), 6)
+        throughputs = {1: 90, 2: 100, 3: 120, 4: 110, 6: 80, 12: 50}
+        ncores = autoscaler.propose(initial=6)
+        tried = []
+        for _ in range(6):
+            tried.append(ncores)
+            autoscaler.record(ncores, {"throughput": throughputs[ncores]})
+            ncores = autoscaler.propose()
+        self.assertEqual(autoscaler.best(), 3)
+        # climbs down from 6 and stops around the peak
+        self.assertEqual(tried[:4], [6, 4, 3, 2])
+        self.assertNotIn(12, tried)
+
+        autoscaler = Autoscaler(4, latency_constraint=5.0)
+        autoscaler.record(1, {"throughput": 100, "latency": 8.0})
+        autoscaler.record(2, {"throughput": 60, "latency": 4.0})
+        autoscaler.record(4, None)
+        self.assertEqual(autoscaler.best(), 2)
+        autoscaler = Autoscaler(4, objective="latency")
+        autoscaler.record(1, {"throughput": 100, "latency": 8.0})
+        autoscaler.record(2, {"throughput": 60, "latency": 4.0})
+        self.assertEqual(autoscaler.best(), 2)
+
+    def test_restart(self):
+        launcher = Launcher()
+        with tempfile.TemporaryDirectory() as tmp:
+            # the instances fail on their first run only
+            script = (
+                "import os, sys; m = os.path.join(sys.argv[1], sys.argv[2]); "
+                + "e = os.path.exists(m); open(m, 'w').close(); sys.exit(0 if e else 1)"
+            )
+            starts = []
+
+            def start_instance(i):
+                starts.append(i)
+                cmd = [sys.executable, "-c", script, tmp, str(i)]
+                return {"process": subprocess.Popen(cmd), "cmd": " ".join(cmd)}
+
+            supervisor = InstanceSupervisor(launcher, max_restarts=1, poll_interval=0.1)
+            restarts = supervisor.run(start_instance, [0, 1])
+            self.assertEqual(restarts, {0: 1, 1: 1})
+            self.assertEqual(sorted(starts), [0, 0, 1, 1])
+
+            def start_failing(i):
+                cmd = [sys.executable, "-c", "import sys; sys.exit(3)"]
+                return {"process": subprocess.Popen(cmd), "cmd": " ".join(cmd)}
+
+            supervisor = InstanceSupervisor(launcher, max_restarts=2, poll_interval=0.1)
+            with self.assertRaises(subprocess.CalledProcessError):
+                supervisor.run(start_failing, [0])
+
+    def test_restart_discards_metrics_of_crashed_attempt(self):
+        launcher = MultiInstancesLauncher(
+            lscpu_txt=construct_numa_config(1, 4, enable_ht=False, numa_mode=1)
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            # the first attempt reports bogus metrics, then crashes
+            script = (
+                "import os, sys; "
+                + "from intel_extension_for_pytorch.cpu.launch import report_metrics; "
+                + "m = os.path.join(sys.argv[1], 'started'); e = os.path.exists(m); "
+                + "open(m, 'w').close(); "
+                + "report_metrics(throughput=10 if e else 1000, latency=2 if e else 500); "
+                + "sys.exit(0 if e else 1)"
+            )
+
+            def execution_command_builder(environ, metrics_file, **kwargs):
+                cmd = [sys.executable, "-c", script, tmp]
+                env = dict(environ, **{METRICS_FILE_ENV: metrics_file})
+                return {"process": subprocess.Popen(cmd, env=env), "cmd": " ".join(cmd)}
+
+            launcher.execution_command_builder = execution_command_builder
+            args = argparse.Namespace(
+                metrics_dir=tmp,
+                log_file_prefix="run",
+                supervise=True,
+                autoscale_runs=0,
+                max_restarts=1,
+            )
+            metrics = launcher.run_instances(args, None, None, dict(os.environ), [0])
+            self.assertEqual(metrics, [{"throughput": 10.0, "latency": 2.0}])
+
+
 if __name__ == "__main__":
     test = unittest.main()
@@ -172,6 +172,53 @@ class TestMergedEmbedding(TestCase):
                             dense = torch.randn(B, NUM_DIM, dtype=dtype)
                             self._test_inference(m, ref_m, (indices, offsets, dense))
 
+    def test_interaction_inference(self):
+        B = 1029
+        NUM_TABLE = 26
+        NUM_DIM = 128
+        n_features = NUM_TABLE + 1
+        in_features = NUM_DIM + n_features * (n_features - 1) // 2
+        indices = [
+            torch.randint(1000, (B * self.multi_hot[i],)) for i in range(NUM_TABLE)
+        ]
+        for include_last_offset in [True, False]:
+            n_offset = B + 1 if include_last_offset else B
+            offsets = [
+                torch.arange(0, n_offset * self.multi_hot[i], self.multi_hot[i])
+                for i in range(NUM_TABLE)
+            ]
+            for dtype in [torch.float32, torch.bfloat16]:
+                if (
+                    dtype == torch.bfloat16
+                    and not torch.ops.mkldnn._is_mkldnn_bf16_supported()
+                ):
+                    continue
+                # tile_size=None for the default tile, 100 for a partial last tile
+                for tile_size in [None, 100]:
+                    emb_list = EmbeddingBagList(
+                        NUM_TABLE,
+                        NUM_DIM,
+                        dtype,
+                        include_last_offset=include_last_offset,
+                    )
+                    linear = torch.nn.Linear(in_features, 512).to(dtype)
+                    m = ipex.nn.modules.MergedEmbeddingBagWithInteraction.from_embeddingbag_list(
+                        emb_list.list, linear, tile_size=tile_size
+                    )
+                    dense = torch.randn(B, NUM_DIM, dtype=dtype)
+                    with torch.no_grad():
+                        # the unfused path
+                        ly = emb_list(indices, offsets)
+                        R = ipex.nn.functional.interaction(*([dense] + ly))
+                        ref_out = linear(R)
+                        out = m(indices, offsets, dense)
+                    if dtype == torch.bfloat16:
+                        # the interaction features are accumulated in a
+                        # different order and rounded at different places
+                        self.assertEqual(out, ref_out, atol=0.5, rtol=0.05)
+                    else:
+                        self.assertEqual(out, ref_out, atol=1e-3, rtol=1e-4)
+
     def test_training(self):
         B = 1029
         NUM_TABLE = 26
@@ -454,6 +454,90 @@ class TestOptimizers(TestCase):
         scaler.update()
         assert scaler._scale != float("inf") and scaler._scale != float("nan")
 
+    def test_flat_fused_step(self):
+        model = torch.nn.Sequential(
+            torch.nn.Linear(10, 20),
+            torch.nn.LayerNorm(20),
+            torch.nn.Linear(20, 5),
+        )
+        make_optimizers = [
+            lambda params: torch.optim.SGD(params, lr=0.01, momentum=0.9),
+            lambda params: torch.optim.SGD(params, lr=0.01, weight_decay=0.1),
+            lambda params: torch.optim.Adam(params, lr=0.01, amsgrad=True),
+            lambda params: torch.optim.Adagrad(params, lr=0.01, lr_decay=0.1),
+        ]
+        x = torch.randn(4, 10)
+        for dtype, make_optimizer, weights_prepack in itertools.product(
+            [d for d in dtypes if d != torch.float16], make_optimizers, [True, False]
+        ):
+            results = []
+            for fuse_update_step in [None, True]:
+                m = copy.deepcopy(model)
+                ipex_m, ipex_opt = ipex.optimize(
+                    m,
+                    dtype=dtype,
+                    optimizer=make_optimizer(m.parameters()),
+                    weights_prepack=weights_prepack,
+                    fuse_update_step=fuse_update_step,
+                )
+                for i in range(3):
+                    if i == 2:
+                        # the params are flattened again after load_state_dict
+                        ipex_opt.load_state_dict(ipex_opt.state_dict())
+                    with torch.cpu.amp.autocast(enabled=True, dtype=dtype):
+                        y = ipex_m(x).sum()
+                    ipex_opt.zero_grad()
+                    y.backward()
+                    ipex_opt.step()
+                results.append((ipex_m.state_dict(), ipex_opt.state_dict()))
+                if fuse_update_step:
+                    flat_group = ipex_opt._flat_groups[0]
+                    self.assertTrue(len(flat_group.buckets) > 0)
+                    num_flat_params = sum(len(b.params) for b in flat_group.buckets)
+                    self.assertEqual(
+                        num_flat_params,
+                        2 if weights_prepack else len(list(model.parameters())),
+                    )
+            (ref_model_state, ref_state), (model_state, state) = results
+            self.assertEqual(ref_model_state, model_state)
+            self.assertEqual(ref_state["state"], state["state"])
+
+    @unittest.skipIf(
+        not core.onednn_has_bf16_support(),
+        "ipex bf16 training requires the cpu support for bf16",
+    )
+    def test_bf16_stochastic_rounding(self):
+        make_optimizers = [
+            lambda params: torch.optim.SGD(params, lr=2**-10),
+            lambda params: torch.optim.Adam(params, lr=2**-10),
+        ]
+        for make_optimizer, fuse_update_step in itertools.product(
+            make_optimizers, [None, True]
+        ):
+            model = torch.nn.Linear(256, 256, bias=False)
+            torch.nn.init.constant_(model.weight, 1.5)
+            ipex_model, ipex_opt = ipex.optimize(
+                model,
+                dtype=torch.bfloat16,
+                optimizer=make_optimizer(model.parameters()),
+                weights_prepack=False,
+                fuse_update_step=fuse_update_step,
+                bf16_stochastic_rounding=True,
+            )
+            weight = ipex_model.weight
+            self.assertEqual(weight.dtype, torch.bfloat16)
+            self.assertTrue(ipex_opt.params_attr[weight].parameter_trail is None)
+            for i in range(2):
+                weight.grad = torch.ones_like(weight)
+                ipex_opt.step()
+            # the updates are 1/8 of the bf16 precision at 1.5, they would be
+            # lost by rounding to nearest
+            self.assertTrue((weight < 1.5).any())
+            self.assertEqual(weight.float().mean(), 1.5 - 2 * 2**-10, atol=1e-4, rtol=0)
+            self.assertEqual(
+                ipex_model.state_dict()["weight"], weight.float(), atol=0, rtol=0
+            )
+
 
 class TestFusedSteps(TestCase):
     def test_lamb_step(self):
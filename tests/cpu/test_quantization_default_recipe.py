@@ -1,4 +1,5 @@
 import itertools
+import json
 import tempfile
 import torch
 import torch.nn as nn
@@ -231,6 +232,161 @@ class TestDefaultRecipe(JitLlgaTestCase):
                 prepared_model(torch.rand(4, 4))
             assert check_model_obsever_has_run(prepared_model)
 
+    def test_binary_qconf_summary(self):
+        class M(nn.Module):
+            def __init__(self):
+                super(M, self).__init__()
+                self.linear1 = nn.Linear(16, 8)
+                self.linear2 = nn.Linear(8, 4)
+
+            def forward(self, x):
+                return self.linear2(self.linear1(x).relu())
+
+        m = M().eval()
+        x = torch.rand(2, 16)
+        qconfig_mappings = [
+            ipex.quantization.default_static_qconfig_mapping,
+            ipex.quantization.get_smooth_quant_qconfig_mapping(),
+        ]
+        for qconfig_mapping in qconfig_mappings:
+            prepared_model = prepare(copy.deepcopy(m), qconfig_mapping, x)
+            prepared_model(x)
+            with tempfile.TemporaryDirectory() as tmp:
+                json_file = os.path.join(tmp, "configure.json")
+                binary_file = os.path.join(tmp, "configure.qconf")
+                prepared_model.save_qconf_summary(json_file)
+                prepared_model.save_qconf_summary(binary_file, binary=True)
+                self.assertLess(
+                    os.path.getsize(binary_file), os.path.getsize(json_file)
+                )
+                ref_out = convert(prepared_model)(x)
+                for qconf_file in [json_file, binary_file]:
+                    loaded_model = prepare(copy.deepcopy(m), qconfig_mapping, x)
+                    loaded_model.load_qconf_summary(qconf_file)
+                    self.assertEqual(convert(loaded_model)(x), ref_out)
+                # The json export of a model loaded from a binary file is
+                # the same as the original one
+                json_file2 = os.path.join(tmp, "configure2.json")
+                loaded_model.save_qconf_summary(json_file2)
+                with open(json_file) as f1, open(json_file2) as f2:
+                    self.assertEqual(json.load(f1), json.load(f2))
+
+    def test_calibrate(self):
+        class M(nn.Module):
+            def __init__(self):
+                super(M, self).__init__()
+                self.linear1 = nn.Linear(8, 8)
+                self.linear2 = nn.Linear(8, 4)
+
+            def forward(self, x):
+                return self.linear2(torch.relu(self.linear1(x)))
+
+        m = M().eval()
+        x = torch.rand(2, 8)
+        batches = [torch.randn(2, 8) * (i + 1) for i in range(6)]
+        qconfig_mapping = ipex.quantization.default_static_qconfig_mapping
+        ref_model = prepare(copy.deepcopy(m), qconfig_mapping, x)
+        for batch in batches:
+            ref_model(batch)
+        ref_out = convert(ref_model)(x)
+        for num_workers, histogram_batches in [(1, 3), (2, 1), (3, 2)]:
+            prepared_model = prepare(copy.deepcopy(m), qconfig_mapping, x)
+            ipex.quantization.calibrate(
+                prepared_model,
+                batches,
+                num_workers=num_workers,
+                histogram_batches=histogram_batches,
+            )
+            self.assertTrue(
+                ipex.quantization._utils.check_model_obsever_has_run(prepared_model)
+            )
+            self.assertEqual(convert(prepared_model)(x), ref_out, rtol=0.05, atol=0.05)
+
+        # max_batches and run_fn
+        prepared_model = prepare(copy.deepcopy(m), qconfig_mapping, x)
+        ipex.quantization.calibrate(
+            prepared_model,
+            [(batch, None) for batch in batches],
+            max_batches=1,
+            run_fn=lambda model, batch: model(batch[0]),
+        )
+        ref_model = prepare(copy.deepcopy(m), qconfig_mapping, x)
+        ref_model(batches[0])
+        self.assertEqual(convert(prepared_model)(x), convert(ref_model)(x))
+
+        # The workers are forked after OpenMP ran with several threads in the
+        # current process, they must run without OpenMP to not hang
+        num_threads = torch.get_num_threads()
+        pid = os.getpid()
+
+        def run_fn(model, batch):
+            assert os.getpid() == pid or torch.get_num_threads() == 1
+            model(batch)
+
+        try:
+            torch.set_num_threads(4)
+            prepared_model = prepare(copy.deepcopy(m), qconfig_mapping, x)
+            prepared_model(torch.randn(256, 8))
+            ipex.quantization.calibrate(
+                prepared_model, batches * 4, num_workers=2, run_fn=run_fn
+            )
+            self.assertEqual(torch.get_num_threads(), 4)
+        finally:
+            torch.set_num_threads(num_threads)
+        self.assertTrue(
+            ipex.quantization._utils.check_model_obsever_has_run(prepared_model)
+        )
+
+    def test_autotune_ipex_backend(self):
+        class M(nn.Module):
+            def __init__(self):
+                super(M, self).__init__()
+                self.linear1 = nn.Linear(16, 16)
+                self.linear2 = nn.Linear(16, 4)
+
+            def forward(self, x):
+                return self.linear2(self.linear1(x).relu())
+
+        calib_dataloader = [(torch.randn(4, 16), torch.zeros(4)) for _ in range(4)]
+
+        # The int8 model meets the criterion, nothing falls back
+        prepared_model = ipex.quantization.autotune(
+            M().eval(),
+            calib_dataloader,
+            eval_func=lambda model: 1.0,
+            backend="ipex",
+        )
+        self.assertEqual(len(prepared_model.tuning_results), 1)
+        self.assertEqual(prepared_model.tuning_results[0]["fallback_ops"], [])
+        self.assertGreater(prepared_model.tuning_results[0]["throughput"], 0)
+
+        # The fp32 model and the candidate with one fallback op are accurate
+        accuracies = iter([1.0, 0.0, 1.0])
+        prepared_model = ipex.quantization.autotune(
+            M().eval(),
+            calib_dataloader,
+            eval_func=lambda model: next(accuracies),
+            backend="ipex",
+        )
+        self.assertEqual(len(prepared_model.tuning_results), 2)
+        self.assertEqual(len(prepared_model.tuning_results[1]["fallback_ops"]), 1)
+        quantized_ops = ipex.quantization._recipe.get_quantized_ops(
+            prepared_model._fqn_to_auto_quant_state_map
+        )
+        self.assertEqual(len(quantized_ops), 1)
+        x = torch.randn(4, 16)
+        convert(prepared_model)(x)
+
+        # Linear ops are forced to fp32
+        prepared_model = ipex.quantization.autotune(
+            M().eval(),
+            calib_dataloader,
+            eval_func=lambda model: 1.0,
+            op_type_dict={"Linear": {"activation": {"dtype": ["fp32"]}}},
+            backend="ipex",
+        )
+        self.assertEqual(len(prepared_model.tuning_results[0]["fallback_ops"]), 2)
+
     def test_none_example_input_for_quantization(self):
         class M(nn.Module):
             def __init__(self):
@@ -4,8 +4,10 @@ import intel_extension_for_pytorch as ipex
 from common_utils import TestCase
 
 from common_ipex_conf import runtime_thread_affinity_test_env
+from utils.cpuinfo import construct_numa_config
 import subprocess
 import os
+import types
 
 
 class SimpleNet(torch.nn.Module):
@@ -98,6 +100,138 @@ class TestCPUPool(TestCase):
         self.assertEqual(cpu_pool.cpu_pool.get_core_list(), core_list)
 
 
+class TestCPUTopology(TestCase):
+    # 2 numa nodes, 2 L3 domains on node 0, with hyper-threading
+    lscpu_txt = """CPU NODE SOCKET CORE L1d:L1i:L2:L3 ONLINE MAXMHZ MINMHZ MHZ
+0 0 0 0 0:0:0:0 yes 5000.0 800.0 2400.0
+1 0 0 1 1:1:1:0 yes 5000.0 800.0 2400.0
+2 0 0 2 2:2:2:1 yes 5000.0 800.0 2400.0
+3 0 0 3 3:3:3:1 yes 5000.0 800.0 2400.0
+4 1 1 4 4:4:4:2 yes 5000.0 800.0 2400.0
+5 1 1 5 5:5:5:2 yes 5000.0 800.0 2400.0
+6 0 0 0 0:0:0:0 yes 5000.0 800.0 2400.0
+7 0 0 1 1:1:1:0 yes 5000.0 800.0 2400.0
+8 0 0 2 2:2:2:1 yes 5000.0 800.0 2400.0
+9 0 0 3 3:3:3:1 yes 5000.0 800.0 2400.0
+10 1 1 4 4:4:4:2 yes 5000.0 800.0 2400.0
+11 1 1 5 5:5:5:2 yes 5000.0 800.0 2400.0"""
+
+    def test_core_lists(self):
+        get_core_lists = ipex.cpu.runtime.get_core_lists
+        self.assertEqual(
+            get_core_lists("all", lscpu_txt=self.lscpu_txt), [[0, 1, 2, 3, 4, 5]]
+        )
+        self.assertEqual(
+            get_core_lists("numa", lscpu_txt=self.lscpu_txt), [[0, 1, 2, 3], [4, 5]]
+        )
+        self.assertEqual(
+            get_core_lists("l3", lscpu_txt=self.lscpu_txt), [[0, 1], [2, 3], [4, 5]]
+        )
+        self.assertEqual(
+            get_core_lists("numa", use_logical_cores=True, lscpu_txt=self.lscpu_txt),
+            [[0, 1, 2, 3, 6, 7, 8, 9], [4, 5, 10, 11]],
+        )
+        self.assertEqual(
+            get_core_lists("numa", nodes_list=[1], lscpu_txt=self.lscpu_txt),
+            [[4, 5]],
+        )
+        self.assertEqual(
+            ipex.cpu.runtime.get_node_ids_of_cores([1, 11], lscpu_txt=self.lscpu_txt),
+            [0, 1],
+        )
+
+    def test_core_lists_e_cores(self):
+        get_core_lists = ipex.cpu.runtime.get_core_lists
+        lscpu_txt = construct_numa_config(
+            1, 8, enable_ht=True, n_e_cores=8, numa_mode=0
+        )
+        # lscpu_txt without L3 ids falls back to numa
+        self.assertEqual(get_core_lists("l3", lscpu_txt=lscpu_txt), [list(range(0, 8))])
+        self.assertEqual(
+            get_core_lists("numa", use_e_cores=True, lscpu_txt=lscpu_txt),
+            [list(range(0, 8)) + list(range(16, 24))],
+        )
+
+    @unittest.skipIf(
+        not ipex.cpu.runtime.is_runtime_ext_enabled(),
+        "Skip when IPEX Runtime extension is not enabled",
+    )
+    @runtime_thread_affinity_test_env
+    def test_pin_cpu_pools(self):
+        model = SimpleNet()
+        model.eval()
+        x = torch.rand(64, 64, 3, 3)
+        y = model(x)
+        for cpu_pool in ipex.cpu.runtime.get_cpu_pools(policy="numa"):
+            self.assertEqual(
+                cpu_pool.mem_node_ids,
+                ipex.cpu.runtime.get_node_ids_of_cores(cpu_pool.core_ids),
+            )
+            with ipex.cpu.runtime.pin(cpu_pool):
+                y_runtime = model(x)
+            self.assertEqual(y, y_runtime)
+
+
+class TinyCausalLM(torch.nn.Module):
+    def __init__(self, vocab_size=32, hidden_size=16, num_layers=4):
+        super(TinyCausalLM, self).__init__()
+        self.model = torch.nn.Module()
+        self.model.embed_tokens = torch.nn.Embedding(vocab_size, hidden_size)
+        self.model.layers = torch.nn.ModuleList(
+            [torch.nn.Linear(hidden_size, hidden_size) for _ in range(num_layers)]
+        )
+        self.lm_head = torch.nn.Linear(hidden_size, vocab_size)
+        self.generation_config = types.SimpleNamespace(
+            pad_token_id=0, eos_token_id=None
+        )
+
+    def get_input_embeddings(self):
+        return self.model.embed_tokens
+
+    def get_output_embeddings(self):
+        return self.lm_head
+
+    def forward(self, input_ids):
+        h = self.model.embed_tokens(input_ids)
+        for layer in self.model.layers:
+            h = torch.relu(layer(h))
+        return self.lm_head(h)
+
+    def generate(self, input_ids, max_new_tokens=4):
+        # the state of a generation, as the caches of transformers
+        self.batch_size = input_ids.size(0)
+        for _ in range(max_new_tokens):
+            next_token = self(input_ids)[:, -1].argmax(-1, keepdim=True)
+            assert self.batch_size == input_ids.size(0)
+            input_ids = torch.cat([input_ids, next_token], dim=-1)
+        return input_ids
+
+
+class TestPipelineParallel(TestCase):
+    @unittest.skipIf(
+        not ipex.cpu.runtime.is_runtime_ext_enabled(),
+        "Skip when IPEX Runtime extension is not enabled",
+    )
+    @runtime_thread_affinity_test_env
+    def test_pipeline_parallel_generate(self):
+        model = TinyCausalLM().eval()
+        input_ids = torch.randint(1, 32, (5, 6))
+        with torch.no_grad():
+            y = model(input_ids)
+            tokens = model.generate(input_ids)
+        cpu_pools = [ipex.cpu.runtime.CPUPool(core_ids=[0]) for _ in range(2)]
+        pp_model = ipex.transformers.enable_pipeline_parallel(
+            model, cpu_pools=cpu_pools, num_micro_batches=3
+        )
+        self.assertEqual(len(pp_model.pipeline_stages), 2)
+        with torch.no_grad():
+            self.assertEqual(pp_model(input_ids), y)
+            self.assertEqual(pp_model.generate(input_ids), tokens)
+        for stage in pp_model.pipeline_stages:
+            stage.shutdown()
+            self.assertIsNone(stage.pin_context)
+
+
 class TestCoreBinding(TestCase):
     @unittest.skipIf(
         not ipex.cpu.runtime.is_runtime_ext_enabled(),
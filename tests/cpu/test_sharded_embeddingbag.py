@@ -0,0 +1,145 @@
+import copy
+import os
+import unittest
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.testing._internal.common_utils import TestCase
+
+import intel_extension_for_pytorch as ipex
+from intel_extension_for_pytorch.nn.modules import (
+    ShardedEmbeddingBag,
+    ShardingType,
+    TableShardingPlan,
+    plan_embedding_sharding,
+    pooling_factors_from_batch,
+)
+from intel_extension_for_pytorch.nn.modules.merged_embeddingbag import EmbeddingSpec
+
+try:
+    import oneccl_bindings_for_pytorch  # noqa: F401
+
+    HAS_TORCHCCL = True
+except (ImportError, RuntimeError):
+    HAS_TORCHCCL = False
+
+# gloo is used as a stand-in for ccl so that the all-to-all exchange can be
+# checked on a single box
+BACKEND = "ccl" if HAS_TORCHCCL else "gloo"
+WORLD_SIZE = 2
+NUM_DIM = 16
+BS = 8  # BS % WORLD_SIZE == 0
+
+
+def _spec(num_embeddings, embedding_dim=NUM_DIM, dtype=torch.float):
+    return EmbeddingSpec(
+        num_embeddings=num_embeddings,
+        embedding_dim=embedding_dim,
+        pooling_mode="sum",
+        dtype=dtype,
+        weight=None,
+        sparse=False,
+        include_last_offset=False,
+    )
+
+
+def _inputs(tables, multi_hot):
+    torch.manual_seed(0)
+    indices = [
+        torch.randint(emb.num_embeddings, (BS * n,))
+        for emb, n in zip(tables, multi_hot)
+    ]
+    offsets = [torch.arange(0, BS * n, n) for n in multi_hot]
+    return indices, offsets
+
+
+def _run_sharded(rank, mode, plan, port):
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    ipex.distributed.init_process_group(BACKEND, world_size=WORLD_SIZE, rank=rank)
+    torch.manual_seed(0)
+    tables = [torch.nn.EmbeddingBag(n, NUM_DIM, mode=mode) for n in (64, 32, 16, 8)]
+    multi_hot = [3, 1, 5, 2]
+    indices, offsets = _inputs(tables, multi_hot)
+
+    ref_tables = copy.deepcopy(tables)
+    ref_out = torch.stack(
+        [emb(i, o) for emb, i, o in zip(ref_tables, indices, offsets)], dim=1
+    )
+    local_bs = BS // WORLD_SIZE
+    ref_out[rank * local_bs : (rank + 1) * local_bs].sum().backward()
+
+    sharded = ShardedEmbeddingBag.from_embeddingbag_list(tables, plan=plan)
+    out = sharded(indices, offsets)
+    torch.testing.assert_close(out, ref_out[rank * local_bs : (rank + 1) * local_bs])
+
+    # every rank computes the grads of its own batch slice, summing the
+    # gradients of all ranks gives the grads of the global batch
+    out.sum().backward()
+    for i, table_plan in enumerate(sharded.plan):
+        ref_grad = ref_tables[i].weight.grad.clone()
+        dist.all_reduce(ref_grad)
+        if sharded._shard_index[i] is None:
+            continue
+        grad = sharded.weights[sharded._shard_index[i]].grad
+        if table_plan.sharding_type == ShardingType.ROW_WISE:
+            start, end = sharded._shard_range[i]
+            ref_grad = ref_grad[start:end]
+        elif table_plan.sharding_type == ShardingType.COLUMN_WISE:
+            start, end = sharded._shard_range[i]
+            ref_grad = ref_grad[:, start:end]
+        torch.testing.assert_close(grad, ref_grad)
+    dist.destroy_process_group()
+
+
+class ShardedEmbeddingBagTester(TestCase):
+    def test_plan(self):
+        specs = [_spec(100000), _spec(100), _spec(100, 256), _spec(50), _spec(60)]
+        plan = plan_embedding_sharding(
+            specs, world_size=4, pooling_factors=[1, 1, 40, 1, 1]
+        )
+        # the big table is row-wise, the hot wide table is column-wise
+        self.assertEqual(plan[0].sharding_type, ShardingType.ROW_WISE)
+        self.assertEqual(sum(plan[0].shard_sizes), 100000)
+        self.assertEqual(plan[2].sharding_type, ShardingType.COLUMN_WISE)
+        self.assertEqual(sum(plan[2].shard_sizes), 256)
+        # the small tables are spread over different ranks
+        table_wise = [p for p in plan if p.sharding_type == ShardingType.TABLE_WISE]
+        self.assertEqual(len(table_wise), 3)
+        self.assertEqual(len({p.ranks[0] for p in table_wise}), 3)
+
+        plan = plan_embedding_sharding(specs, world_size=1)
+        self.assertTrue(
+            all(
+                p == TableShardingPlan(ShardingType.TABLE_WISE, [0], [s.num_embeddings])
+                for p, s in zip(plan, specs)
+            )
+        )
+
+    def test_pooling_factors(self):
+        indices = [torch.arange(6), torch.arange(2)]
+        offsets = [torch.tensor([0, 3]), torch.tensor([0, 1])]
+        self.assertEqual(pooling_factors_from_batch(indices, offsets), [3.0, 1.0])
+
+    def test_sharded_lookup(self):
+        plans = [
+            None,
+            [
+                TableShardingPlan(ShardingType.ROW_WISE, [0, 1], [40, 24]),
+                TableShardingPlan(ShardingType.TABLE_WISE, [1], [32]),
+                TableShardingPlan(ShardingType.COLUMN_WISE, [0, 1], [10, 6]),
+                TableShardingPlan(ShardingType.TABLE_WISE, [1], [8]),
+            ],
+        ]
+        port = 29600
+        for mode in ["sum", "mean"]:
+            for plan in plans:
+                port += 1
+                mp.spawn(
+                    _run_sharded, args=(mode, plan, port), nprocs=WORLD_SIZE, join=True
+                )
+
+
+if __name__ == "__main__":
+    test = unittest.main()
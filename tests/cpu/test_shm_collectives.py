@@ -0,0 +1,135 @@
+import unittest
+import os
+import socket
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import intel_extension_for_pytorch as ipex
+from torch.distributed import ReduceOp
+from common_utils import TestCase
+
+
+def _run_shm_collectives(rank, world_size, port, buf_size):
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    # small buffers to run the collectives by chunks
+    os.environ["IPEX_SHM_BUF_SIZE"] = str(buf_size)
+    ipex.distributed.init_process_group(
+        ipex.distributed.SHM_BACKEND, rank=rank, world_size=world_size
+    )
+    try:
+        assert isinstance(
+            dist.distributed_c10d._get_default_group(),
+            ipex.distributed.ProcessGroupSHM,
+        )
+        torch.manual_seed(0)
+        for dtype in [torch.float, torch.bfloat16, torch.int64]:
+            inputs = (torch.randn(world_size, 1000) * 10).to(dtype)
+            x = inputs[rank].clone()
+            for op, ref in [
+                (ReduceOp.SUM, inputs.float().sum(0)),
+                (ReduceOp.MAX, inputs.float().amax(0)),
+            ]:
+                y = x.clone()
+                ipex.distributed.all_reduce(y, op=op)
+                torch.testing.assert_close(y, ref.to(dtype), rtol=1e-2, atol=1e-1)
+
+            out = torch.empty(1000 // world_size * world_size, dtype=dtype)
+            ipex.distributed.all_gather_into_tensor(
+                out, x[: 1000 // world_size].clone()
+            )
+            torch.testing.assert_close(out, inputs[:, : 1000 // world_size].reshape(-1))
+
+            shard = torch.empty(1000 // world_size, dtype=dtype)
+            numel = shard.numel() * world_size
+            ipex.distributed.reduce_scatter_tensor(shard, x[:numel].clone())
+            torch.testing.assert_close(
+                shard,
+                inputs[:, :numel].float().sum(0).view(world_size, -1)[rank].to(dtype),
+                rtol=1e-2,
+                atol=1e-1,
+            )
+
+            y = x.clone()
+            ipex.distributed.broadcast(y, src=world_size - 1)
+            torch.testing.assert_close(y, inputs[-1])
+
+            # rank r sends r + d + 1 rows to rank d
+            input = torch.cat(
+                [
+                    torch.full((rank + d + 1, 2), 10 * rank + d)
+                    for d in range(world_size)
+                ]
+            ).to(dtype)
+            output = torch.empty(
+                sum(r + rank + 1 for r in range(world_size)), 2, dtype=dtype
+            )
+            ipex.distributed.all_to_all_single(
+                output,
+                input,
+                [r + rank + 1 for r in range(world_size)],
+                [rank + d + 1 for d in range(world_size)],
+            )
+            ref = torch.cat(
+                [
+                    torch.full((r + rank + 1, 2), 10 * r + rank)
+                    for r in range(world_size)
+                ]
+            ).to(dtype)
+            torch.testing.assert_close(output, ref)
+
+        # ReduceOp.AVG is only supported on the floating point types
+        y = torch.full((10,), float(rank))
+        ipex.distributed.all_reduce(y, op=ReduceOp.AVG)
+        torch.testing.assert_close(y, torch.full((10,), (world_size - 1) / 2))
+        try:
+            ipex.distributed.all_reduce(
+                torch.ones(10, dtype=torch.int64), op=ReduceOp.AVG
+            )
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("ReduceOp.AVG on int64 tensors should fail")
+
+        # the async all-reduces complete in order
+        tensors = [torch.full((3000,), float(rank + i)) for i in range(4)]
+        works = [dist.all_reduce(t, async_op=True) for t in tensors]
+        for i, (t, work) in enumerate(zip(tensors, works)):
+            work.wait()
+            torch.testing.assert_close(
+                t, torch.full((3000,), float(sum(range(world_size)) + world_size * i))
+            )
+
+        # DDP all-reduces the gradient buckets
+        torch.manual_seed(0)
+        model = torch.nn.Sequential(torch.nn.Linear(64, 256), torch.nn.Linear(256, 8))
+        ddp_model = torch.nn.parallel.DistributedDataParallel(
+            torch.nn.Sequential(torch.nn.Linear(64, 256), torch.nn.Linear(256, 8)),
+            bucket_cap_mb=0.01,
+        )
+        ddp_model.module.load_state_dict(model.state_dict())
+        data = torch.randn(world_size * 4, 64)
+        model(data).sum().backward()
+        ddp_model(data[rank * 4 : (rank + 1) * 4]).sum().backward()
+        for p, ref_p in zip(ddp_model.parameters(), model.parameters()):
+            torch.testing.assert_close(p.grad, ref_p.grad / world_size)
+        dist.barrier()
+    finally:
+        dist.destroy_process_group()
+
+
+class SHMCollectivesTester(TestCase):
+    def test_shm_collectives(self):
+        for world_size, buf_size in [(2, 16 * 1024 * 1024), (3, 1024)]:
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", 0))
+                port = s.getsockname()[1]
+            mp.spawn(
+                _run_shm_collectives,
+                args=(world_size, port, buf_size),
+                nprocs=world_size,
+            )
+
+
+if __name__ == "__main__":
+    test = unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import os
+import socket
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import intel_extension_for_pytorch as ipex  # noqa
+from intel_extension_for_pytorch.cpu.tpp.optim import DistLamb
+from common_utils import TestCase
+
+
+class Net(torch.nn.Module):
+    def __init__(self):
+        super(Net, self).__init__()
+        self.fc1 = torch.nn.Linear(64, 512)
+        self.fc2 = torch.nn.Linear(512, 32)
+        # not used by the forward, its bucket is all-reduced by step
+        self.unused = torch.nn.Linear(4, 4)
+
+    def forward(self, x):
+        return self.fc2(torch.relu(self.fc1(x)))
+
+
+def _run_dist_lamb_with_gloo(rank, world_size, port):
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    try:
+        for fused_param_norm in [True, False]:
+            torch.manual_seed(0)
+            ref_model = Net()
+            model = Net()
+            model.load_state_dict(ref_model.state_dict())
+            kwargs = {
+                "lr": 1e-2,
+                "weight_decay": 0.01,
+                "block_size": 64,
+                "fused_param_norm": fused_param_norm,
+            }
+            ref_opt = DistLamb(ref_model.parameters(), perform_allreduce=True, **kwargs)
+            opt = DistLamb(
+                model.parameters(),
+                overlap_allreduce=True,
+                bucket_size_mb=0.01,
+                shard_states=True,
+                **kwargs,
+            )
+            torch.manual_seed(rank)
+            for i in range(3):
+                inputs = [torch.randn(8, 64) for _ in range(2)]
+                ref_model(inputs[0]).sum().backward()
+                model(inputs[0]).sum().backward()
+                if i == 1:
+                    # gradient accumulation
+                    ref_opt.acc_and_zero_grad()
+                    opt.acc_and_zero_grad()
+                    ref_model(inputs[1]).sum().backward()
+                    model(inputs[1]).sum().backward()
+                ref_opt.step()
+                opt.step()
+                ref_opt.zero_grad()
+                opt.zero_grad()
+            # the moments are sharded and the gradients are bucketed
+            flat_param = opt.flat_params[0]
+            assert flat_param._flat_m.numel() * world_size == flat_param._flat_w.numel()
+            assert len(opt._buckets) > 1
+            for ref_p, p in zip(ref_model.parameters(), model.parameters()):
+                torch.testing.assert_close(p, ref_p, rtol=1e-4, atol=1e-5)
+    finally:
+        dist.destroy_process_group()
+
+
+class DistLambTester(TestCase):
+    def test_dist_lamb_overlap_and_sharded_states_with_gloo(self):
+        for world_size in [2, 3]:
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", 0))
+                port = s.getsockname()[1]
+            mp.spawn(
+                _run_dist_lamb_with_gloo,
+                args=(world_size, port),
+                nprocs=world_size,
+            )
+
+
+if __name__ == "__main__":
+    test = unittest.main()
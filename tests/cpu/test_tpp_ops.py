@@ -1,4 +1,5 @@
 import unittest
+import copy
 import torch
 import random
 import numpy
@@ -74,7 +75,12 @@ class TPPOPsTester(TestCase):
         hf_loss.backward()
         tpp_loss.backward()
         for param_hf, param_tpp in zip(hf_model.parameters(), tpp_model.parameters()):
-            if param_tpp.is_blocked():
+            if (
+                isinstance(
+                    param_tpp, ipex.cpu.tpp.utils.blocked_layout.BlockedParameter
+                )
+                and param_tpp.is_blocked()
+            ):
                 self.assertEqual(
                     param_hf.grad, self._unblock_grad(param_tpp), prec=prec
                 )
@@ -186,6 +192,188 @@ class TPPOPsTester(TestCase):
             hf_res, tpp_res, hf_intermediate, tpp_intermediate, prec=0.01
         )
 
+    def test_tpp_bert_packed_self_attention(self):
+        hf_self_att = transformers.models.bert.modeling_bert.BertSelfAttention(
+            self.config
+        )
+        tpp_self_att = ipex.cpu.tpp.fused_bert.BertSelfAttention(self.config)
+        tpp_self_att.load_state_dict(hf_self_att.state_dict())
+        lengths = [200, 30, 100, 64, 150, 90, 5]
+        dataset = [{"input_ids": torch.randint(100, 3000, (n,))} for n in lengths]
+        packed_dataset = ipex.cpu.tpp.PackedSequenceDataset(dataset, self.max_seq_len)
+        self.assertEqual(
+            sorted(sum(packed_dataset.rows, [])), list(range(len(lengths)))
+        )
+        batch = torch.utils.data.default_collate(
+            [packed_dataset[i] for i in range(len(packed_dataset))]
+        )
+        self.assertLess(len(packed_dataset), len(lengths))
+        attention_mask = (1.0 - batch["attention_mask"].float()) * -10000.0
+        attention_mask = attention_mask.unsqueeze(dim=1).unsqueeze(dim=1)
+        hidden_states = torch.randn(
+            len(packed_dataset), self.max_seq_len, self.config.hidden_size
+        )
+        msk, tpp_att_mask, seq_offsets, seq_sqr_offsets = (
+            ipex.cpu.tpp.fused_bert.generate_mask(attention_mask, batch["position_ids"])
+        )
+        tpp_res = tpp_self_att(
+            ipex.cpu.tpp.fused_bert.UnpadInput.apply(hidden_states, msk),
+            tpp_att_mask,
+            seq_offsets=seq_offsets,
+            seq_sqr_offsets=seq_sqr_offsets,
+        )[0].unblocked_tensor()
+        tpp_res = ipex.cpu.tpp.fused_bert.PadInput.apply(
+            tpp_res, msk, hidden_states.shape
+        )
+        # the sequences of a row attend to themselves only
+        for row, indices in enumerate(packed_dataset.rows):
+            start = 0
+            for i in indices:
+                end = start + lengths[i]
+                hf_res = hf_self_att(hidden_states[row : row + 1, start:end])[0]
+                self.assertEqual(hf_res, tpp_res[row : row + 1, start:end], prec=0.0002)
+                start = end
+
+    def test_tpp_bert_packed_position_ids(self):
+        config = transformers.BertConfig(
+            vocab_size=1000,
+            hidden_size=256,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            intermediate_size=1024,
+            max_position_embeddings=128,
+            hidden_dropout_prob=0.0,
+            attention_probs_dropout_prob=0.0,
+            attn_implementation="eager",
+        )
+        model = transformers.BertModel(config).eval()
+        tpp_model = ipex.fast_bert(model)
+        lengths = [70, 40, 18]
+        input_ids = torch.randint(5, 1000, (1, 128))
+        position_ids = torch.cat([torch.arange(n) for n in lengths]).unsqueeze(0)
+        attention_mask = torch.ones(1, 128, dtype=torch.long)
+        tpp_res = tpp_model(
+            input_ids, attention_mask=attention_mask, position_ids=position_ids
+        ).last_hidden_state
+        start = 0
+        for n in lengths:
+            hf_res = model(input_ids[:, start : start + n]).last_hidden_state
+            self.assertEqual(hf_res, tpp_res[:, start : start + n], prec=0.0002)
+            start += n
+        # the positions of the embeddings don't leak into other encoder calls
+        tpp_model.embeddings(input_ids, position_ids=position_ids)
+        hidden_states = torch.randn(1, 128, config.hidden_size)
+        extended_mask = torch.zeros(1, 1, 1, 128)
+        hf_res = model.encoder(hidden_states, extended_mask).last_hidden_state
+        tpp_res = tpp_model.encoder(hidden_states, extended_mask).last_hidden_state
+        self.assertEqual(hf_res, tpp_res, prec=0.0002)
+
+    def test_tpp_encoder_layers(self):
+        for hf_config, num_tpp_modules in [
+            (transformers.ViTConfig, 2),
+            (transformers.DebertaV2Config, 3),
+        ]:
+            config = hf_config(
+                hidden_size=256,
+                num_attention_heads=4,
+                intermediate_size=1024,
+                hidden_dropout_prob=0.0,
+                attention_probs_dropout_prob=0.0,
+            )
+            hf_layer = (
+                transformers.models.vit.modeling_vit.ViTLayer(config)
+                if config.model_type == "vit"
+                else transformers.models.deberta_v2.modeling_deberta_v2.DebertaV2Layer(
+                    config
+                )
+            )
+            tpp_layer = copy.deepcopy(hf_layer)
+            self.assertEqual(
+                ipex.cpu.tpp.build_tpp_encoder_layer(tpp_layer, config),
+                num_tpp_modules,
+            )
+            ipex.cpu.tpp.block(tpp_layer)
+            # the sequence of ViT isn't a multiple of the blocks
+            hidden_states = torch.randn(2, 197, config.hidden_size)
+            if config.model_type == "vit":
+                hf_res = hf_layer(hidden_states)[0]
+                tpp_res = tpp_layer(hidden_states)[0]
+            else:
+                attention_mask = torch.ones(2, 197, dtype=torch.long)
+                attention_mask[1, 100:] = 0
+                attention_mask = attention_mask.unsqueeze(1).unsqueeze(2)
+                attention_mask = attention_mask * attention_mask.transpose(-1, -2)
+                hf_res = hf_layer(hidden_states, attention_mask)
+                tpp_res = tpp_layer(hidden_states, attention_mask)
+                if isinstance(hf_res, tuple):
+                    hf_res, tpp_res = hf_res[0], tpp_res[0]
+            self.assertEqual(hf_res, tpp_res, prec=0.0002)
+            self._test_backward(hf_res, tpp_res, hf_layer, tpp_layer, prec=0.005)
+
+    def test_tpp_roberta_fast_bert(self):
+        config = transformers.RobertaConfig(
+            vocab_size=1000,
+            hidden_size=256,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            intermediate_size=1024,
+            max_position_embeddings=130,
+            hidden_dropout_prob=0.0,
+            attention_probs_dropout_prob=0.0,
+            attn_implementation="eager",
+        )
+        model = transformers.RobertaModel(config).eval()
+        tpp_model = ipex.fast_bert(model)
+        self.assertIsInstance(tpp_model.encoder, ipex.cpu.tpp.fused_bert.BertEncoder)
+        input_ids = torch.randint(5, 1000, (2, 128))
+        attention_mask = torch.ones(2, 128, dtype=torch.long)
+        input_ids[1, 70:] = config.pad_token_id
+        attention_mask[1, 70:] = 0
+        hf_res = model(input_ids, attention_mask=attention_mask).last_hidden_state
+        tpp_res = tpp_model(input_ids, attention_mask=attention_mask).last_hidden_state
+        mask = attention_mask.bool()
+        self.assertEqual(hf_res[mask], tpp_res[mask], prec=0.0002)
+
+    def test_tpp_roberta_fast_bert_packed(self):
+        config = transformers.RobertaConfig(
+            vocab_size=1000,
+            hidden_size=256,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            intermediate_size=1024,
+            max_position_embeddings=130,
+            hidden_dropout_prob=0.0,
+            attention_probs_dropout_prob=0.0,
+            attn_implementation="eager",
+        )
+        model = transformers.RobertaModel(config).eval()
+        tpp_model = ipex.fast_bert(model)
+        lengths = [60, 30, 100, 20, 50, 90]
+        dataset = [{"input_ids": torch.randint(5, 1000, (n,))} for n in lengths]
+        packed_dataset = ipex.cpu.tpp.PackedSequenceDataset(
+            dataset,
+            128,
+            pad_token_id=config.pad_token_id,
+            position_offset=config.pad_token_id + 1,
+        )
+        batch = torch.utils.data.default_collate(
+            [packed_dataset[i] for i in range(len(packed_dataset))]
+        )
+        self.assertLess(len(packed_dataset), len(lengths))
+        tpp_res = tpp_model(**batch).last_hidden_state
+        # every sequence of a row is the same as the unpadded sequence alone
+        for row, indices in enumerate(packed_dataset.rows):
+            start = 0
+            for i in indices:
+                end = start + lengths[i]
+                hf_res = model(dataset[i]["input_ids"].unsqueeze(0)).last_hidden_state
+                self.assertEqual(hf_res, tpp_res[row : row + 1, start:end], prec=0.0002)
+                start = end
+        # the positions starting from 0 are rejected
+        batch["position_ids"] -= config.pad_token_id + 1
+        with self.assertRaises(ValueError):
+            tpp_model(**batch)
+
 
 if __name__ == "__main__":
     test = unittest.main()
@@ -1000,6 +1000,58 @@ class TestPrepackCases(TestCase):
                 y2 = ipex_model(x2)
             self.assertEqual(y1, y2.float(), rtol=1e-2, atol=1e-3)
 
+    def test_prepack_for_batch_sizes(self):
+        class M(torch.nn.Module):
+            def __init__(self):
+                super(M, self).__init__()
+                self.conv = torch.nn.Conv2d(3, 8, 3)
+                self.linear = torch.nn.Linear(8, 16)
+
+            def forward(self, x):
+                return self.linear(self.conv(x).mean(dim=[2, 3]))
+
+        model = M().eval()
+        for auto_kernel_selection in [True, False]:
+            ipex_model = ipex.optimize(
+                copy.deepcopy(model),
+                level="O1",
+                auto_kernel_selection=auto_kernel_selection,
+            )
+            sample_inputs = [torch.randn(bs, 3, 16, 16) for bs in [1, 64]]
+            memory = ipex.nn.utils.prepack_for_batch_sizes(ipex_model, sample_inputs)
+            self.assertGreater(memory, 0)
+            for m in [ipex_model.conv, ipex_model.linear]:
+                self.assertEqual(len(m.batch_size_ctxs), 2)
+                self.assertEqual([bs for bs, _ in m.batch_size_input_shapes], [1, 64])
+            self.assertEqual(
+                ipex_model.conv.batch_size_input_shapes[1][1], [64, 3, 16, 16]
+            )
+            # batch sizes up to 8 use the weight prepacked for batch size 1, the
+            # linear runs on the (batch size, 8) output of the conv
+            x = torch.randn(8, 8)
+            self.assertTrue(
+                ipex_model.linear._get_ctx(x) is ipex_model.linear.batch_size_ctxs[0][1]
+            )
+            # and the batch sizes above 64 the weight prepacked by ipex.optimize
+            x = torch.randn(65, 8)
+            self.assertTrue(ipex_model.linear._get_ctx(x) is ipex_model.linear.ctx)
+            for bs in [1, 5, 9, 64, 100]:
+                x = torch.randn(bs, 3, 16, 16)
+                self.assertEqual(model(x), ipex_model(x), rtol=1e-4, atol=1e-4)
+
+            # the extra prepacked weights follow the loaded weights
+            model2 = M().eval()
+            ipex_model.load_state_dict(model2.state_dict())
+            x = torch.randn(64, 3, 16, 16)
+            self.assertEqual(model2(x), ipex_model(x), rtol=1e-4, atol=1e-4)
+
+            memory = ipex.nn.utils.prepack_for_batch_sizes(
+                ipex_model, sample_inputs, max_memory=0
+            )
+            self.assertEqual(memory, 0)
+            self.assertTrue(ipex_model.linear.batch_size_ctxs is None)
+            self.assertEqual(model2(x), ipex_model(x), rtol=1e-4, atol=1e-4)
+
     @unittest.skipIf(
         not core.onednn_has_bf16_support(),
         "ipex linear bf16 is not supported on this CPU device",